@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+8キー辞書のベンチマーク
+辞書の読み込み時間・メモリ使用量（RSS）・デコード速度を形式ごとに比較する
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def _rss_mb():
+    """プロセスの最大RSS（MB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure_load(path, use_cache):
+    """（子プロセス内）辞書を開いて1回引くまでの時間とRSSを計測"""
+    from eightkey_dictionary import open_dictionary
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    dictionary = open_dictionary(path, use_cache=use_cache)
+    loaded = time.perf_counter()
+    dictionary.get('jdlll')
+    first_lookup = time.perf_counter()
+    return {
+        'load_ms': (loaded - start) * 1000,
+        'first_lookup_ms': (first_lookup - start) * 1000,
+        'rss_mb': _rss_mb(),
+        'rss_delta_mb': _rss_mb() - rss_before,
+    }
+
+
+def bench_load(paths):
+    """
+    辞書ファイルごとに別プロセスで読み込みを計測して表示
+    JSON辞書はキャッシュなし（json.load）とキャッシュあり（<path>.8kd）の両方を計測する
+    """
+    print(f"{'辞書':<48} {'読み込み':>10} {'初回検索まで':>12} {'RSS':>9} {'RSS増分':>9}")
+    for path in paths:
+        runs = [('', '1')]
+        if path.endswith('.json'):
+            runs = [(' (json)', '0'), (' (キャッシュ)', '1')]
+        for label, use_cache in runs:
+            if use_cache == '1':
+                # キャッシュの作成は計測に含めない
+                subprocess.run([sys.executable, __file__, '_load', path, '1'],
+                               capture_output=True, check=True)
+            out = subprocess.run([sys.executable, __file__, '_load', path, use_cache],
+                                 capture_output=True, text=True, check=True).stdout
+            r = json.loads(out.splitlines()[-1])
+            print(f"{path + label:<48} {r['load_ms']:>8.1f}ms {r['first_lookup_ms']:>10.1f}ms "
+                  f"{r['rss_mb']:>7.1f}MB {r['rss_delta_mb']:>7.1f}MB")
+
+
+# 比較する辞書の表現（bench_decode）
+DECODE_VARIANTS = ('dict', 'compact', 'compiled')
+
+
+def _measure_decode(path, variant, tsv_file, repeat):
+    """
+    （子プロセス内）辞書の読み込み時間・保持メモリ・デコードの速度を計測
+
+    dict:     json.load した辞書をそのまま使い、候補の辞書から単語のリストを毎回作る（従来）
+    compact:  CompactDictionary（単語のタプルと頻度の配列）
+    compiled: コンパイル済み辞書（.8kd、なければ <path>.8kd を作って使う）
+
+    読み込みは最初の1回のデコードまでを計測する
+    repeat が0なら tracemalloc で読み込み後に保持しているメモリだけを計測する
+    （読み込み途中の一時オブジェクトは含まない。mmapしたファイルは含まない）
+    """
+    import gc
+    import tracemalloc
+    from eightkey_dictionary import (
+        CompactDictionary, _load_json, lookup_candidates, lookup_words, open_dictionary,
+    )
+
+    with open(tsv_file, 'r', encoding='utf-8') as f:
+        inputs = [line.split('\t', 1)[0] for line in f if line.strip()]
+
+    if not repeat:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if variant == 'dict':
+        dictionary = _load_json(path)
+        decode = lambda x: [c['word'] for c in lookup_candidates(dictionary, None, x)[:10]]
+    else:
+        if variant == 'compact':
+            dictionary = CompactDictionary(_load_json(path))
+        else:
+            dictionary = open_dictionary(path)
+        decode = lambda x: lookup_words(dictionary, None, x)[:10]
+    # コンパイル済み辞書は初めて引いたときにインデックスと単語のタプルを作るので、読み込みに含める
+    decode(inputs[0])
+    loaded = time.perf_counter()
+    if not repeat:
+        gc.collect()
+        return {'retained_mb': tracemalloc.get_traced_memory()[0] / 1024 / 1024}
+
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for x in inputs:
+            decode(x)
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'load_ms': (loaded - start) * 1000,
+        'lookups': len(inputs),
+        'per_sec': len(inputs) / best,
+    }
+
+
+def bench_decode(path, tsv_file, repeat=3):
+    """辞書の表現ごとに別プロセスで保持メモリとデコード速度を比較"""
+    print(f"{'表現':<10} {'読み込み':>10} {'保持メモリ':>10} {'デコード':>16}")
+    for variant in DECODE_VARIANTS:
+        if variant == 'compiled':
+            # キャッシュの作成は計測に含めない
+            subprocess.run([sys.executable, __file__, '_load', path, '1'], capture_output=True, check=True)
+        r = {}
+        for n in (0, repeat):
+            out = subprocess.run([sys.executable, __file__, '_decode', path, variant, tsv_file, str(n)],
+                                 capture_output=True, text=True, check=True).stdout
+            r.update(json.loads(out.splitlines()[-1]))
+        print(f"{variant:<10} {r['load_ms']:>8.1f}ms {r['retained_mb']:>8.1f}MB "
+              f"{r['per_sec']:>12,.0f}回/秒  ({r['lookups']:,}語)")
+
+
+def _to_8key_per_char(text):
+    """従来の1文字ずつの変換（比較用）"""
+    from eightkey_layout import KEY_TO_FINGER
+    return ''.join(KEY_TO_FINGER.get(c, c) for c in text)
+
+
+def bench_to8key(tsv_file, repeat=5):
+    """to_8key の実装を比較（TSVの2列目の単語を変換）"""
+    from eightkey_layout import to_8key, to_8key_batch
+
+    with open(tsv_file, 'r', encoding='utf-8') as f:
+        words = [line.rstrip('\n').split('\t')[1] for line in f if line.strip()]
+
+    expected = [_to_8key_per_char(w) for w in words]
+    assert [to_8key(w) for w in words] == expected
+    assert to_8key_batch(words) == expected
+
+    cases = [
+        ('1文字ずつ（従来）', lambda: [_to_8key_per_char(w) for w in words]),
+        ('str.translate', lambda: [to_8key(w) for w in words]),
+        ('to_8key_batch', lambda: to_8key_batch(words)),
+    ]
+    print(f"{len(words):,}語 × {repeat}回（最良値）")
+    baseline = None
+    for name, func in cases:
+        best = min(_timeit(func) for _ in range(repeat))
+        baseline = baseline or best
+        print(f"  {name:<20} {best * 1000:>8.1f}ms  {len(words) / best:>12,.0f}語/秒  x{baseline / best:.1f}")
+
+
+def _timeit(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python 8key_benchmark.py load <dictionary> [dictionary ...]")
+        print("       python 8key_benchmark.py to8key <8key.tsv>")
+        print("       python 8key_benchmark.py decode <dictionary.json> <8key.tsv>")
+        print("例: python 8key_benchmark.py load linux_words.json linux_words.8kd")
+        print("    python 8key_benchmark.py to8key linux_words_8key.tsv")
+        print("    python 8key_benchmark.py decode linux_words.json linux_words_8key.tsv")
+        return
+
+    command = sys.argv[1]
+    if command == 'load':
+        bench_load(sys.argv[2:])
+    elif command == 'to8key':
+        bench_to8key(sys.argv[2])
+    elif command == 'decode':
+        bench_decode(sys.argv[2], sys.argv[3])
+    elif command == '_decode':
+        print(json.dumps(_measure_decode(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))))
+    elif command == '_load':
+        print(json.dumps(_measure_load(sys.argv[2], sys.argv[3] == '1')))
+    else:
+        print(f"不明なコマンド: {command}")
+
+
+if __name__ == '__main__':
+    main()
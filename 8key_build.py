@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+8キー辞書のビルド
+頻度マッピング・8キーTSV・辞書JSONの依存関係をたどり、変更があったものだけを作り直す
+
+各ステップの入力（元データと生成スクリプト）と出力の内容ハッシュを記録しておき、
+入力が変わった・出力がない・出力が書き換えられたステップだけを実行する
+依存関係のないステップは並列に実行する
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# ビルド状態の記録ファイル（ビルドするディレクトリに置く）
+STATE_FILE = '.8key_build_state.json'
+STATE_VERSION = 1
+
+# 辞書の元になる単語リスト（<name>.txt -> <name>_8key.tsv -> <name>.json と統計の <name>.meta.json）
+DICTIONARIES = ['linux_words', 'common_words_3000', 'common_words_1000']
+# ホット層（<辞書>.hot.8kd）を作る辞書と、よく使う単語のリスト
+HOT_TIERS = [('linux_words', 'common_words_3000.txt')]
+
+
+def _imported_modules(tree):
+    """import 文と importlib.import_module('...') で読み込むモジュールのトップレベル名"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name.split('.')[0]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level == 0 and node.module:
+                yield node.module.split('.')[0]
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+              and node.func.attr == 'import_module' and node.args
+              and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            yield node.args[0].value.split('.')[0]
+
+
+def script_dependencies(script):
+    """
+    スクリプトと、それが読み込むこのディレクトリのモジュール（再帰的にたどる）のリスト
+    モジュールは実行せずに ast で import を調べる（変更されたら出力を作り直す）
+    """
+    found = {script}
+    pending = [script]
+    while pending:
+        path = pending.pop()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                tree = ast.parse(f.read(), path)
+        except (OSError, SyntaxError):
+            # 読めないスクリプトはステップの実行時に失敗する
+            continue
+        for name in _imported_modules(tree):
+            module_path = name + '.py'
+            if module_path not in found and os.path.exists(module_path):
+                found.add(module_path)
+                pending.append(module_path)
+    return [script] + sorted(found - {script})
+
+
+class Step:
+    """1つのビルドステップ（スクリプトを1回実行して出力を作る）"""
+
+    def __init__(self, name, command, inputs, outputs, scripts):
+        self.name = name
+        self.command = command      # スクリプトと引数（python は付けない）
+        self.inputs = inputs
+        self.outputs = outputs
+        self.scripts = scripts      # 入力として扱うスクリプトとモジュール（script_dependencies）
+
+    @property
+    def dependencies(self):
+        return self.scripts + self.inputs
+
+
+def default_steps():
+    """このリポジトリの辞書生成の依存関係（カレントディレクトリのスクリプトから求める）"""
+    freq_script = script_dependencies('create_freq_mapping.py')
+    generator_script = script_dependencies('8key_data_generator.py')
+    builder_script = script_dependencies('8key_dict_with_freq.py')
+    tiered_script = script_dependencies('eightkey_tiered.py')
+    steps = [Step('freq_mapping',
+                  ['create_freq_mapping.py', 'frequencyList.tsv', 'freq_mapping.json'],
+                  ['frequencyList.tsv'], ['freq_mapping.json'], freq_script)]
+    for name in DICTIONARIES:
+        tsv_file = f'{name}_8key.tsv'
+        steps.append(Step(f'{name}_8key',
+                          ['8key_data_generator.py', f'{name}.txt', tsv_file],
+                          [f'{name}.txt'], [tsv_file], generator_script))
+        steps.append(Step(name,
+                          ['8key_dict_with_freq.py', tsv_file, 'freq_mapping.json', f'{name}.json'],
+                          [tsv_file, 'freq_mapping.json'], [f'{name}.json', f'{name}.meta.json'],
+                          builder_script))
+    for name, hot_words in HOT_TIERS:
+        steps.append(Step(f'{name}_hot',
+                          ['eightkey_tiered.py', f'{name}.json', hot_words, f'{name}.hot.8kd'],
+                          [f'{name}.json', hot_words], [f'{name}.hot.8kd'], tiered_script))
+    return steps
+
+
+class BuildState:
+    """
+    ファイルの内容ハッシュとステップごとの入出力ハッシュの記録
+
+    ハッシュはサイズと更新時刻が前回と同じなら記録した値を使い、
+    変わったときだけファイルを読み直す
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}   # パス -> {"size", "mtime_ns", "sha256"}
+        self.steps = {}   # ステップ名 -> {"inputs": {パス: sha256}, "outputs": {パス: sha256}}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == STATE_VERSION:
+            self.files = data.get('files', {})
+            self.steps = data.get('steps', {})
+
+    def hash(self, path):
+        """ファイルの sha256（存在しなければNone）"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.files.pop(path, None)
+            return None
+        cached = self.files.get(path)
+        if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+            return cached['sha256']
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        self.files[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': h.hexdigest()}
+        return h.hexdigest()
+
+    def stale_reason(self, step):
+        """ステップを実行する理由（最新ならNone）"""
+        record = self.steps.get(step.name)
+        if record is None:
+            return '未ビルド'
+        for path in step.dependencies:
+            if self.hash(path) != record['inputs'].get(path):
+                return f'{path} が変更された'
+        for path in step.outputs:
+            digest = self.hash(path)
+            if digest is None:
+                return f'{path} がない'
+            if digest != record['outputs'].get(path):
+                return f'{path} が書き換えられた'
+        return None
+
+    def record(self, step):
+        self.steps[step.name] = {
+            'inputs': {path: self.hash(path) for path in step.dependencies},
+            'outputs': {path: self.hash(path) for path in step.outputs},
+        }
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'files': self.files, 'steps': self.steps},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def select_steps(steps, targets):
+    """targets（出力ファイル名またはステップ名）とその依存ステップを返す（指定がなければ全て）"""
+    if not targets:
+        return list(steps)
+    producers = {path: step for step in steps for path in step.outputs}
+    by_name = {step.name: step for step in steps}
+    selected = set()
+    pending = []
+    for target in targets:
+        step = by_name.get(target) or producers.get(target)
+        if step is None:
+            raise ValueError(f"不明なターゲット: {target}")
+        pending.append(step)
+    while pending:
+        step = pending.pop()
+        if step.name in selected:
+            continue
+        selected.add(step.name)
+        pending.extend(producers[p] for p in step.inputs if p in producers)
+    return [step for step in steps if step.name in selected]
+
+
+def run_step(step):
+    """ステップを実行して (終了コード, 出力, 秒数) を返す（スレッドから呼ぶ）"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + step.command, capture_output=True, text=True)
+    return result.returncode, result.stdout + result.stderr, time.perf_counter() - start
+
+
+def build(steps, jobs=None, force=False, dry_run=False, verbose=False):
+    """
+    ステップを依存順に実行する
+
+    入力を作るステップが終わってから古いかどうかを判定するので、上流を作り直しても
+    出力の内容が変わらなければ下流は実行しない
+
+    Returns:
+        bool: 全て成功したか
+    """
+    state = BuildState(STATE_FILE)
+    producers = {path: step for step in steps for path in step.outputs}
+    upstream = {step.name: {producers[p].name for p in step.inputs if p in producers}
+                for step in steps}
+    status = {}   # ステップ名 -> '最新' / '実行' / '失敗' / 'スキップ'
+    waiting = list(steps)
+    running = {}
+    ok = True
+
+    def start_ready(pool):
+        for step in list(waiting):
+            if any(name not in status for name in upstream[step.name]):
+                continue
+            waiting.remove(step)
+            if any(status[name] in ('失敗', 'スキップ') for name in upstream[step.name]):
+                status[step.name] = 'スキップ'
+                print(f"  スキップ  {step.name}（上流のステップを実行できなかった）")
+                continue
+            missing = [p for p in step.inputs if p not in producers and not os.path.exists(p)]
+            if missing:
+                # 元データがないステップは実行しない（既存の出力があればそれを使う）
+                have_outputs = all(os.path.exists(p) for p in step.outputs)
+                status[step.name] = '最新' if have_outputs else 'スキップ'
+                if verbose or not have_outputs:
+                    print(f"  入力なし  {step.name}（{', '.join(missing)}）")
+                continue
+            if force:
+                reason = '--force'
+            elif dry_run and any(status[name] == '実行' for name in upstream[step.name]):
+                reason = '上流が実行予定'
+            else:
+                reason = state.stale_reason(step)
+            if reason is None:
+                status[step.name] = '最新'
+                if verbose:
+                    print(f"  最新      {step.name}")
+                continue
+            if dry_run:
+                status[step.name] = '実行'
+                print(f"  実行予定  {step.name}（{reason}）")
+                continue
+            print(f"  実行      {step.name}（{reason}）")
+            running[pool.submit(run_step, step)] = step
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        start_ready(pool)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                returncode, output, elapsed = future.result()
+                if returncode == 0:
+                    status[step.name] = '実行'
+                    state.record(step)
+                    print(f"  完了      {step.name} ({elapsed:.2f}秒)")
+                    if verbose:
+                        print(output.rstrip())
+                else:
+                    status[step.name] = '失敗'
+                    ok = False
+                    print(f"  失敗      {step.name} (終了コード {returncode})")
+                    print(output.rstrip())
+            start_ready(pool)
+
+    if not dry_run:
+        state.save()
+    built = sum(1 for s in status.values() if s == '実行')
+    print(f"ビルド{'予定' if dry_run else ''}: {built} ステップ実行, "
+          f"{sum(1 for s in status.values() if s == '最新')} ステップ最新 ({time.perf_counter() - start:.2f}秒)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='8キー辞書のビルド（変更されたものだけ作り直す）')
+    parser.add_argument('targets', nargs='*',
+                        help='作るファイルまたはステップ名（例: linux_words.json、省略時は全て）')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='同時に実行するステップ数（0でCPU数、デフォルト: 0）')
+    parser.add_argument('--force', action='store_true', help='最新でも全て作り直す')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='実行するステップを表示するだけ')
+    parser.add_argument('-v', '--verbose', action='store_true', help='最新のステップと各スクリプトの出力も表示')
+    args = parser.parse_args()
+
+    # 入出力とスクリプトはこのスクリプトと同じディレクトリにある
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        steps = select_steps(default_steps(), args.targets)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    if not build(steps, args.jobs or None, args.force, args.dry_run, args.verbose):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
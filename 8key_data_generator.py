@@ -3,96 +3,96 @@
 英単語・英文・日本語文から8キー入力ペアを生成するスクリプト
 - 日本語はpykakasiでローマ字に変換してから8キー変換
 - 日本語入力の複数のバリエーション（shougi/syougi等）に対応
+  （既定ではバリエーションを {a|b} 形式のラティス1つにまとめて出力、--expand で展開）
 - 入力: 1行ごとに単語または文が書かれたテキストファイル
 - 出力: タブ区切りで [8キー入力]\t[元の単語/文] のペア
+  （ラティスの行は3列目に lattice の印を付ける: [ラティス]\t[元の文]\tlattice）
 """
 
 import re
 import itertools
+import functools
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from eightkey_index import LATTICE_MARK, format_lattice
+from eightkey_layout import to_8key, to_8key_batch
 
 # pykakasi をインポート
 try:
     from pykakasi import kakasi
-    kks = kakasi()
     HAS_PYKAKASI = True
 except ImportError:
     print("警告: pykakasiがインストールされていません。日本語文は処理できません。")
     print("インストール: pip install pykakasi")
     HAS_PYKAKASI = False
-    kks = None
-
-# 指ごとのqwertyキー割り当て
-FINGER_TO_KEYS = [
-    set('qaz'),    # 左小指
-    set('wsx'),    # 左薬指
-    set('edc'),    # 左中指
-    set('rfvtgb'), # 左人差指
-    set('yhnujm'), # 右人差指
-    set('ik,'),    # 右中指
-    set('ol.'),    # 右薬指
-    set('p;:/\'"?'),   # 右小指
-]
-# 8キーのラベル（a〜; など自由に変更可）
-FINGER_LABELS = ['a','s','d','f','j','k','l',';']
+kks = None  # 最初の日本語変換時（並列時は各ワーカーの起動時）に初期化
 
-# 文字→指ラベルの逆引き辞書
-KEY_TO_FINGER = {}
-for i, keys in enumerate(FINGER_TO_KEYS):
-    for k in keys:
-        KEY_TO_FINGER[k] = FINGER_LABELS[i]
-        KEY_TO_FINGER[k.upper()] = FINGER_LABELS[i]
+def init_kakasi():
+    """pykakasiの変換器を初期化（プロセスごとに1回）"""
+    global kks
+    if HAS_PYKAKASI and kks is None:
+        kks = kakasi()
 
 def is_japanese(text):
     """テキストに日本語文字（ひらがな、カタカナ、漢字）が含まれているか判定"""
     return bool(re.search(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]', text))
 
-def generate_romaji_variations(romaji):
+# 変換可能なパターンと置換候補
+ROMAJI_VARIANT_PATTERNS = [
+    ('sha', ['sha', 'sya']),
+    ('shi', ['shi', 'si']),
+    ('shu', ['shu', 'syu']),
+    ('sho', ['sho', 'syo']),
+    ('cha', ['cha', 'tya', 'cya']),
+    ('chi', ['chi', 'ti']),
+    ('chu', ['chu', 'tyu', 'cyu']),
+    ('cho', ['cho', 'tyo', 'cyo']),
+    ('ja', ['ja', 'jya', 'zya']),
+    ('ji', ['ji', 'zi']),
+    ('ju', ['ju', 'jyu', 'zyu']),
+    ('jo', ['jo', 'jyo', 'zyo']),
+    ('fu', ['fu', 'hu']),
+    ('tsu', ['tsu', 'tu']),
+]
+# 長いパターンから試す（shaの前にshiをチェックしないように）
+_ROMAJI_VARIANT_PATTERNS_BY_LENGTH = sorted(ROMAJI_VARIANT_PATTERNS, key=lambda x: -len(x[0]))
+
+def split_romaji_variations(romaji):
     """
-    ローマ字入力のバリエーションを生成
-    日本語入力では複数の入力パターンがある
-    例: shougi → shougi, syougi
-        datte → datte (促音は入力時に自動変換されるので1パターン)
+    ローマ字を位置ごとの入力の選択肢に分解
+    例: shougi → [['sho', 'syo'], ['u'], ['g'], ['i']]
     """
-    # 変換可能なパターンと置換候補
-    patterns = [
-        ('sha', ['sha', 'sya']),
-        ('shi', ['shi', 'si']),
-        ('shu', ['shu', 'syu']),
-        ('sho', ['sho', 'syo']),
-        ('cha', ['cha', 'tya', 'cya']),
-        ('chi', ['chi', 'ti']),
-        ('chu', ['chu', 'tyu', 'cyu']),
-        ('cho', ['cho', 'tyo', 'cyo']),
-        ('ja', ['ja', 'jya', 'zya']),
-        ('ji', ['ji', 'zi']),
-        ('ju', ['ju', 'jyu', 'zyu']),
-        ('jo', ['jo', 'jyo', 'zyo']),
-        ('fu', ['fu', 'hu']),
-        ('tsu', ['tsu', 'tu']),
-    ]
-    
-    # 文字列中のすべてのパターンを見つける
     variations_choices = []
     pos = 0
-    result_parts = []
     
     while pos < len(romaji):
         matched = False
-        # 長いパターンから試す（shaの前にshiをチェックしないように）
-        for pattern, choices in sorted(patterns, key=lambda x: -len(x[0])):
+        for pattern, choices in _ROMAJI_VARIANT_PATTERNS_BY_LENGTH:
             if romaji[pos:pos+len(pattern)] == pattern:
                 variations_choices.append(choices)
-                result_parts.append((pos, len(pattern), choices))
                 pos += len(pattern)
                 matched = True
                 break
         
         if not matched:
             # パターンにマッチしない文字はそのまま
-            result_parts.append((pos, 1, [romaji[pos]]))
             variations_choices.append([romaji[pos]])
             pos += 1
     
+    return variations_choices
+
+def generate_romaji_variations(romaji):
+    """
+    ローマ字入力のバリエーションを生成
+    日本語入力では複数の入力パターンがある
+    例: shougi → shougi, syougi
+        datte → datte (促音は入力時に自動変換されるので1パターン)
+    """
+    variations_choices = split_romaji_variations(romaji)
+    
     # すべての組み合わせを生成（最大50パターンまで制限してメモリ節約）
     # ジェネレータを使用してメモリ効率を向上
     combinations_gen = itertools.product(*variations_choices)
@@ -103,91 +103,321 @@ def generate_romaji_variations(romaji):
     # 重複を削除してユニークなバリエーションのみ返す
     return list(set(variations))
 
+def romaji_to_8key_lattice(romaji):
+    """
+    ローマ字を8キーのラティスに変換（組み合わせを展開せず、すべてのバリエーションを保持）
+    例: shinbun → ('{sjk|sk}jfjj', True)（shi/si）
+        shougi  → ('sjljfk', False)（sho/syo は8キーでは同じなのでまとめられ、通常のパターンになる）
+    
+    Returns:
+        tuple: (8キーパターン, ラティスか)
+    """
+    segments = [[to_8key(choice) for choice in choices]
+                for choices in split_romaji_variations(romaji)]
+    return format_lattice(segments)
+
+# ローマ字変換キャッシュ（pykakasiの変換結果のローマ字を保持する）
+# 変換規則を変えたらバージョンを上げてディスクキャッシュを無効にする
+ROMAJI_CACHE_VERSION = 2
+DEFAULT_MEMO_SIZE = 100000
+
+_romaji_memo = None   # lru_cacheで包んだ変換関数
+_romaji_disk = None   # ディスクキャッシュ（sqlite3接続、ワーカーでは読むだけ）
+_romaji_new = []      # ディスクキャッシュにまだ書いていない (テキスト, ローマ字)
+_romaji_stats = {'memo_hits': 0, 'disk_hits': 0, 'converted': 0}
+_romaji_stats_taken = dict(_romaji_stats)
+
+def configure_romaji_cache(memo_size=DEFAULT_MEMO_SIZE, disk_path=None):
+    """
+    ローマ字変換キャッシュを設定
+    
+    Args:
+        memo_size: メモリ上のLRUキャッシュの件数（0でメモリキャッシュなし）
+        disk_path: 実行をまたいで使うディスクキャッシュ（SQLiteファイル、Noneで使わない）
+    """
+    global _romaji_memo, _romaji_disk
+    _romaji_memo = functools.lru_cache(maxsize=memo_size)(_romaji_from_disk_or_convert)
+    
+    if _romaji_disk is not None:
+        _romaji_disk.close()
+        _romaji_disk = None
+    _romaji_new.clear()
+    if disk_path:
+        _romaji_disk = open_romaji_disk(disk_path)
+
+def open_romaji_disk(disk_path):
+    """ディスクキャッシュを開く（バージョンが違えば中身を捨てて作り直す）"""
+    conn = sqlite3.connect(disk_path, timeout=60)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS romaji (text TEXT PRIMARY KEY, romaji TEXT)')
+    row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if row is None or row[0] != str(ROMAJI_CACHE_VERSION):
+        conn.execute('DROP TABLE romaji')
+        conn.execute('CREATE TABLE romaji (text TEXT PRIMARY KEY, romaji TEXT)')
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(ROMAJI_CACHE_VERSION),))
+    conn.commit()
+    return conn
+
+def take_new_romaji():
+    """前回呼び出し以降に変換した (テキスト, ローマ字) を返す（ディスクキャッシュを使うときだけ溜める）"""
+    entries = list(_romaji_new)
+    _romaji_new.clear()
+    return entries
+
+def store_romaji_cache(conn, entries):
+    """
+    変換結果をディスクキャッシュに書き込む
+    並列時も書き込みは親プロセスだけが行い、トランザクションはチャンクごとにすぐ閉じる
+    （ワーカーは読むだけなので、書き込みのロック待ちで止まらない）
+    """
+    if conn is not None and entries:
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO romaji VALUES (?, ?)', entries)
+
+def take_romaji_cache_stats():
+    """前回呼び出し以降のキャッシュ統計（件数の差分）を返す"""
+    global _romaji_stats_taken
+    if _romaji_memo is not None:
+        _romaji_stats['memo_hits'] = _romaji_memo.cache_info().hits
+    delta = {k: v - _romaji_stats_taken[k] for k, v in _romaji_stats.items()}
+    _romaji_stats_taken = dict(_romaji_stats)
+    return delta
+
+def _convert_romaji(text):
+    """pykakasiでローマ字（ヘボン式）に変換"""
+    if kks is None:
+        init_kakasi()
+    result = kks.convert(text)
+    return ''.join([item['hepburn'] for item in result])
+
+def _romaji_from_disk_or_convert(text):
+    """ディスクキャッシュを引き、なければ変換して書き込み待ちに加える（メモリキャッシュの下の段）"""
+    if _romaji_disk is not None:
+        row = _romaji_disk.execute('SELECT romaji FROM romaji WHERE text = ?', (text,)).fetchone()
+        if row is not None:
+            _romaji_stats['disk_hits'] += 1
+            return row[0]
+    
+    romaji_text = _convert_romaji(text)
+    _romaji_stats['converted'] += 1
+    if _romaji_disk is not None:
+        _romaji_new.append((text, romaji_text))
+    return romaji_text
+
+def japanese_to_romaji_text(text):
+    """日本語テキストをローマ字（ヘボン式、1通り）に変換（結果はキャッシュする）"""
+    if _romaji_memo is None:
+        configure_romaji_cache()
+    return _romaji_memo(text)
+
 def japanese_to_romaji(text):
     """日本語テキストをローマ字に変換（複数バリエーション）"""
     if not HAS_PYKAKASI:
         return [text]
     
-    result = kks.convert(text)
-    romaji_text = ''.join([item['hepburn'] for item in result])
-    
     # 複数のバリエーションを生成
-    variations = generate_romaji_variations(romaji_text)
-    return variations
+    return generate_romaji_variations(japanese_to_romaji_text(text))
 
-def to_8key(text):
-    """元のテキストを8キー入力に変換"""
-    return ''.join(KEY_TO_FINGER.get(c, c) for c in text)
-
-def process_text(text):
+def process_text(text, lattice=False):
     """
     テキストを処理して8キー入力に変換
     日本語の場合はローマ字のバリエーションを生成してから8キー変換
     
+    Args:
+        text: 元のテキスト
+        lattice: 日本語のバリエーションを展開せず1つのラティスにまとめるか
+    
     Returns:
-        list: 8キー変換されたテキストのリスト（英語は1つ、日本語は複数バリエーション）
+        tuple: (8キー変換されたテキストのリスト, ラティスか)
+               リストは英語なら1つ、日本語なら複数バリエーションまたはラティス1つ
     """
     if is_japanese(text):
+        if lattice and HAS_PYKAKASI:
+            pattern, is_lattice = romaji_to_8key_lattice(japanese_to_romaji_text(text))
+            return [pattern], is_lattice
         # 日本語の場合は複数のローマ字バリエーションを生成
         romaji_list = japanese_to_romaji(text)
-        return [to_8key(romaji) for romaji in romaji_list]
+        return [to_8key(romaji) for romaji in romaji_list], False
     else:
         # 英語の場合はそのまま8キー変換（リストで返す）
-        return [to_8key(text)]
+        return [to_8key(text)], False
+
+def convert_lines(lines, lattice=False):
+    """
+    行のまとまりを8キー変換する（並列実行時の1タスク）
+    英語の行はまとめて to_8key_batch で変換する
+    lattice=True なら日本語の表記ゆれをラティス1つにまとめる
+    
+    Returns:
+        list: (元の行, 日本語か, ユニークな8キー変換のリスト, ラティスか) のリスト
+    """
+    flags = [is_japanese(line) for line in lines]
+    english = to_8key_batch([line for line, is_jpn in zip(lines, flags) if not is_jpn])
+    english_iter = iter(english)
+    
+    results = []
+    for line, is_jpn in zip(lines, flags):
+        if is_jpn:
+            # 日本語は複数バリエーション、8キー変換後に重複を削除（出現順を保つ）
+            converted, is_lattice = process_text(line, lattice)
+            unique_converted = list(dict.fromkeys(converted))
+        else:
+            unique_converted, is_lattice = [next(english_iter)], False
+        results.append((line, is_jpn, unique_converted, is_lattice))
+    return results
+
+def iter_chunks(fin, chunk_size):
+    """空行を除いた入力行を chunk_size 行ずつのリストにまとめて返す"""
+    chunk = []
+    for line in fin:
+        line = line.strip()
+        if not line:
+            continue
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def init_worker(memo_size=DEFAULT_MEMO_SIZE, romaji_cache=None):
+    """ワーカープロセスの初期化（pykakasiとローマ字変換キャッシュ）"""
+    init_kakasi()
+    configure_romaji_cache(memo_size, romaji_cache)
+
+def convert_task(lines, lattice=False):
+    """
+    1チャンク分の変換タスク
+    
+    Returns:
+        tuple: (convert_linesの結果, このチャンクでのキャッシュ統計,
+                ディスクキャッシュに書き込む (テキスト, ローマ字) のリスト)
+    """
+    results = convert_lines(lines, lattice)
+    return results, take_romaji_cache_stats(), take_new_romaji()
+
+def iter_converted(chunks, workers=1, ordered=True, memo_size=DEFAULT_MEMO_SIZE, romaji_cache=None,
+                   lattice=False):
+    """
+    チャンクを変換した結果を (結果, キャッシュ統計) の形で返す
+    workers > 1 ならプロセスプールで並列に変換する
+    （先読みするチャンク数を制限するので入力が大きくてもメモリは一定）
+    """
+    if workers <= 1:
+        init_worker(memo_size, romaji_cache)
+        for chunk in chunks:
+            results, stats, new_romaji = convert_task(chunk, lattice)
+            store_romaji_cache(_romaji_disk, new_romaji)
+            yield results, stats
+        return
+    
+    # ディスクキャッシュは親プロセスだけが書く（作り直しもワーカーの起動前に済ませておく）
+    writer = open_romaji_disk(romaji_cache) if romaji_cache else None
+    max_pending = workers * 4
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(memo_size, romaji_cache)) as pool:
+            pending = deque()
+            
+            def finished():
+                if ordered:
+                    futures = [pending.popleft()]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    futures = list(done)
+                    for future in futures:
+                        pending.remove(future)
+                for future in futures:
+                    results, stats, new_romaji = future.result()
+                    store_romaji_cache(writer, new_romaji)
+                    yield results, stats
+            
+            for chunk in chunks:
+                pending.append(pool.submit(convert_task, chunk, lattice))
+                if len(pending) >= max_pending:
+                    yield from finished()
+            while pending:
+                yield from finished()
+    finally:
+        if writer is not None:
+            writer.close()
 
 def main():
+    import argparse
+    import os
     import sys
     if len(sys.argv) < 3:
-        print('Usage: python 8key_data_generator.py input.txt output.tsv')
+        print('Usage: python 8key_data_generator.py input.txt output.tsv [--workers N] [--unordered] [--expand]')
         return
-    infile, outfile = sys.argv[1], sys.argv[2]
+    
+    parser = argparse.ArgumentParser(description='テキストから8キー入力ペアのTSVを生成')
+    parser.add_argument('infile', help='入力テキスト（1行1単語/文）')
+    parser.add_argument('outfile', help='出力TSV')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='並列ワーカー数（0でCPU数、デフォルト: 1）')
+    parser.add_argument('--unordered', action='store_true',
+                        help='並列時に入力順を保たず、終わったチャンクから出力する')
+    parser.add_argument('--chunk-size', type=int, default=2000,
+                        help='1タスクあたりの行数（デフォルト: 2000）')
+    parser.add_argument('--expand', action='store_true',
+                        help='日本語の表記ゆれをラティスにせず、展開して1行ずつ出力する（最大50通り）')
+    parser.add_argument('--memo-size', type=int, default=DEFAULT_MEMO_SIZE,
+                        help=f'ローマ字変換のメモリキャッシュ件数（0で無効、デフォルト: {DEFAULT_MEMO_SIZE}）')
+    parser.add_argument('--romaji-cache', metavar='PATH',
+                        help='実行をまたいで使うローマ字変換キャッシュ（SQLiteファイル）')
+    args = parser.parse_args()
+    infile, outfile = args.infile, args.outfile
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
     
     count = 0
     jpn_count = 0
     eng_count = 0
     total_output_lines = 0
+    start = time.perf_counter()
+    next_report = 100000
+    cache_stats = {'memo_hits': 0, 'disk_hits': 0, 'converted': 0}
     
     # メモリ使用量を削減するため、バッファサイズを制限して開く
     with open(infile, encoding='utf-8') as fin, \
          open(outfile, 'w', encoding='utf-8', buffering=8192) as fout:
-        for line in fin:
-            line = line.strip()
-            if not line: 
-                continue
-            
-            # 日本語か英語かを判定
-            is_jpn = is_japanese(line)
-            if is_jpn:
-                jpn_count += 1
-            else:
-                eng_count += 1
+        chunks = iter_chunks(fin, args.chunk_size)
+        converted_chunks = iter_converted(chunks, workers, ordered=not args.unordered,
+                                          memo_size=args.memo_size, romaji_cache=args.romaji_cache,
+                                          lattice=not args.expand)
+        for results, chunk_stats in converted_chunks:
+            for key, value in chunk_stats.items():
+                cache_stats[key] += value
+            for line, is_jpn, unique_converted, is_lattice in results:
+                if is_jpn:
+                    jpn_count += 1
+                else:
+                    eng_count += 1
+                
+                # すべてのユニークなバリエーションを出力（ラティスは3列目に印を付ける）
+                mark = f'\t{LATTICE_MARK}' if is_lattice else ''
+                for converted in unique_converted:
+                    fout.write(f'{converted}\t{line}{mark}\n')
+                    total_output_lines += 1
             
-            # 8キー変換（日本語の場合は複数バリエーション）
-            converted_list = process_text(line)
-            
-            # 8キー変換後に重複を削除（メモリ効率的な方法）
-            seen = {}
-            unique_converted = []
-            for conv in converted_list:
-                if conv not in seen:
-                    seen[conv] = True
-                    unique_converted.append(conv)
-            
-            # すべてのユニークなバリエーションを出力
-            for converted in unique_converted:
-                fout.write(f'{converted}\t{line}\n')
-                total_output_lines += 1
-            
-            count += 1
-            # より頻繁にフラッシュしてメモリを解放
-            if count % 10000 == 0:
-                fout.flush()
-            if count % 100000 == 0:
-                print(f'処理中... {count:,}行 (jpn: {jpn_count:,}, eng: {eng_count:,}, 出力: {total_output_lines:,}行)')
+            count += len(results)
+            if count >= next_report:
+                next_report += 100000
+                rate = count / (time.perf_counter() - start)
+                print(f'処理中... {count:,}行 (jpn: {jpn_count:,}, eng: {eng_count:,}, 出力: {total_output_lines:,}行, {rate:,.0f}行/秒)')
     
+    elapsed = time.perf_counter() - start
     print(f'完了！')
     print(f'入力: {count:,}行 (日本語: {jpn_count:,}, 英語: {eng_count:,})')
     print(f'出力: {total_output_lines:,}行 (バリエーション含む)')
+    print(f'処理時間: {elapsed:.2f}秒 ({count / elapsed if elapsed > 0 else 0:,.0f}行/秒, ワーカー: {workers})')
+    
+    lookups = sum(cache_stats.values())
+    hits = cache_stats['memo_hits'] + cache_stats['disk_hits']
+    hit_rate = hits / lookups * 100 if lookups else 0.0
+    print(f'ローマ字変換キャッシュ: ヒット率 {hit_rate:.1f}% '
+          f'(メモリ: {cache_stats["memo_hits"]:,}, ディスク: {cache_stats["disk_hits"]:,}, '
+          f'変換: {cache_stats["converted"]:,})')
 
 if __name__ == '__main__':
     main()
@@ -4,29 +4,66 @@
 8キー入力から元のテキストを復元（頻度順に候補を返す）
 """
 
+import argparse
+import contextlib
+import functools
 import json
 import sys
 
+from eightkey_compiled import is_compiled_dictionary
+from eightkey_dictionary import (
+    completion_index_for, lattice_index_for, lookup_words, open_layered_dictionary, stored_dictionary_stats,
+)
+from eightkey_index import DEFAULT_TOP_K
+from eightkey_sqlite import is_sqlite_dictionary
+from eightkey_stats import compute_dictionary_stats, write_dictionary_metadata
+
 
 class EightKeyDecoder:
-    def __init__(self):
+    def __init__(self, predictive_k=0):
         self.word_dict = {}  # 8キー入力 -> [{"word": "...", "freq": ...}]
+        self.completion_index = None
+        self.lattice_index = None  # 日本語の表記ゆれ（ラティス）パターン
+        # 予測候補の保持件数（0なら予測しない、予測を表示するCLIは DEFAULT_TOP_K を渡す）
+        self.predictive_k = predictive_k
+        self.stats = None  # 辞書の統計（eightkey_stats.DictionaryStats.to_dict() の値）
+        
+    def load_dictionary(self, json_file, recompute_stats=False, overlays=()):
+        """
+        辞書を読み込む（JSON・コンパイル済み・SQLite辞書）
         
-    def load_dictionary(self, json_file):
-        """JSON辞書を読み込む"""
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.word_dict = json.load(f)
+        overlays の辞書は上に重ね、候補は引いたときに頻度順に統合する（基本の辞書は写さない）
+        統計は辞書生成時に保存されたものを表示する（重ねた場合は基本の辞書の統計）
+        recompute_stats=True なら辞書全体から集計し直し、JSON辞書ならサイドカーも書き直す
+        """
+        self.word_dict = open_layered_dictionary(json_file, overlays)
+        self.lattice_index = lattice_index_for(self.word_dict)
         
         print(f"辞書読み込み完了: {len(self.word_dict)}個の8キーパターン")
+        if overlays:
+            for overlay, layer in zip(overlays, self.word_dict.layers[1:]):
+                print(f"  重ね合わせ: {overlay} ({len(layer)}パターン)")
         
         # 統計情報
-        total_words = sum(len(candidates) for candidates in self.word_dict.values())
-        unique = sum(1 for candidates in self.word_dict.values() if len(candidates) == 1)
-        collision = len(self.word_dict) - unique
+        if recompute_stats:
+            stats = compute_dictionary_stats(self.word_dict)
+            if not overlays and not (is_compiled_dictionary(json_file) or is_sqlite_dictionary(json_file)):
+                write_dictionary_metadata(json_file, stats)
+        else:
+            stats = stored_dictionary_stats(json_file, self.word_dict)
+        self.stats = stats
         
-        print(f"  総単語数: {total_words}")
-        print(f"  ユニークパターン: {unique} ({unique/len(self.word_dict)*100:.1f}%)")
-        print(f"  衝突パターン: {collision} ({collision/len(self.word_dict)*100:.1f}%)")
+        if stats:
+            patterns = stats['patterns']
+            print(f"  総単語数: {stats['total_words']}")
+            print(f"  ユニークパターン: {stats['unique_patterns']} ({stats['unique_patterns']/patterns*100:.1f}%)")
+            print(f"  衝突パターン: {stats['collision_patterns']} ({stats['collision_patterns']/patterns*100:.1f}%)")
+        else:
+            print("  統計情報なし（--stats で集計）")
+        
+        if self.predictive_k:
+            self.completion_index = completion_index_for(self.word_dict, self.predictive_k)
+            print(f"  {self.completion_index.summary()}")
     
     def decode(self, eight_key_input, top_n=10):
         """
@@ -37,13 +74,25 @@ class EightKeyDecoder:
             top_n: 返す候補の最大数
             
         Returns:
-            list: 候補のリスト（頻度の高い順、大文字小文字は統合済み）
+            tuple: 候補のタプル（頻度の高い順、大文字小文字は統合済み）
         """
-        if eight_key_input in self.word_dict:
-            candidates = self.word_dict[eight_key_input][:top_n]
-            return [c['word'] for c in candidates]
-        else:
+        return lookup_words(self.word_dict, self.lattice_index, eight_key_input)[:top_n]
+    
+    def predict(self, eight_key_prefix, top_n=10):
+        """
+        8キー入力の続きとなる候補を予測（頻度順）
+        
+        Args:
+            eight_key_prefix: 入力途中の8キー文字列（例: "jdl"）
+            top_n: 返す候補の最大数（predictive_kを超える分は返らない）
+            
+        Returns:
+            list: (単語, 8キーパターン) のリスト（頻度の高い順）
+        """
+        if not self.completion_index:
             return []
+        completions = self.completion_index.completions(eight_key_prefix)[:min(top_n, self.predictive_k)]
+        return [(word, pattern) for word, pattern, _ in completions]
     
     def decode_text(self, eight_key_text, separator=' '):
         """
@@ -67,28 +116,152 @@ class EightKeyDecoder:
                 decoded_words.append(f"[?{word}?]")  # 復元できなかった場合
         
         return separator.join(decoded_words)
+    
+    def iter_decode(self, lines, separator=' ', cache_size=65536):
+        """
+        8キー入力テキストを1行ずつデコードするジェネレータ
+        
+        Args:
+            lines: 8キー入力テキストの行のイテラブル（ファイルや標準入力）
+            separator: 単語の区切り文字
+            cache_size: 同じパターンの検索結果を覚えておく件数（メモリ上限）
+            
+        Yields:
+            str: 復元されたテキスト（改行なし）
+        """
+        @functools.lru_cache(maxsize=cache_size)
+        def decode_word(word):
+            candidates = self.decode(word, top_n=1)
+            return candidates[0] if candidates else f"[?{word}?]"
+        
+        for line in lines:
+            words = line.rstrip('\r\n').split(separator)
+            yield separator.join([decode_word(word) for word in words])
+    
+    def iter_candidates(self, lines, separator=' ', top_n=10, cache_size=65536):
+        """
+        8キー入力テキストを1行ずつ候補リストに変換するジェネレータ
+        
+        Yields:
+            dict: {"input": 行, "candidates": [[単語ごとの候補...], ...]}
+        """
+        @functools.lru_cache(maxsize=cache_size)
+        def decode_word(word):
+            return self.decode(word, top_n=top_n)
+        
+        for line in lines:
+            line = line.rstrip('\r\n')
+            yield {
+                "input": line,
+                "candidates": [decode_word(word) for word in line.split(separator)],
+            }
+
+
+def print_predictions(decoder, eight_key_prefix):
+    """予測候補を表示"""
+    predictions = decoder.predict(eight_key_prefix)
+    if predictions:
+        print("予測候補:")
+        for word, pattern in predictions:
+            print(f"  [{pattern}] {word}")
+
+
+def print_stats_details(stats):
+    """統計の詳細（最大衝突とパターン長の分布）を表示"""
+    print(f"\n最大衝突数: {stats['max_collision']} (パターン: {stats['max_collision_pattern']})")
+    if stats['max_collision_pattern']:
+        print(f"  候補: {stats['max_collision_words']}")
+    print("パターン長の分布:")
+    for length, count in stats['length_histogram'].items():
+        print(f"  {int(length):3d}: {count:,}")
+
+
+def iter_input_lines(files):
+    """入力ファイル（'-' または省略で標準入力）の行を順に返す"""
+    for path in files or ['-']:
+        if path == '-':
+            yield from sys.stdin
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from f
+
+
+def run_batch(decoder, files, jsonl=False, top_n=10, flush_lines=1024):
+    """
+    バッチモード: 入力を1行ずつデコードして標準出力に書く
+    出力はflush_lines行ごとにまとめて書き込む（入力サイズによらずメモリは一定）
+    """
+    lines = iter_input_lines(files)
+    if jsonl:
+        results = (json.dumps(r, ensure_ascii=False) for r in decoder.iter_candidates(lines, top_n=top_n))
+    else:
+        results = decoder.iter_decode(lines)
+    
+    out = sys.stdout
+    buffer = []
+    for result in results:
+        buffer.append(result)
+        if len(buffer) >= flush_lines:
+            buffer.append('')
+            out.write('\n'.join(buffer))
+            buffer = []
+    if buffer:
+        buffer.append('')
+        out.write('\n'.join(buffer))
+    out.flush()
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description='8キー入力から元のテキストを復元',
+        epilog='例: python 8key_decoder.py common_words_1000.json jdlll\n'
+               '    python 8key_decoder.py linux_words.json --overlay team_words.json\n'
+               '    cat input.8key | python 8key_decoder.py linux_words.json --batch --jsonl',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dictionary', help='辞書ファイル（JSON・コンパイル済み .8kd・SQLite .8kdb）')
+    parser.add_argument('input', nargs='*', help='8キー入力（--batch時は入力ファイル、省略で標準入力）')
+    parser.add_argument('--batch', action='store_true', help='入力を1行ずつデコードして標準出力に書く')
+    parser.add_argument('--jsonl', action='store_true', help='バッチモードで候補リストをJSONLで出力')
+    parser.add_argument('--top-n', type=int, default=10, help='候補の最大数（デフォルト: 10）')
+    parser.add_argument('--overlay', action='append', default=[], metavar='DICTIONARY',
+                        help='辞書の上に重ねる辞書（複数指定可、後のものほど上の層）')
+    parser.add_argument('--stats', action='store_true',
+                        help='統計を辞書全体から集計し直して詳細を表示・保存する（入力がなければ終了）')
+    
     if len(sys.argv) < 2:
-        print("Usage: python 8key_decoder.py <dictionary.json> [8key_input]")
+        parser.print_usage()
         print("例: python 8key_decoder.py common_words_1000.json jdlll")
         return
+    args = parser.parse_intermixed_args()
+    
+    dictionary_file = args.dictionary
+    
+    if args.batch:
+        # 読み込みの情報は標準エラーへ（標準出力はデコード結果だけにする）
+        decoder = EightKeyDecoder()
+        with contextlib.redirect_stdout(sys.stderr):
+            decoder.load_dictionary(dictionary_file, recompute_stats=args.stats, overlays=args.overlay)
+        run_batch(decoder, args.input, jsonl=args.jsonl, top_n=args.top_n)
+        return
     
-    dictionary_file = sys.argv[1]
+    # デコーダーを初期化（引数・対話モードでは予測候補も表示する）
+    decoder = EightKeyDecoder(predictive_k=DEFAULT_TOP_K)
+    decoder.load_dictionary(dictionary_file, recompute_stats=args.stats, overlays=args.overlay)
     
-    # デコーダーを初期化
-    decoder = EightKeyDecoder()
-    decoder.load_dictionary(dictionary_file)
+    if args.stats:
+        print_stats_details(decoder.stats)
+        if not args.input:
+            return
     
-    if len(sys.argv) >= 3:
+    if args.input:
         # コマンドライン引数から入力
-        eight_key_input = sys.argv[2]
-        candidates = decoder.decode(eight_key_input, top_n=10)
+        eight_key_input = args.input[0]
+        candidates = decoder.decode(eight_key_input, top_n=args.top_n)
         print(f"\n8キー入力: {eight_key_input}")
         print(f"候補:")
         for i, candidate in enumerate(candidates, 1):
             print(f"  {i}. {candidate}")
+        print_predictions(decoder, eight_key_input)
     else:
         # インタラクティブモード
         print("\n8キーデコーダー（インタラクティブモード）")
@@ -102,13 +275,14 @@ def main():
                 if not user_input:
                     continue
                 
-                candidates = decoder.decode(user_input, top_n=10)
+                candidates = decoder.decode(user_input, top_n=args.top_n)
                 if candidates:
                     print("候補:")
                     for i, candidate in enumerate(candidates, 1):
                         print(f"  {i}. {candidate}")
                 else:
                     print("  (候補が見つかりませんでした)")
+                print_predictions(decoder, user_input)
                 print()
                 
             except KeyboardInterrupt:
@@ -4,146 +4,773 @@
 既存の8key TSVファイルと頻度マッピングを結合してJSON形式で出力
 """
 
+import heapq
 import json
+import os
 import sys
+import tempfile
+import time
 from collections import defaultdict
 
+from eightkey_compiled import COMPILED_SUFFIX, create_temp_file, write_compiled_dictionary
+from eightkey_freqstore import load_frequency_map
+from eightkey_index import LATTICE_MARK
+from eightkey_sqlite import SQLITE_SUFFIX, SqliteDictWriter, write_sqlite_dictionary
+from eightkey_stats import (
+    DictionaryStats, compute_dictionary_stats, read_dictionary_metadata, write_dictionary_metadata,
+)
+
 
 def load_frequency_mapping(freq_json):
-    """頻度マッピングJSONを読み込む"""
-    with open(freq_json, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """
+    頻度マッピングを読み込む
+    頻度ストア（.8kf）ならmmapで開き、全体をdictとして読み込まない
+    """
+    return load_frequency_map(freq_json)
+
+
+def peak_rss_mb():
+    """このプロセス（と終了した子プロセス）の最大RSS（MB）"""
+    import resource
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return usage / 1024
+
+
+def iter_tsv_pairs(tsv_file):
+    """
+    8key TSVファイルから (8キー, 元の単語, ラティスか) を順に返す
+    3列目が "lattice" の行はラティス（8key_data_generator.py が日本語の表記ゆれをまとめた行）
+    """
+    with open(tsv_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            parts = line.split('\t')
+            if len(parts) == 2:
+                yield parts[0], parts[1], False
+            elif len(parts) == 3 and parts[2] == LATTICE_MARK:
+                yield parts[0], parts[1], True
+
+
+def merge_case_variant(existing, original_word, freq):
+    """
+    大文字小文字違いの同じ単語を統合（より頻度の高い方、または小文字を優先）
+
+    Args:
+        existing: これまでの {"word": ..., "freq": ...}
+
+    Returns:
+        dict: 統合後の {"word": ..., "freq": ...}（ラティスの印は引き継ぐ）
+    """
+    if freq > existing["freq"]:
+        # より高い頻度の形式を採用
+        merged = {"word": original_word, "freq": freq}
+    elif freq == existing["freq"] and original_word.islower():
+        # 同じ頻度なら小文字を優先
+        merged = {"word": original_word, "freq": existing["freq"]}
+    else:
+        return existing
+    if existing.get(LATTICE_MARK):
+        merged[LATTICE_MARK] = True
+    return merged
+
+
+def _candidate(word, freq, lattice):
+    """候補の {"word": ..., "freq": ...}（ラティスなら "lattice": true を付ける）"""
+    candidate = {"word": word, "freq": freq}
+    if lattice:
+        candidate[LATTICE_MARK] = True
+    return candidate
+
+
+def build_8key_dict(pairs, freq_map, default_freq=1):
+    """
+    (8キー, 元の単語, ラティスか) の列と頻度マッピングから8キー辞書を作る
+
+    Returns:
+        tuple: (8キー辞書, 総単語数, 頻度情報ありの行数)
+               辞書はパターン順、各パターンの候補は頻度順（同頻度は出現順）
+    """
+    total_words = 0
+    words_with_freq = 0
+
+    # 大文字小文字をマージするための一時辞書
+    word_tracker = {}  # (eight_key, word_lower) -> {"word": original, "freq": max_freq}
+
+    for eight_key, original_word, lattice in pairs:
+        original_word_lower = original_word.lower()
+
+        # 頻度を取得
+        freq = freq_map.get(original_word_lower, default_freq)
+
+        key = (eight_key, original_word_lower)
+        if key not in word_tracker:
+            word_tracker[key] = _candidate(original_word, freq, lattice)
+            total_words += 1
+        else:
+            # 既存のエントリと比較
+            word_tracker[key] = merge_case_variant(word_tracker[key], original_word, freq)
+            if lattice:
+                word_tracker[key][LATTICE_MARK] = True
+
+        if freq > 0:
+            words_with_freq += 1
+
+    # word_trackerから eight_key_dictに変換
+    grouped = defaultdict(list)
+    for (eight_key, _), word_data in word_tracker.items():
+        grouped[eight_key].append(word_data)
+
+    # 各8keyパターンの候補を頻度順にソート（降順）、パターンはソート順に並べる
+    eight_key_dict = {}
+    for eight_key in sorted(grouped):
+        candidates = grouped[eight_key]
+        candidates.sort(key=lambda x: x['freq'], reverse=True)
+        eight_key_dict[eight_key] = candidates
+
+    return eight_key_dict, total_words, words_with_freq
+
+
+def print_build_summary(total_words, words_with_freq):
+    print(f"処理完了: {total_words} 単語")
+    print(f"頻度情報あり: {words_with_freq} 単語 ({words_with_freq/total_words*100:.1f}%)")
+
+
+def print_collision_stats(stats):
+    """衝突統計を表示（stats: DictionaryStats）"""
+    total_patterns = stats.patterns
+    print(f"\n衝突統計:")
+    print(f"  ユニークパターン: {stats.unique_patterns} ({stats.unique_patterns/total_patterns*100:.1f}%)")
+    print(f"  衝突パターン: {stats.collision_patterns} ({stats.collision_patterns/total_patterns*100:.1f}%)")
+    print(f"  最大衝突数: {stats.max_collision} (パターン: {stats.max_collision_pattern})")
+
+    if stats.max_collision_pattern:
+        print(f"  最大衝突の候補: {stats.max_collision_words}")
+
+
+def _json_entry(eight_key, candidates):
+    """json.dump(indent=2) の出力のうち1パターン分の断片"""
+    text = json.dumps({eight_key: candidates}, ensure_ascii=False, indent=2)
+    return text[2:-2]  # 外側の "{\n" と "\n}" を除く
+
+
+class JsonDictWriter:
+    """
+    8キー辞書をパターンごとに追記してJSONを書く
+    出力は json.dump(eight_key_dict, ensure_ascii=False, indent=2) と同じバイト列になる
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def add(self, eight_key, candidates):
+        self.add_raw(_json_entry(eight_key, candidates))
+
+    def add_raw(self, fragment):
+        """_json_entry と同じ形式の断片をそのまま書く"""
+        self.f.write('{\n' if self.count == 0 else ',\n')
+        self.f.write(fragment)
+        self.count += 1
+
+    def close(self):
+        self.f.write('\n}' if self.count else '{}')
+
+
+def write_8key_dict(eight_key_dict, output_json, stats=None):
+    """
+    8キー辞書を保存（拡張子が .8kd ならコンパイル済み辞書、.8kdb ならSQLite辞書、それ以外はJSON）
+    統計（stats: DictionaryStats.to_dict() の値、Noneなら計算する）も一緒に保存する
+    """
+    if output_json.endswith(SQLITE_SUFFIX):
+        # SQLite形式で保存（メモリに読み込まずに引く巨大な辞書用、統計は書きながら集計する）
+        write_sqlite_dictionary(eight_key_dict, output_json)
+        return
+    if stats is None:
+        stats = compute_dictionary_stats(eight_key_dict)
+    if output_json.endswith(COMPILED_SUFFIX):
+        # コンパイル済み形式で保存（mmapで開く読み込み用、統計はヘッダーに入れる）
+        write_compiled_dictionary(eight_key_dict, output_json, meta={'stats': stats})
+    else:
+        # JSON形式で保存（統計はサイドカー）
+        with open(output_json, 'w', encoding='utf-8') as f:
+            json.dump(eight_key_dict, f, ensure_ascii=False, indent=2)
+        write_dictionary_metadata(output_json, stats)
 
 
 def create_8key_dict_with_freq(tsv_file, freq_map, output_json, default_freq=1):
     """
     8key TSVファイルと頻度マッピングを結合してJSON辞書を作成
-    
+
     Args:
         tsv_file: 8key TSVファイル (例: common_words_1000_8key.tsv)
         freq_map: 単語→頻度の辞書
-        output_json: 出力JSONファイル
+        output_json: 出力JSONファイル（拡張子が .8kd ならコンパイル済み辞書）
         default_freq: 頻度が見つからない場合のデフォルト値
-    
+
     出力形式:
     {
       "8key_pattern": [
         {"word": "word1", "freq": 12345},
         {"word": "word2", "freq": 6789}
+      ],
+      "{sjk|sk}jfjj": [
+        {"word": "新聞", "freq": 1, "lattice": true}
       ]
     }
     """
-    eight_key_dict = defaultdict(list)
-    total_words = 0
-    words_with_freq = 0
-    
     print(f"読み込み中: {tsv_file}")
-    
-    # 大文字小文字をマージするための一時辞書
-    word_tracker = {}  # (eight_key, word_lower) -> {"word": original, "freq": max_freq}
-    
-    with open(tsv_file, 'r', encoding='utf-8') as f:
+    return create_8key_dict_from_pairs(iter_tsv_pairs(tsv_file), freq_map, output_json, default_freq)
+
+
+def create_8key_dict_from_pairs(pairs, freq_map, output_json, default_freq=1):
+    """
+    (8キー, 元の単語, ラティスか) の列から辞書を作成して保存（統計も表示する）
+    8key_pipeline.py からTSVを経由せずに呼ばれる
+    """
+    eight_key_dict, total_words, words_with_freq = build_8key_dict(pairs, freq_map, default_freq)
+
+    print_build_summary(total_words, words_with_freq)
+
+    # 衝突統計
+    stats = DictionaryStats()
+    for eight_key, candidates in eight_key_dict.items():
+        stats.add(eight_key, candidates)
+    print_collision_stats(stats)
+
+    write_8key_dict(eight_key_dict, output_json, stats.to_dict())
+
+    print(f"\n保存完了: {output_json}")
+
+    return eight_key_dict
+
+
+# --- 外部ソートによる省メモリ生成 ---
+
+# 1レコード（パターン・単語・頻度など）あたりのおおよそのメモリ量（バイト）
+_RECORD_BYTES = 400
+# 一度にマージするランの数（開くファイル数の上限）
+_MERGE_FAN_IN = 128
+
+
+def _write_run(records, directory, index):
+    """ソート済みのレコードを一時ファイル（ラン）に書き出す"""
+    records.sort()
+    path = os.path.join(directory, f'run{index:06d}.tsv')
+    with open(path, 'w', encoding='utf-8') as f:
+        for eight_key, word_lower, seq, word, freq, lattice in records:
+            f.write(f'{eight_key}\t{word_lower}\t{seq}\t{word}\t{freq}\t{lattice}\n')
+    return path
+
+
+def _read_run(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            eight_key, word_lower, seq, word, freq, lattice = line.rstrip('\n').split('\t')
+            yield eight_key, word_lower, int(seq), word, int(freq), int(lattice)
+
+
+def _merge_runs(paths, directory):
+    """ランが多い場合は段階的にマージして、最後に全体のk-wayマージを返す"""
+    generation = 0
+    while len(paths) > _MERGE_FAN_IN:
+        merged = []
+        for i in range(0, len(paths), _MERGE_FAN_IN):
+            group = paths[i:i + _MERGE_FAN_IN]
+            out = os.path.join(directory, f'merge{generation:03d}_{i:06d}.tsv')
+            with open(out, 'w', encoding='utf-8') as f:
+                for eight_key, word_lower, seq, word, freq, lattice in heapq.merge(*map(_read_run, group)):
+                    f.write(f'{eight_key}\t{word_lower}\t{seq}\t{word}\t{freq}\t{lattice}\n')
+            for path in group:
+                os.remove(path)
+            merged.append(out)
+        paths = merged
+        generation += 1
+    return heapq.merge(*map(_read_run, paths))
+
+
+def _merge_patterns(records):
+    """
+    (パターン, 小文字の単語, 出現順, 単語, 頻度, ラティスか) の昇順の列から、
+    大文字小文字を統合して頻度順に並べた (パターン, 候補リスト) を順に返す
+    """
+    current_key = None      # (eight_key, word_lower)
+    current = None          # [first_seq, {"word", "freq"}]
+    pattern = None
+    candidates = []         # [(first_seq, {"word", "freq"}), ...]
+    for eight_key, word_lower, seq, word, freq, lattice in records:
+        if (eight_key, word_lower) == current_key:
+            current[1] = merge_case_variant(current[1], word, freq)
+            if lattice:
+                current[1][LATTICE_MARK] = True
+            continue
+
+        if eight_key != pattern:
+            if pattern is not None:
+                # 頻度の降順、同頻度は最初の出現順（インメモリ版の安定ソートと同じ）
+                candidates.sort(key=lambda c: (-c[1]['freq'], c[0]))
+                yield pattern, [c[1] for c in candidates]
+            pattern = eight_key
+            candidates = []
+        current_key = (eight_key, word_lower)
+        current = [seq, _candidate(word, freq, lattice)]
+        candidates.append(current)
+    if pattern is not None:
+        candidates.sort(key=lambda c: (-c[1]['freq'], c[0]))
+        yield pattern, [c[1] for c in candidates]
+
+
+def create_8key_dict_external(tsv_file, freq_map, output_json, default_freq=1,
+                              max_memory_mb=256, tmp_dir=None):
+    """
+    外部ソートで8キー辞書を作成（巨大なTSV向け）
+
+    レコードをメモリ上限までためてソート済みのランとして一時ファイルに書き出し、
+    (パターン, 小文字の単語, 出現順) でk-wayマージしながら大文字小文字の統合と
+    頻度順の並べ替えを行ってJSON（拡張子が .8kdb ならSQLite辞書）を書く
+    統合規則・候補の並びは create_8key_dict_with_freq と同じで、出力も同じバイト列になる
+
+    Args:
+        max_memory_mb: ランにためるレコードのメモリ上限（MB）
+        tmp_dir: 一時ファイルを置くディレクトリ（Noneならシステムの既定）
+    """
+    if output_json.endswith(COMPILED_SUFFIX):
+        raise ValueError("外部ソートモードはJSON・SQLite出力のみ対応しています（.8kdは eightkey_compiled.py で変換してください）")
+
+    print(f"読み込み中: {tsv_file} (外部ソート, メモリ上限 {max_memory_mb}MB)")
+    run_size = max(1000, max_memory_mb * 1024 * 1024 // _RECORD_BYTES)
+
+    total_lines = 0
+    words_with_freq = 0
+    with tempfile.TemporaryDirectory(prefix='8key_build_', dir=tmp_dir) as directory:
+        # 1. ソート済みランの書き出し
+        runs = []
+        records = []
+        for seq, (eight_key, original_word, lattice) in enumerate(iter_tsv_pairs(tsv_file)):
+            original_word_lower = original_word.lower()
+            freq = freq_map.get(original_word_lower, default_freq)
+            records.append((eight_key, original_word_lower, seq, original_word, freq, int(lattice)))
+            total_lines += 1
+            if freq > 0:
+                words_with_freq += 1
+            if len(records) >= run_size:
+                runs.append(_write_run(records, directory, len(runs)))
+                records = []
+        if records:
+            runs.append(_write_run(records, directory, len(runs)))
+            records = []
+        print(f"ラン: {len(runs)}個 ({total_lines:,}行)")
+
+        # 2. k-wayマージしながら統合して書く
+        stats = DictionaryStats()
+        patterns = _merge_patterns(_merge_runs(runs, directory))
+        if output_json.endswith(SQLITE_SUFFIX):
+            writer = SqliteDictWriter(output_json)
+            try:
+                for pattern, candidates in patterns:
+                    writer.add(pattern, candidates)
+                    stats.add(pattern, candidates)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.close()
+        else:
+            with open(output_json, 'w', encoding='utf-8') as f:
+                writer = JsonDictWriter(f)
+                for pattern, candidates in patterns:
+                    writer.add(pattern, candidates)
+                    stats.add(pattern, candidates)
+                writer.close()
+            write_dictionary_metadata(output_json, stats.to_dict())
+
+    print_build_summary(stats.total_words, words_with_freq)
+    print_collision_stats(stats)
+    print(f"\n保存完了: {output_json}")
+
+
+# --- 差分TSVによる更新 ---
+
+def load_delta(delta_file):
+    """
+    差分TSVを読み込む
+
+    各行は "8キー<TAB>単語"（追加）、"+<TAB>8キー<TAB>単語"（追加）、
+    "-<TAB>8キー<TAB>単語"（削除）のいずれか
+    追加の行は末尾に "<TAB>lattice" を付けるとラティスとして追加する（8key TSVと同じ）
+    削除は (8キー, 小文字の単語) の候補をすべて取り除く
+
+    Returns:
+        tuple: (削除 {8キー: {小文字の単語, ...}}, 追加 [(8キー, 単語, ラティスか), ...]（ファイル順）)
+    """
+    removals = defaultdict(set)
+    additions = []
+    with open(delta_file, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            
+
             parts = line.split('\t')
-            if len(parts) == 2:
-                eight_key, original_word = parts
-                original_word_lower = original_word.lower()
-                
-                # 頻度を取得
-                freq = freq_map.get(original_word_lower, default_freq)
-                
-                # 大文字小文字をマージ（より頻度の高い方、または小文字を優先）
-                key = (eight_key, original_word_lower)
-                if key not in word_tracker:
-                    word_tracker[key] = {
-                        "word": original_word,
-                        "freq": freq
-                    }
-                    total_words += 1
-                else:
-                    # 既存のエントリと比較
-                    existing = word_tracker[key]
-                    if freq > existing["freq"]:
-                        # より高い頻度の形式を採用
-                        word_tracker[key] = {
-                            "word": original_word,
-                            "freq": freq
-                        }
-                    elif freq == existing["freq"] and original_word.islower():
-                        # 同じ頻度なら小文字を優先
-                        word_tracker[key]["word"] = original_word
-                
-                if freq > 0:
-                    words_with_freq += 1
-    
-    # word_trackerから eight_key_dictに変換
-    for (eight_key, _), word_data in word_tracker.items():
-        eight_key_dict[eight_key].append(word_data)
-    
-    # 各8keyパターンの候補を頻度順にソート（降順）
-    for eight_key in eight_key_dict:
-        eight_key_dict[eight_key].sort(key=lambda x: x['freq'], reverse=True)
-    
-    print(f"処理完了: {total_words} 単語")
-    print(f"頻度情報あり: {words_with_freq} 単語 ({words_with_freq/total_words*100:.1f}%)")
-    
-    # 衝突統計
-    unique_patterns = 0
-    collision_patterns = 0
-    max_collision = 0
-    max_collision_pattern = None
-    
-    for eight_key, candidates in eight_key_dict.items():
-        if len(candidates) == 1:
-            unique_patterns += 1
+            lattice = False
+            if len(parts) == 4 and parts[0] == '+' and parts[3] == LATTICE_MARK:
+                op, eight_key, word = parts[:3]
+                lattice = True
+            elif len(parts) == 3 and parts[0] in ('+', '-'):
+                op, eight_key, word = parts
+            elif len(parts) == 3 and parts[2] == LATTICE_MARK:
+                op = '+'
+                eight_key, word = parts[:2]
+                lattice = True
+            elif len(parts) == 2:
+                op = '+'
+                eight_key, word = parts
+            else:
+                continue
+            if op == '-':
+                removals[eight_key].add(word.lower())
+            else:
+                additions.append((eight_key, word, lattice))
+    return removals, additions
+
+
+class _JsonDictText:
+    """
+    json.dump(indent=2) で書かれた8キー辞書のテキスト上での検索
+
+    パターンはソート順に並んでおり、各パターンの断片は行頭の '  "' から始まるので
+    テキスト上の位置で二分探索して、解析せずに目的のパターンの断片を見つける
+    """
+
+    def __init__(self, text):
+        if text.strip() == '{}':
+            text = '{\n\n}'
+        if not (text.startswith('{\n') and text.endswith('\n}')):
+            raise ValueError("json.dump(indent=2) 形式の辞書ではありません")
+        self.text = text
+        self.begin = 2               # 最初の断片の位置
+        self.end = len(text) - 2     # 最後の断片の終わり
+
+    def is_sorted(self):
+        """パターンが重複なく昇順に並んでいるか（パターンを昇順に書き出すようになる前に生成した辞書は並んでいない）"""
+        previous = None
+        start = self.next_start(self.begin)
+        while start != self.end:
+            key = self.key_at(start)
+            if previous is not None and key <= previous:
+                return False
+            previous = key
+            start = self.next_start(start + 1)
+        return True
+
+    def next_start(self, pos):
+        """pos以降で最初に始まる断片の位置（なければ end）"""
+        i = self.text.find('\n  "', pos - 1, self.end)
+        return self.end if i < 0 else i + 1
+
+    def key_at(self, start):
+        raw = self.text[start + 3:self.text.index('": [', start)]
+        return json.loads(f'"{raw}"') if '\\' in raw else raw
+
+    def fragment_end(self, start):
+        """start から始まる断片の終わり（後ろの ",\n" は含まない）"""
+        following = self.next_start(start + 1)
+        return following if following == self.end else following - 2
+
+    def lower_bound(self, eight_key, lo):
+        """lo以降で eight_key 以上のパターンが始まる位置（なければ end）"""
+        hi = self.end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.next_start(mid)
+            if start == self.end or self.key_at(start) >= eight_key:
+                hi = mid
+            else:
+                lo = start + 1
+        return self.next_start(lo)
+
+    def region(self, begin, end):
+        """begin から end までの断片の並び（前後の区切りは含まない）"""
+        chunk = self.text[begin:end]
+        return chunk[:-2] if chunk.endswith(',\n') else chunk
+
+
+def _apply_delta(candidates, removed, added, freq_map, default_freq):
+    """
+    1パターンの候補リストに差分を適用して頻度順に並べ直す
+
+    既存の候補は（頻度の降順, 出現順）に並んでいるので、追加分を末尾に足して
+    安定ソートすれば全体を作り直した場合と同じ並びになる
+    """
+    if removed:
+        candidates = [c for c in candidates if c['word'].lower() not in removed]
+    positions = {c['word'].lower(): i for i, c in enumerate(candidates)}
+    for original_word, lattice in added:
+        original_word_lower = original_word.lower()
+        freq = freq_map.get(original_word_lower, default_freq)
+        i = positions.get(original_word_lower)
+        if i is None:
+            positions[original_word_lower] = len(candidates)
+            candidates.append(_candidate(original_word, freq, lattice))
         else:
-            collision_patterns += 1
-            if len(candidates) > max_collision:
-                max_collision = len(candidates)
-                max_collision_pattern = eight_key
-    
-    total_patterns = unique_patterns + collision_patterns
-    print(f"\n衝突統計:")
-    print(f"  ユニークパターン: {unique_patterns} ({unique_patterns/total_patterns*100:.1f}%)")
-    print(f"  衝突パターン: {collision_patterns} ({collision_patterns/total_patterns*100:.1f}%)")
-    print(f"  最大衝突数: {max_collision} (パターン: {max_collision_pattern})")
-    
-    if max_collision_pattern:
-        print(f"  最大衝突の候補: {[c['word'] for c in eight_key_dict[max_collision_pattern]]}")
-    
-    # JSON形式で保存
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(eight_key_dict, f, ensure_ascii=False, indent=2)
-    
-    print(f"\n保存完了: {output_json}")
-    
-    return eight_key_dict
+            candidates[i] = merge_case_variant(candidates[i], original_word, freq)
+            if lattice:
+                candidates[i][LATTICE_MARK] = True
+    candidates.sort(key=lambda x: x['freq'], reverse=True)
+    return candidates
+
+
+def update_8key_dict(base_json, delta_file, freq_map, output_json=None, default_freq=1):
+    """
+    既存のJSON辞書に差分TSVを適用する
+
+    差分に含まれるパターンだけを二分探索で見つけて解析・並べ直し、
+    その間のパターンは解析せずに元のテキストをそのまま書き写す
+    結果は「元のTSVから削除分を除き、追加分を末尾に足したTSV」で
+    create_8key_dict_with_freq を実行した場合と同じバイト列になる
+
+    Args:
+        base_json: 既存の辞書（このスクリプトで生成したJSON）
+        delta_file: 差分TSV（load_delta を参照）
+        output_json: 出力先（Noneなら base_json を置き換える）
+    """
+    if (base_json.endswith((COMPILED_SUFFIX, SQLITE_SUFFIX)) or
+            (output_json or '').endswith((COMPILED_SUFFIX, SQLITE_SUFFIX))):
+        raise ValueError("差分更新はJSON辞書のみ対応しています（.8kd・.8kdbは更新後に eightkey_compiled.py・eightkey_sqlite.py で変換してください）")
+    output_json = output_json or base_json
+
+    start = time.perf_counter()
+    removals, additions = load_delta(delta_file)
+    added = defaultdict(list)
+    for eight_key, original_word, lattice in additions:
+        added[eight_key].append((original_word, lattice))
+    touched = sorted(set(removals) | set(added))
+    print(f"差分: 追加 {len(additions)} 行, 削除 {sum(len(s) for s in removals.values())} 語, "
+          f"対象パターン {len(touched)} 個")
+
+    def merged(eight_key, candidates):
+        return _apply_delta(candidates, removals.get(eight_key), added.get(eight_key, ()),
+                            freq_map, default_freq)
+
+    with open(base_json, 'r', encoding='utf-8') as f:
+        base = _JsonDictText(f.read())
+    if not base.is_sorted():
+        # 二分探索できないので、一度解析してパターン順に並べ直したテキストから更新する
+        print("元の辞書のパターンが並んでいないため、並べ直してから更新します")
+        eight_key_dict = json.loads(base.text)
+        base = _JsonDictText(json.dumps({k: eight_key_dict[k] for k in sorted(eight_key_dict)},
+                                        ensure_ascii=False, indent=2))
+    # 統計は元の辞書のサイドカーから対象パターンの分だけ差し引き・加算する
+    metadata = read_dictionary_metadata(base_json)
+    stats = DictionaryStats.from_dict(metadata['stats']) if metadata else None
+
+    fd, tmp_path = create_temp_file(output_json)
+    changed = 0
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fout:
+            writer = JsonDictWriter(fout)
+            cursor = base.begin
+            for eight_key in touched:
+                # 対象パターンの手前までは元のテキストをそのまま書き写す
+                pos = base.lower_bound(eight_key, cursor)
+                copied = base.region(cursor, pos)
+                if copied:
+                    writer.add_raw(copied)
+                cursor = pos
+
+                existing = []
+                if pos != base.end and base.key_at(pos) == eight_key:
+                    end = base.fragment_end(pos)
+                    existing = json.loads('{' + base.text[pos:end] + '}')[eight_key]
+                    cursor = end if end == base.end else end + 2
+                n_existing = len(existing)  # merged は existing に追加することがある
+                candidates = merged(eight_key, existing)
+                if stats is not None and n_existing:
+                    if eight_key == stats.max_collision_pattern and len(candidates) < n_existing:
+                        stats = None  # 最大衝突が減ったので後で集計し直す
+                    else:
+                        stats.remove(eight_key, n_existing)
+                if candidates:
+                    writer.add(eight_key, candidates)
+                    if stats is not None:
+                        stats.merge(eight_key, candidates)
+                changed += 1
+            copied = base.region(cursor, base.end)
+            if copied:
+                writer.add_raw(copied)
+            writer.close()
+        os.replace(tmp_path, output_json)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    if stats is None:
+        print("統計を集計し直しています...")
+        with open(output_json, 'r', encoding='utf-8') as f:
+            write_dictionary_metadata(output_json, compute_dictionary_stats(json.load(f)))
+    else:
+        write_dictionary_metadata(output_json, stats.to_dict())
+
+    elapsed = time.perf_counter() - start
+    print(f"更新完了: {changed} パターンを再計算 ({elapsed:.2f}秒)")
+    print(f"保存完了: {output_json}")
+
+
+# --- 複数の辞書をまとめて生成 ---
+
+_worker_freq_map = None
+
+
+def _init_build_worker(freq_map):
+    """ワーカープロセスの初期化（頻度マッピングは親で1回だけ読み込んだものを受け取る）"""
+    global _worker_freq_map
+    _worker_freq_map = freq_map
+
+
+def build_target(tsv_file, output_json, freq_map=None, default_freq=1):
+    """
+    1つのTSVから辞書を生成して保存し、工程ごとの時間を返す
+
+    Returns:
+        dict: output, patterns, words, build（読み込み・構築の秒数）, write（保存の秒数）
+    """
+    if freq_map is None:
+        freq_map = _worker_freq_map
+    start = time.perf_counter()
+    eight_key_dict, total_words, _ = build_8key_dict(iter_tsv_pairs(tsv_file), freq_map, default_freq)
+    built = time.perf_counter()
+    write_8key_dict(eight_key_dict, output_json)
+    written = time.perf_counter()
+    return {
+        'output': output_json,
+        'patterns': len(eight_key_dict),
+        'words': total_words,
+        'build': built - start,
+        'write': written - built,
+    }
+
+
+def parse_target(spec):
+    """'TSV' または 'TSV:出力' を (TSV, 出力) にする（出力の既定は *_8key.tsv -> *.json）"""
+    tsv_file, sep, output_json = spec.partition(':')
+    if not sep:
+        output_json = tsv_file.replace('_8key.tsv', '.json')
+    if output_json == tsv_file:
+        raise ValueError(f"出力ファイル名を決められません: {spec}（TSV:出力 の形で指定してください）")
+    return tsv_file, output_json
+
+
+def build_targets(targets, freq_map, workers=None):
+    """
+    複数の (TSV, 出力) をワーカープロセスで並列に生成する
+
+    頻度マッピングは呼び出し側で1回だけ読み込み、各ワーカーの初期化時に渡す
+
+    Returns:
+        list: targets と同じ順の build_target の結果
+    """
+    if workers is None:
+        workers = min(len(targets), os.cpu_count() or 1)
+    if workers <= 1:
+        return [build_target(tsv_file, output_json, freq_map) for tsv_file, output_json in targets]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_build_worker,
+                             initargs=(freq_map,)) as pool:
+        futures = [pool.submit(build_target, tsv_file, output_json) for tsv_file, output_json in targets]
+        return [future.result() for future in futures]
+
+
+def main_multi(argv):
+    """--multi: 頻度マッピングを共有して複数の辞書を一度に生成"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='8key_dict_with_freq.py --multi',
+        description='頻度マッピングを1回だけ読み込んで複数の8キー辞書を並列に生成')
+    parser.add_argument('freq_json', help='頻度マッピング（JSON または頻度ストア .8kf）')
+    parser.add_argument('targets', nargs='+', metavar='TSV[:OUTPUT]',
+                        help='8key TSVファイル（出力の既定は *_8key.tsv -> *.json）')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='並列ワーカー数（0で対象数とCPU数の小さい方、デフォルト: 0）')
+    args = parser.parse_args(argv)
+    targets = [parse_target(spec) for spec in args.targets]
+
+    print("=" * 60)
+    print("頻度情報付き8キー辞書生成（複数）")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    freq_map = load_frequency_mapping(args.freq_json)
+    loaded = time.perf_counter()
+    print(f"頻度マッピング読み込み: {len(freq_map)} 単語 ({loaded - start:.2f}秒)\n")
+
+    results = build_targets(targets, freq_map, args.workers or None)
+    elapsed = time.perf_counter() - start
+
+    width = max(len(r['output']) for r in results)
+    print(f"{'出力':<{width}} {'単語数':>9} {'パターン数':>9} {'構築':>8} {'保存':>8} {'合計':>8}")
+    for r in results:
+        print(f"{r['output']:<{width}} {r['words']:>9,} {r['patterns']:>9,} "
+              f"{r['build']:>7.2f}s {r['write']:>7.2f}s {r['build'] + r['write']:>7.2f}s")
+    print(f"\n全体: {elapsed:.2f}秒 (頻度マッピング {loaded - start:.2f}秒, "
+          f"各辞書の合計 {sum(r['build'] + r['write'] for r in results):.2f}秒)")
+    print(f"最大RSS: {peak_rss_mb():.1f}MB（ワーカーを含む）")
 
 
 def main():
+    import argparse
+
+    if sys.argv[1:2] == ['--multi']:
+        main_multi(sys.argv[2:])
+        return
+
     if len(sys.argv) < 3:
-        print("Usage: python 8key_dict_with_freq.py <8key.tsv> <freq_mapping.json> [output.json]")
+        print("Usage: python 8key_dict_with_freq.py <8key.tsv> <freq_mapping.json> [output.json] [--max-memory MB] [--update base.json]")
         print("例: python 8key_dict_with_freq.py common_words_1000_8key.tsv freq_mapping.json common_words_1000.json")
+        print("    python 8key_dict_with_freq.py linux_words_8key.tsv freq_mapping.json linux_words.8kd  # コンパイル済み辞書")
+        print("    python 8key_dict_with_freq.py huge_8key.tsv freq_mapping.json huge.8kdb --max-memory 512  # SQLite辞書")
+        print("    python 8key_dict_with_freq.py huge_8key.tsv freq_mapping.json huge.json --max-memory 512  # 外部ソート")
+        print("    python 8key_dict_with_freq.py delta_8key.tsv freq_mapping.json --update linux_words.json  # 差分更新")
+        print("    python 8key_dict_with_freq.py --multi freq_mapping.json linux_words_8key.tsv common_words_3000_8key.tsv  # 複数を並列生成")
         return
-    
-    tsv_file = sys.argv[1]
-    freq_json = sys.argv[2]
-    output_json = sys.argv[3] if len(sys.argv) >= 4 else tsv_file.replace('_8key.tsv', '.json')
-    
+
+    parser = argparse.ArgumentParser(description='頻度情報付き8キー辞書生成')
+    parser.add_argument('tsv_file', help='8key TSVファイル')
+    parser.add_argument('freq_json', help='頻度マッピング（JSON または頻度ストア .8kf）')
+    parser.add_argument('output_json', nargs='?', help='出力ファイル（.json / .8kd / .8kdb）')
+    parser.add_argument('--max-memory', type=int, metavar='MB',
+                        help='外部ソートで生成し、作業メモリをこの上限（MB）に抑える')
+    parser.add_argument('--tmp-dir', help='外部ソートの一時ファイルを置くディレクトリ')
+    parser.add_argument('--update', metavar='BASE_JSON',
+                        help='既存の辞書に差分TSV（"-<TAB>8キー<TAB>単語" で削除）を適用する（出力の既定はBASE_JSON）')
+    args = parser.parse_args()
+
+    tsv_file = args.tsv_file
+    freq_json = args.freq_json
+    output_json = args.output_json or args.update or tsv_file.replace('_8key.tsv', '.json')
+
     print("=" * 60)
     print("頻度情報付き8キー辞書生成")
     print("=" * 60)
-    
+
     # 頻度マッピングを読み込み
     freq_map = load_frequency_mapping(freq_json)
     print(f"頻度マッピング読み込み: {len(freq_map)} 単語\n")
-    
+
     # 8キー辞書を作成
-    create_8key_dict_with_freq(tsv_file, freq_map, output_json)
+    if args.update:
+        update_8key_dict(args.update, tsv_file, freq_map, output_json)
+    elif args.max_memory:
+        create_8key_dict_external(tsv_file, freq_map, output_json,
+                                  max_memory_mb=args.max_memory, tmp_dir=args.tmp_dir)
+    else:
+        create_8key_dict_with_freq(tsv_file, freq_map, output_json)
+
+    print(f"最大RSS: {peak_rss_mb():.1f}MB")
 
 
 if __name__ == '__main__':
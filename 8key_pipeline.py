@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+8キー辞書生成パイプライン
+単語リストから8キー変換・頻度付与・辞書生成までを1回で行う
+
+8key_data_generator.py でTSVを書き出してから 8key_dict_with_freq.py で読み直す代わりに、
+変換結果の (8キー, 単語) をそのまま辞書生成に渡すので中間ファイルの書き込みと再解析がない
+出力は2段階で生成した場合と同じ辞書になる
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+generator = importlib.import_module('8key_data_generator')
+builder = importlib.import_module('8key_dict_with_freq')
+
+
+class PairStream:
+    """
+    入力テキストを変換して (8キー, 単語, ラティスか) を順に返す
+    tee_tsv を指定すると同じ内容をTSVにも書き出す（デバッグ用）
+    """
+
+    def __init__(self, fin, workers=1, chunk_size=2000, lattice=True,
+                 memo_size=generator.DEFAULT_MEMO_SIZE, romaji_cache=None, tee=None):
+        self.fin = fin
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.lattice = lattice
+        self.memo_size = memo_size
+        self.romaji_cache = romaji_cache
+        self.tee = tee
+        self.lines = 0
+        self.pairs = 0
+        self.cache_stats = {'memo_hits': 0, 'disk_hits': 0, 'converted': 0}
+
+    def __iter__(self):
+        chunks = generator.iter_chunks(self.fin, self.chunk_size)
+        # 辞書の同頻度の並びは出現順で決まるので、並列でも入力順を保つ
+        converted_chunks = generator.iter_converted(
+            chunks, self.workers, ordered=True, memo_size=self.memo_size,
+            romaji_cache=self.romaji_cache, lattice=self.lattice)
+        for results, chunk_stats in converted_chunks:
+            for key, value in chunk_stats.items():
+                self.cache_stats[key] += value
+            self.lines += len(results)
+            for line, _, unique_converted, is_lattice in results:
+                mark = f'\t{generator.LATTICE_MARK}' if is_lattice else ''
+                for converted in unique_converted:
+                    if self.tee is not None:
+                        self.tee.write(f'{converted}\t{line}{mark}\n')
+                    self.pairs += 1
+                    yield converted, line, is_lattice
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Usage: python 8key_pipeline.py <input.txt> <freq_mapping.json> <output.json> [--workers N] [--tee-tsv out.tsv]")
+        print("例: python 8key_pipeline.py linux_words.txt freq_mapping.json linux_words.json")
+        print("    python 8key_pipeline.py linux_words.txt freq_mapping.json linux_words.8kd --workers 4")
+        return
+
+    parser = argparse.ArgumentParser(description='単語リストから頻度情報付き8キー辞書を直接生成')
+    parser.add_argument('infile', help='入力テキスト（1行1単語/文）')
+    parser.add_argument('freq_json', help='頻度マッピングJSON')
+    parser.add_argument('output_json', help='出力ファイル（.json または .8kd）')
+    parser.add_argument('--tee-tsv', metavar='PATH',
+                        help='中間の8キーTSVも書き出す（8key_data_generator.py の出力と同じ）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='並列ワーカー数（0でCPU数、デフォルト: 1）')
+    parser.add_argument('--chunk-size', type=int, default=2000,
+                        help='1タスクあたりの行数（デフォルト: 2000）')
+    parser.add_argument('--expand', action='store_true',
+                        help='日本語の表記ゆれをラティスにせず、展開して出力する（最大50通り）')
+    parser.add_argument('--memo-size', type=int, default=generator.DEFAULT_MEMO_SIZE,
+                        help=f'ローマ字変換のメモリキャッシュ件数（デフォルト: {generator.DEFAULT_MEMO_SIZE}）')
+    parser.add_argument('--romaji-cache', metavar='PATH',
+                        help='実行をまたいで使うローマ字変換キャッシュ（SQLiteファイル）')
+    args = parser.parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    print("=" * 60)
+    print("8キー辞書生成パイプライン")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    freq_map = builder.load_frequency_mapping(args.freq_json)
+    loaded = time.perf_counter()
+    print(f"頻度マッピング読み込み: {len(freq_map)} 単語 ({loaded - start:.2f}秒)\n")
+
+    tee = open(args.tee_tsv, 'w', encoding='utf-8') if args.tee_tsv else None
+    try:
+        with open(args.infile, encoding='utf-8') as fin:
+            stream = PairStream(fin, workers, args.chunk_size, lattice=not args.expand,
+                                memo_size=args.memo_size, romaji_cache=args.romaji_cache, tee=tee)
+            print(f"変換中: {args.infile} (ワーカー: {workers})")
+            builder.create_8key_dict_from_pairs(stream, freq_map, args.output_json)
+    finally:
+        if tee is not None:
+            tee.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n入力: {stream.lines:,}行 → {stream.pairs:,}ペア")
+    print(f"処理時間: {elapsed:.2f}秒 (頻度マッピング {loaded - start:.2f}秒, "
+          f"変換・辞書生成・保存 {elapsed - (loaded - start):.2f}秒)")
+    if args.tee_tsv:
+        print(f"中間TSV: {args.tee_tsv}")
+
+    lookups = sum(stream.cache_stats.values())
+    if lookups:
+        hits = stream.cache_stats['memo_hits'] + stream.cache_stats['disk_hits']
+        print(f"ローマ字変換キャッシュ: ヒット率 {hits / lookups * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,62 +4,199 @@
 ターミナル上でIME風の8キー入力を実現（リアルタイム版）
 """
 
-import json
-import sys
+import argparse
 import os
 import curses
+import threading
+import time
+
+from eightkey_dictionary import (
+    completion_index_for, lattice_index_for, lookup_words, open_layered_dictionary, stored_dictionary_stats,
+)
+from eightkey_index import DEFAULT_TOP_K
+from eightkey_learning import AdaptiveRanker, SelectionLog
+from eightkey_reload import DictionaryWatcher, dictionary_sources
+
+# 辞書の読み込み中に画面を描き直す間隔（ミリ秒）
+LOADING_REDRAW_MS = 50
+# 辞書ファイルを監視しているときに、キー入力を待ちながら再読み込みを確認する間隔（ミリ秒）
+WATCH_POLL_MS = 200
+BACKSPACE_KEYS = (curses.KEY_BACKSPACE, 127, 8)
 
 
 class EightKeyShell:
-    def __init__(self, dictionary_file):
+    def __init__(self, dictionary_file, predictive_k=DEFAULT_TOP_K, overlays=(),
+                 selections_file=None, background=False, watch=False):
+        """
+        Args:
+            selections_file: 確定した候補を記録するファイル（指定したときだけ学習する）
+            background: Trueなら辞書は run() で画面を出してから別スレッドで読み込む
+                        （読み込み中のキー入力は溜めておき、読み込みが終わってから処理する）
+            watch: Trueなら辞書ファイルを監視し、作り直されたら別スレッドで読み込んで
+                   キー入力の合間に入れ替える（入力中のテキストはそのまま）
+        """
+        self.started = time.perf_counter()
+        self.timings = {}  # 起動からの秒数（first_paint / ready / first_candidate）
+        self.dictionary_file = dictionary_file
+        self.overlays = list(overlays)
         self.dictionary = {}
-        self.load_dictionary(dictionary_file)
+        self.completion_index = None
+        self.lattice_index = None  # 日本語の表記ゆれ（ラティス）パターン
+        self.predictive_k = predictive_k  # 予測候補の表示件数（0なら予測しない）
+        self.ready = threading.Event()  # 辞書の読み込みが終わった（失敗した場合も）
+        self.load_error = None
+        self.load_messages = []  # バックグラウンドで読み込んだときの表示（終了後に表示する）
+        self.pending_keys = []  # 読み込み中に押された確定・選択などのキー
+        self.watcher = None
+        if watch:
+            self.watcher = DictionaryWatcher(
+                dictionary_sources(dictionary_file) + self.overlays,
+                lambda log: self._open_dictionary(dictionary_file, self.overlays, log))
+        self.reload_messages = []  # 再読み込みの記録（読み込み・入れ替えの時間）
+        # 確定した候補を記録して次回から先頭に寄せる（Noneなら学習しない）
+        self.ranker = None
+        if selections_file:
+            self.ranker = AdaptiveRanker(SelectionLog(selections_file))
         self.valid_keys = set('asdfjkl;')
         self.confirmed_text = []
         self.current_word = ""
         self.candidates = []
+        self.predictions = []  # 予測候補 [(word, pattern, freq), ...]
         self.selected_index = 0
+        if not background:
+            self.load_dictionary(dictionary_file, self.overlays)
+        
+    def load_dictionary(self, json_file, overlays=(), log=print):
+        """
+        辞書を読み込む（overlays の辞書は上に重ね、候補は引いたときに統合する）
         
-    def load_dictionary(self, json_file):
-        """辞書を読み込む"""
-        print(f"辞書を読み込んでいます: {json_file}")
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.dictionary = json.load(f)
+        辞書・ラティス・予測候補を揃えてから入れ替え、ready を立てる（別スレッドから呼べる）
+        読み込み中の表示は log に渡す
+        """
+        log(f"辞書を読み込んでいます: {json_file}")
+        start = time.perf_counter()
+        dictionary, lattice_index, completion_index = self._open_dictionary(json_file, overlays, log)
+        self.dictionary = dictionary
+        self.lattice_index = lattice_index
+        self.completion_index = completion_index
         
-        total_patterns = len(self.dictionary)
-        total_words = sum(len(candidates) for candidates in self.dictionary.values())
-        unique = sum(1 for candidates in self.dictionary.values() if len(candidates) == 1)
+        # 統計は辞書生成時に保存されたものを表示する（辞書全体はたどらない、重ねた場合は基本の辞書の統計）
+        stats = stored_dictionary_stats(json_file, dictionary)
         
-        print(f"✓ 読み込み完了")
-        print(f"  総パターン: {total_patterns:,}")
-        print(f"  総単語数: {total_words:,}")
-        print(f"  ユニーク: {unique} ({unique/total_patterns*100:.1f}%)")
-        print()
+        log(f"✓ 読み込み完了 ({time.perf_counter() - start:.2f}秒)")
+        log(f"  総パターン: {len(dictionary):,}")
+        if overlays:
+            for overlay, layer in zip(overlays, dictionary.layers[1:]):
+                log(f"  重ね合わせ: {overlay} ({len(layer):,}パターン)")
+        if stats:
+            log(f"  総単語数: {stats['total_words']:,}")
+            log(f"  ユニーク: {stats['unique_patterns']} ({stats['unique_patterns']/stats['patterns']*100:.1f}%)")
+        else:
+            log(f"  統計情報なし（python3 8key_decoder.py {json_file} --stats で集計）")
+        
+        if completion_index:
+            log(f"  {completion_index.summary()}")
+        if self.ranker:
+            selections = self.ranker.log
+            log(f"  選択の学習: {selections.entries:,}件 ({selections.path})")
+        log("")
+        self._elapsed('ready')
+        self.ready.set()
+    
+    def _open_dictionary(self, json_file, overlays, log=print):
+        """辞書・ラティス・予測候補を揃えて返す（別スレッドから呼べる）"""
+        dictionary = open_layered_dictionary(json_file, overlays, log=log)
+        lattice_index = lattice_index_for(dictionary)
+        completion_index = None
+        if self.predictive_k:
+            completion_index = completion_index_for(dictionary, self.predictive_k)
+        return dictionary, lattice_index, completion_index
+    
+    def apply_reload(self, result):
+        """再読み込みした辞書に入れ替える（キー入力の合間にメインスレッドで呼ぶ）"""
+        now = time.strftime('%H:%M:%S')
+        if result.error:
+            self.reload_messages.append(f"[{now}] 辞書を再読み込みできませんでした: {result.error}")
+            return
+        start = time.perf_counter()
+        self.dictionary, self.lattice_index, self.completion_index = result.state
+        self.update_candidates()
+        swap = time.perf_counter() - start
+        self.reload_messages.append(f"[{now}] 辞書を再読み込みしました "
+                                    f"(読み込み {result.seconds:.2f}秒, 入れ替え {swap * 1000:.1f}ms)")
+    
+    def start_loading(self):
+        """辞書を別スレッドで読み込み始める"""
+        def load():
+            # 読み込み中の表示は curses の画面を崩さないように溜めておき、終了後に表示する
+            try:
+                self.load_dictionary(self.dictionary_file, self.overlays, log=self.load_messages.append)
+            except Exception as e:
+                self.load_error = e
+            finally:
+                self.ready.set()
+        
+        threading.Thread(target=load, daemon=True).start()
+    
+    def on_ready(self):
+        """読み込みが終わったら、入力済みの単語の候補を出して溜めたキーを処理する"""
+        self.update_candidates()
+        pending, self.pending_keys = self.pending_keys, []
+        for key in pending:
+            if not self.handle_key(key):
+                return False
+        return True
+    
+    def _elapsed(self, name):
+        """起動からの時間を記録する（最初の1回だけ）"""
+        if name not in self.timings:
+            self.timings[name] = time.perf_counter() - self.started
+    
+    def timing_summary(self):
+        """起動時間の要約（初回描画・辞書の準備・初回の候補表示）"""
+        labels = [('first_paint', '初回描画'), ('ready', '辞書の準備'), ('first_candidate', '初回の候補表示')]
+        return ", ".join(f"{label} {self.timings[name] * 1000:.0f}ms"
+                         for name, label in labels if name in self.timings)
         
     def decode(self, eight_key_input):
         """8キー入力をデコード"""
-        if not eight_key_input or eight_key_input not in self.dictionary:
+        if not eight_key_input:
+            return ()
+        words = lookup_words(self.dictionary, self.lattice_index, eight_key_input)
+        if self.ranker:
+            words = self.ranker.rank(eight_key_input, words)
+        return words
+    
+    def predict(self, eight_key_input):
+        """入力の続きとなる予測候補（頻度上位k件）を返す"""
+        if not eight_key_input or not self.completion_index:
             return []
-        return [item['word'] for item in self.dictionary[eight_key_input]]
+        return self.completion_index.completions(eight_key_input)[:self.predictive_k]
     
     def update_candidates(self):
         """現在の単語から候補を更新"""
         if self.current_word:
             self.candidates = self.decode(self.current_word)
+            self.predictions = self.predict(self.current_word)
             self.selected_index = 0
         else:
             self.candidates = []
+            self.predictions = []
             self.selected_index = 0
     
     def confirm_current_word(self):
-        """現在の単語を確定"""
+        """現在の単語を確定（選んだ候補は学習に記録する）"""
         if self.candidates and self.selected_index < len(self.candidates):
-            self.confirmed_text.append(self.candidates[self.selected_index])
+            word = self.candidates[self.selected_index]
+            self.confirmed_text.append(word)
+            if self.ranker:
+                self.ranker.record(self.current_word, word)
         elif self.current_word:
             self.confirmed_text.append(f"[{self.current_word}]")
         
         self.current_word = ""
         self.candidates = []
+        self.predictions = []
         self.selected_index = 0
     
     def draw_screen(self, stdscr):
@@ -72,6 +209,14 @@ class EightKeyShell:
         stdscr.addstr(0, 0, "=" * min(width - 1, 70))
         stdscr.addstr(1, 0, header[:width - 1])
         stdscr.addstr(2, 0, "=" * min(width - 1, 70))
+        if not self.ready.is_set():
+            loading = (f"⏳ 辞書を読み込んでいます: {self.dictionary_file} "
+                       f"({time.perf_counter() - self.started:.1f}秒)")
+            stdscr.addstr(3, 0, loading[:width - 1], curses.A_DIM)
+        elif self.watcher and self.watcher.loading:
+            stdscr.addstr(3, 0, f"⏳ 辞書を再読み込みしています: {self.dictionary_file}"[:width - 1], curses.A_DIM)
+        elif self.reload_messages:
+            stdscr.addstr(3, 0, self.reload_messages[-1][:width - 1], curses.A_DIM)
         
         # 確定済みテキスト
         y = 4
@@ -107,6 +252,17 @@ class EightKeyShell:
                 stdscr.addstr(y, 2, f"  ... 他 {len(self.candidates) - 9} 個")
                 y += 1
         
+        # 予測候補（表示のみ）
+        if self.predictions and y < height - 5:
+            y += 1
+            stdscr.addstr(y, 0, "🔮 予測候補:", curses.A_BOLD)
+            y += 1
+            for word, pattern, _ in self.predictions:
+                if y >= height - 4:
+                    break
+                stdscr.addstr(y, 2, f" [{pattern}] {word}"[:width - 3], curses.A_DIM)
+                y += 1
+        
         # 使い方（下部）
         help_y = height - 2
         help_text = "a-z/;=入力 | Space=確定 | ↑↓=選択 | BS=削除 | Ctrl+C=終了"
@@ -115,60 +271,105 @@ class EightKeyShell:
             stdscr.addstr(help_y + 1, 0, help_text[:width - 1])
         
         stdscr.refresh()
+        self._elapsed('first_paint')
+        if self.candidates or self.predictions:
+            self._elapsed('first_candidate')
+    
+    def handle_key(self, key):
+        """キー入力を1つ処理する（終了キーならFalse）"""
+        # Ctrl+C または ESC で終了
+        if key == 3 or key == 27:
+            return False
+        
+        if not self.ready.is_set():
+            # 読み込み中は入力中の単語の編集だけをその場で行い、それ以外は読み込み後に処理する
+            # （一度溜めたら以降のキーも順番どおり溜める）
+            editing = key in BACKSPACE_KEYS or (0 <= key < 0x110000 and chr(key).lower() in self.valid_keys)
+            if self.pending_keys or not editing:
+                self.pending_keys.append(key)
+                return True
+        
+        # 矢印キーで候補選択
+        if key == curses.KEY_UP:
+            if self.candidates and self.selected_index > 0:
+                self.selected_index -= 1
+        
+        elif key == curses.KEY_DOWN:
+            if self.candidates and self.selected_index < len(self.candidates) - 1:
+                self.selected_index += 1
+        
+        # Backspace
+        elif key in BACKSPACE_KEYS:
+            if self.current_word:
+                self.current_word = self.current_word[:-1]
+                self.update_candidates()
+            elif self.confirmed_text:
+                self.confirmed_text.pop()
+        
+        # Space または Enter で確定
+        elif key in (32, 10, 13):  # Space, Enter
+            self.confirm_current_word()
+        
+        # 数字キーで直接選択
+        elif 49 <= key <= 57:  # '1' to '9'
+            num = key - 48  # ASCIIコードから数値に変換
+            if self.candidates and 1 <= num <= len(self.candidates):
+                self.selected_index = num - 1
+                self.confirm_current_word()
+        
+        # 8キー入力
+        elif chr(key).lower() in self.valid_keys:
+            self.current_word += chr(key).lower()
+            self.update_candidates()
+            
+            # 候補が1つだけの場合は自動的にその候補を選択
+            if len(self.candidates) == 1:
+                self.selected_index = 0
+        return True
     
     def run(self, stdscr):
         """メインループ（curses版）"""
         # cursesの設定
         curses.curs_set(0)  # カーソルを非表示
-        stdscr.nodelay(False)  # キー入力待機
         stdscr.keypad(True)  # 特殊キーを有効化
         
+        # 先に画面を出してから辞書を読み込む（読み込み中は経過時間を表示するため定期的に描き直す）
+        self.draw_screen(stdscr)
+        loading = not self.ready.is_set()
+        if loading:
+            self.start_loading()
+            stdscr.timeout(LOADING_REDRAW_MS)
+        else:
+            stdscr.timeout(WATCH_POLL_MS if self.watcher else -1)
+        
+        redraw = False
         while True:
-            self.draw_screen(stdscr)
-            
             try:
-                key = stdscr.getch()
+                if loading and self.ready.is_set():
+                    loading = False
+                    # 以降はキー入力待機（監視中は再読み込みの確認のために定期的に戻る）
+                    stdscr.timeout(WATCH_POLL_MS if self.watcher else -1)
+                    if self.load_error or not self.on_ready():
+                        break
+                    redraw = True
                 
-                # Ctrl+C または ESC で終了
-                if key == 3 or key == 27:
-                    break
+                if self.watcher and not loading:
+                    reloading = self.watcher.loading
+                    result = self.watcher.poll()
+                    if result:
+                        self.apply_reload(result)
+                    if result or reloading != self.watcher.loading:
+                        redraw = True
                 
-                # 矢印キーで候補選択
-                elif key == curses.KEY_UP:
-                    if self.candidates and self.selected_index > 0:
-                        self.selected_index -= 1
-                
-                elif key == curses.KEY_DOWN:
-                    if self.candidates and self.selected_index < len(self.candidates) - 1:
-                        self.selected_index += 1
-                
-                # Backspace
-                elif key in (curses.KEY_BACKSPACE, 127, 8):
-                    if self.current_word:
-                        self.current_word = self.current_word[:-1]
-                        self.update_candidates()
-                    elif self.confirmed_text:
-                        self.confirmed_text.pop()
-                
-                # Space または Enter で確定
-                elif key in (32, 10, 13):  # Space, Enter
-                    self.confirm_current_word()
-                
-                # 数字キーで直接選択
-                elif 49 <= key <= 57:  # '1' to '9'
-                    num = key - 48  # ASCIIコードから数値に変換
-                    if self.candidates and 1 <= num <= len(self.candidates):
-                        self.selected_index = num - 1
-                        self.confirm_current_word()
-                
-                # 8キー入力
-                elif chr(key).lower() in self.valid_keys:
-                    self.current_word += chr(key).lower()
-                    self.update_candidates()
-                    
-                    # 候補が1つだけの場合は自動的にその候補を選択
-                    if len(self.candidates) == 1:
-                        self.selected_index = 0
+                if redraw:
+                    self.draw_screen(stdscr)
+                key = stdscr.getch()
+                if key == -1:
+                    redraw = loading  # 読み込み中は経過時間を描き直す
+                    continue
+                redraw = True
+                if not self.handle_key(key):
+                    break
                 
             except Exception as e:
                 # エラー表示用（デバッグ）
@@ -182,9 +383,24 @@ class EightKeyShell:
 
 
 def main():
-    if len(sys.argv) < 2:
-        # デフォルトの辞書ファイルを使用
-        dict_files = ['linux_words.json', 'common_words_3000.json', 'common_words_1000.json']
+    parser = argparse.ArgumentParser(
+        description='8キーシェル入力システム',
+        epilog='例: python 8key_shell.py linux_words.json\n'
+               '    python 8key_shell.py linux_words.json --overlay team_words.json',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dictionary', nargs='?',
+                        help='辞書ファイル（JSON・コンパイル済み .8kd・SQLite .8kdb、省略時はデフォルトの辞書）')
+    parser.add_argument('--overlay', action='append', default=[], metavar='DICTIONARY',
+                        help='辞書の上に重ねる辞書（複数指定可、後のものほど上の層）')
+    parser.add_argument('--selections', metavar='PATH',
+                        help='確定した候補をこのファイルに記録し、選んだ回数の多い候補を先頭に寄せる（指定しなければ学習しない）')
+    parser.add_argument('--no-reload', action='store_true',
+                        help='辞書ファイルが作り直されても読み込み直さない')
+    args = parser.parse_args()
+    
+    if args.dictionary is None:
+        # デフォルトの辞書ファイルを使用（ホット層があれば元の辞書は必要になるまで開かない）
+        dict_files = ['linux_words.hot.8kd', 'linux_words.json', 'common_words_3000.json', 'common_words_1000.json']
         dictionary_file = None
         
         for df in dict_files:
@@ -194,13 +410,15 @@ def main():
         
         if not dictionary_file:
             print("エラー: 辞書ファイルが見つかりません")
-            print("Usage: python 8key_shell.py [dictionary.json]")
+            print("Usage: python 8key_shell.py [dictionary.json|dictionary.8kd|dictionary.8kdb] [--overlay DICTIONARY]")
             print("例: python 8key_shell.py linux_words.json")
             return
     else:
-        dictionary_file = sys.argv[1]
-        if not os.path.exists(dictionary_file):
-            print(f"エラー: ファイルが見つかりません: {dictionary_file}")
+        dictionary_file = args.dictionary
+    
+    for path in [dictionary_file] + args.overlay:
+        if not os.path.exists(path):
+            print(f"エラー: ファイルが見つかりません: {path}")
             return
     
     print("\n" + "=" * 70)
@@ -209,15 +427,24 @@ def main():
     print("\n  8つのキー (a/s/d/f/j/k/l/;) だけでリアルタイム入力")
     print("  IMEのように一文字ごとに候補が表示されます\n")
     
-    shell = EightKeyShell(dictionary_file)
-    
-    input("Enterキーを押して開始...")
+    # 辞書は画面を出してから別スレッドで読み込む
+    shell = EightKeyShell(dictionary_file, overlays=args.overlay,
+                          selections_file=args.selections,
+                          background=True, watch=not args.no_reload)
     
     try:
         # cursesで実行
         result = curses.wrapper(shell.run)
         
         # 終了後の処理
+        for line in shell.load_messages:
+            print(line)
+        if shell.load_error:
+            print(f"エラー: 辞書を読み込めませんでした: {shell.load_error}")
+            return
+        print(f"起動時間: {shell.timing_summary()}")
+        for line in shell.reload_messages:
+            print(line)
         print("\n" + "=" * 70)
         print("📝 最終結果:")
         if result:
@@ -237,6 +464,9 @@ def main():
         print(f"\nエラーが発生しました: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if shell.ranker:
+            shell.ranker.close()
 
 
 if __name__ == '__main__':
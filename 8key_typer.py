@@ -4,13 +4,19 @@
 ttyperライクなタイピング練習ツール
 """
 
-import json
 import sys
 import os
 import curses
 import time
 import random
 
+from eightkey_dictionary import completion_index_for, lattice_index_for, lookup_words, open_dictionary
+from eightkey_index import DEFAULT_TOP_K, PrefixIndex, ReverseIndex, lattice_patterns_of
+from eightkey_reload import DictionaryWatcher, dictionary_sources
+
+# 辞書ファイルを監視しているときに、キー入力を待ちながら再読み込みを確認する間隔（ミリ秒）
+WATCH_POLL_MS = 200
+
 
 class NormalTyper:
     """通常のQWERTYタイピングモード"""
@@ -205,11 +211,26 @@ class NormalTyper:
 
 
 class EightKeyTyper:
-    def __init__(self, dictionary_file, show_predictive=False):
+    def __init__(self, dictionary_file, show_predictive=False, predictive_k=DEFAULT_TOP_K, watch=False):
+        """
+        Args:
+            watch: Trueなら辞書ファイルを監視し、作り直されたら別スレッドで読み込んで
+                   キー入力の合間に入れ替える
+        """
         self.dictionary = {}
+        self.prefix_index = None
+        self.completion_index = None
+        self.lattice_index = None  # 日本語の表記ゆれ（ラティス）パターン
+        self.reverse_index = None
+        self.show_predictive = show_predictive  # 予測候補を表示するか
+        self.predictive_k = predictive_k  # 予測候補の表示件数（Noneなら全件）
         self.load_dictionary(dictionary_file)
+        self.watcher = None
+        if watch:
+            self.watcher = DictionaryWatcher(dictionary_sources(dictionary_file),
+                                             lambda log: self._open_dictionary(dictionary_file, log))
+        self.reload_messages = []  # 再読み込みの記録（読み込み・入れ替えの時間）
         self.valid_keys = set('asdfjkl;')
-        self.show_predictive = show_predictive  # 予測候補を表示するか
         
         # タイピング統計
         self.start_time = None
@@ -224,18 +245,53 @@ class EightKeyTyper:
         self.current_target = ""  # 現在の目標単語
         self.candidates = []
         self.predictive_candidates = []  # 予測候補
+        self.predictive_total = 0  # 予測候補の総数（表示されない分も含む）
         self.word_start_time = None
         
     def load_dictionary(self, json_file):
-        """辞書を読み込む"""
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.dictionary = json.load(f)
+        """辞書を読み込む（JSON・コンパイル済み・SQLite辞書）"""
+        (self.dictionary, self.lattice_index, self.reverse_index,
+         self.completion_index, self.prefix_index) = self._open_dictionary(json_file)
+        if self.completion_index:
+            print(self.completion_index.summary())
+    
+    def _open_dictionary(self, json_file, log=print):
+        """辞書と各インデックスを揃えて返す（別スレッドから呼べる）"""
+        dictionary = open_dictionary(json_file, log=log)
+        lattice_index = lattice_index_for(dictionary)
+        
+        # 単語→8キーの逆引き（初回の逆引き時に構築）
+        reverse_index = ReverseIndex(dictionary)
+        
+        # 予測候補用のインデックス（読み込み時に一度だけ構築）
+        completion_index = prefix_index = None
+        if self.show_predictive:
+            if self.predictive_k:
+                completion_index = completion_index_for(dictionary, self.predictive_k)
+            else:
+                prefix_index = PrefixIndex(dictionary, lattice_patterns_of(dictionary))
+        return dictionary, lattice_index, reverse_index, completion_index, prefix_index
+    
+    def apply_reload(self, result):
+        """再読み込みした辞書に入れ替える（キー入力の合間にメインスレッドで呼ぶ）"""
+        now = time.strftime('%H:%M:%S')
+        if result.error:
+            self.reload_messages.append(f"[{now}] 辞書を再読み込みできませんでした: {result.error}")
+            return
+        start = time.perf_counter()
+        (self.dictionary, self.lattice_index, self.reverse_index,
+         self.completion_index, self.prefix_index) = result.state
+        if self.current_word:
+            self.candidates, self.predictive_candidates = self.decode_with_predictive(self.current_word)
+        swap = time.perf_counter() - start
+        self.reload_messages.append(f"[{now}] 辞書を再読み込みしました "
+                                    f"(読み込み {result.seconds:.2f}秒, 入れ替え {swap * 1000:.1f}ms)")
     
     def decode(self, eight_key_input):
         """8キー入力をデコード"""
-        if not eight_key_input or eight_key_input not in self.dictionary:
-            return []
-        return [item['word'] for item in self.dictionary[eight_key_input]]
+        if not eight_key_input:
+            return ()
+        return lookup_words(self.dictionary, self.lattice_index, eight_key_input)
     
     def decode_with_predictive(self, eight_key_input):
         """
@@ -248,24 +304,28 @@ class EightKeyTyper:
             return [], []
         
         # 完全マッチ
-        exact_matches = []
-        if eight_key_input in self.dictionary:
-            exact_matches = [item['word'] for item in self.dictionary[eight_key_input]]
+        exact_matches = self.decode(eight_key_input)
         
         # 予測候補（現在の入力で始まるパターン）
         predictive_matches = []
         if self.show_predictive:
-            for key, candidates in self.dictionary.items():
-                if key.startswith(eight_key_input) and key != eight_key_input:
-                    for candidate in candidates:
+            if self.completion_index:
+                # 頻度上位k件は事前計算済み
+                for word, key, freq in self.completion_index.completions(eight_key_input)[:self.predictive_k]:
+                    predictive_matches.append({'word': word, 'key': key, 'freq': freq})
+                self.predictive_total = self.completion_index.count(eight_key_input)
+            else:
+                for key in self.prefix_index.completions(eight_key_input, include_exact=False):
+                    for candidate in self.dictionary[key]:
                         predictive_matches.append({
                             'word': candidate['word'],
                             'key': key,
                             'freq': candidate['freq']
                         })
-            
-            # 頻度順にソート
-            predictive_matches.sort(key=lambda x: x['freq'], reverse=True)
+                
+                # 頻度順にソート
+                predictive_matches.sort(key=lambda x: x['freq'], reverse=True)
+                self.predictive_total = len(predictive_matches)
         
         return exact_matches, predictive_matches
     
@@ -323,12 +383,8 @@ class EightKeyTyper:
         return int((self.correct_chars / total) * 100)
     
     def get_8key_for_word(self, word):
-        """単語から8キー入力を逆引き"""
-        word_lower = word.lower()
-        for key, candidates in self.dictionary.items():
-            if any(c['word'].lower() == word_lower for c in candidates):
-                return key
-        return None
+        """単語から8キー入力を逆引き（辞書にない単語は直接変換）"""
+        return self.reverse_index.get(word)
     
     def _apply_case_from_input(self, word, input_keys):
         """入力時の大文字小文字状態を単語に反映（辞書は大文字小文字統合済み）"""
@@ -357,6 +413,10 @@ class EightKeyTyper:
             stdscr.addstr(0, 0, "=" * min(width - 1, 70))
             stdscr.addstr(1, max(0, (width - len(header)) // 2), header, curses.A_BOLD)
             stdscr.addstr(2, 0, "=" * min(width - 1, 70))
+            if self.watcher and self.watcher.loading:
+                stdscr.addstr(3, 0, "⏳ 辞書を再読み込みしています..."[:width - 1], curses.A_DIM)
+            elif self.reload_messages:
+                stdscr.addstr(3, 0, self.reload_messages[-1][:width - 1], curses.A_DIM)
         except:
             pass
         
@@ -463,9 +523,9 @@ class EightKeyTyper:
                         y += 1
                         displayed += 1
                     
-                    if len(self.predictive_candidates) > displayed:
+                    if self.predictive_total > displayed:
                         if y < height - 5:
-                            stdscr.addstr(y, 2, f"  ... 他 {len(self.predictive_candidates) - displayed} 個")
+                            stdscr.addstr(y, 2, f"  ... 他 {self.predictive_total - displayed} 個")
                             y += 1
         
         y += 1
@@ -498,6 +558,9 @@ class EightKeyTyper:
         curses.curs_set(0)
         stdscr.nodelay(False)
         stdscr.keypad(True)
+        if self.watcher:
+            # 辞書の再読み込みを確認するため、キー入力を待ちながら定期的に戻る
+            stdscr.timeout(WATCH_POLL_MS)
         
         # 色の設定
         curses.start_color()
@@ -508,8 +571,18 @@ class EightKeyTyper:
         self.start_time = time.time()
         self.word_start_time = time.time()
         
+        redraw = True
         while True:
-            self.draw_screen(stdscr)
+            if self.watcher:
+                reloading = self.watcher.loading
+                result = self.watcher.poll()
+                if result:
+                    self.apply_reload(result)
+                if result or reloading != self.watcher.loading:
+                    redraw = True
+            
+            if redraw:
+                self.draw_screen(stdscr)
             
             # 完了チェック
             if self.check_completion():
@@ -517,6 +590,10 @@ class EightKeyTyper:
             
             try:
                 key = stdscr.getch()
+                if key == -1:
+                    redraw = False  # 再読み込みの確認のために戻っただけ
+                    continue
+                redraw = True
                 
                 # Ctrl+C で終了
                 if key == 3:
@@ -685,7 +762,7 @@ def main():
         show_predictive = (pred_choice == 'y')
     
     print("\n辞書を読み込んでいます...")
-    typer = EightKeyTyper(dictionary_file, show_predictive=show_predictive)
+    typer = EightKeyTyper(dictionary_file, show_predictive=show_predictive, watch=True)
     
     print("テキストを生成しています...")
     typer.generate_target_text(word_count, difficulty, min_freq)
@@ -703,7 +780,7 @@ def main():
         time.sleep(1)
         
         try:
-            typer_8key = EightKeyTyper(dictionary_file, show_predictive=show_predictive)
+            typer_8key = EightKeyTyper(dictionary_file, show_predictive=show_predictive, watch=True)
             typer_8key.target_text = typer.target_text.copy()
             typer_8key.current_target = typer_8key.target_text[0]
             
@@ -789,6 +866,8 @@ def main():
     
     try:
         completed = curses.wrapper(typer.run)
+        for line in typer.reload_messages:
+            print(line)
         
         if completed:
             curses.wrapper(lambda stdscr: show_results(stdscr, typer, "8キーモード"))
@@ -1,87 +1,272 @@
 #!/usr/bin/env python3
 """
 頻度マッピング作成スクリプト
-frequencyList.tsvから単語→頻度の辞書を作成してJSONで出力
+frequencyList.tsvなどの頻度リストから単語→頻度の辞書を作成してJSONで出力
+
+対応する形式:
+  frequencylist: LEMMA|POS \t LEMMA \t POS \t FREQUENCY \t INFLECTIONS（1行目はヘッダー）
+                 変化形（INFLECTIONS）をすべて同じ頻度で登録する
+  counts:        単語 \t 出現数（タブまたは空白区切り、"出現数 単語" の順も可、数値にならない行は読み飛ばす）
+                 大規模なユニグラム頻度ファイルなど
+
+大きなファイルは改行位置で区切ったバイト範囲ごとに並列で読み込み、
+同じ単語が複数行・複数ファイルにある場合は最大の頻度を使う
 """
 
+import argparse
+import heapq
 import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from eightkey_freqstore import FREQ_SUFFIX, write_frequency_store
 
+FORMATS = ('frequencylist', 'counts')
+DEFAULT_CHUNK_MB = 16
 
-def create_frequency_mapping(tsv_file, output_json):
+
+def parse_frequencylist_line(line):
     """
-    TSVファイルから単語→頻度のマッピングを作成
-    
-    Args:
-        tsv_file: frequencyList.tsvのパス
-        output_json: 出力JSONファイルのパス
+    frequencylist形式の1行から (単語, 頻度) を返す
+
+    Raises:
+        ValueError: 頻度が数値でない
+    """
+    # タブで分割
+    parts = line.split('\t')
+    if len(parts) < 5:
+        return []
+    # フォーマット: LEMMA|POS \t LEMMA \t POS \t FREQUENCY \t INFLECTIONS
+    # parts[1] = LEMMA (単語)
+    # parts[3] = FREQUENCY
+    # parts[4] = INFLECTIONS (変化形のカンマ区切りリスト)
+    frequency = int(parts[3])
+
+    # INFLECTIONSから全ての変化形を取得
+    pairs = []
+    for inflection in parts[4].split(','):
+        word = inflection.strip().lower()  # 小文字に統一
+        if word:  # 空文字列でない場合のみ
+            pairs.append((word, frequency))
+    return pairs
+
+
+def parse_counts_line(line):
+    """
+    counts形式の1行から (単語, 頻度) を返す
+
+    Raises:
+        ValueError: 頻度が数値でない（ヘッダー行など）
+    """
+    parts = line.split('\t') if '\t' in line else line.split()
+    if len(parts) < 2:
+        return []
+    if parts[0].isdigit() and not parts[1].isdigit():
+        # "出現数 単語" の順（uniq -c の出力など）
+        parts = [parts[1], parts[0]]
+    word = parts[0].strip().lower()
+    return [(word, int(parts[1]))] if word else []
+
+
+_PARSERS = {
+    'frequencylist': parse_frequencylist_line,
+    'counts': parse_counts_line,
+}
+
+
+def detect_format(path):
+    """先頭行から形式を判定する"""
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline()
+    if first.startswith('LEMMA|POS') or len(first.split('\t')) >= 5:
+        return 'frequencylist'
+    return 'counts'
+
+
+def split_ranges(path, chunk_bytes):
+    """ファイルを改行位置で chunk_bytes 程度のバイト範囲 [start, end) に分ける"""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # 行の途中で切らない
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def merge_max(freq_map, other):
+    """other の頻度を freq_map に統合（同じ単語は最大の頻度、新しい単語は出現順に追加）"""
+    for word, frequency in other.items():
+        current = freq_map.get(word)
+        if current is None or frequency > current:
+            freq_map[word] = frequency
+
+
+def read_range(path, fmt, start, end):
+    """
+    ファイルのバイト範囲を読み込んで頻度マッピングを作る（並列実行時の1タスク）
+
+    Returns:
+        tuple: (頻度マッピング, スキップした行数, スキップした行の例)
     """
+    parse = _PARSERS[fmt]
     freq_map = {}
-    
-    print(f"読み込み中: {tsv_file}")
-    
-    with open(tsv_file, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line or line_num == 1:  # ヘッダー行をスキップ
-                continue
-            
-            # タブで分割
-            parts = line.split('\t')
-            if len(parts) >= 5:
-                # フォーマット: LEMMA|POS \t LEMMA \t POS \t FREQUENCY \t INFLECTIONS
-                # parts[1] = LEMMA (単語)
-                # parts[3] = FREQUENCY
-                # parts[4] = INFLECTIONS (変化形のカンマ区切りリスト)
+    get = freq_map.get
+    skipped = 0
+    examples = []
+    with open(path, 'rb') as f:
+        f.seek(start)
+        # 単語はすべて小文字に統一するので、行ごとではなく範囲全体をまとめて変換する
+        data = f.read(end - start).decode('utf-8').lower()
+
+    lines = data.split('\n')
+    if start == 0 and fmt == 'frequencylist':
+        lines = lines[1:]  # ヘッダー行をスキップ
+    for line in lines:
+        if fmt == 'counts':
+            # よくある "単語<TAB>出現数" の行は分割せずに処理する
+            word, sep, count = line.partition('\t')
+            if sep and '\t' not in count:
                 try:
-                    frequency = int(parts[3])
-                    
-                    # INFLECTIONSから全ての変化形を取得
-                    inflections = parts[4].split(',')
-                    
-                    # 各変化形を頻度マップに追加
-                    for inflection in inflections:
-                        word = inflection.strip().lower()  # 小文字に統一
-                        if word:  # 空文字列でない場合のみ
-                            # 同じ単語が複数行にある場合は最大の頻度を使用
-                            if word in freq_map:
-                                freq_map[word] = max(freq_map[word], frequency)
-                            else:
-                                freq_map[word] = frequency
-                except (ValueError, IndexError) as e:
-                    # デバッグ用: 最初の10個のエラーのみ表示
-                    if line_num <= 15:
-                        print(f"警告: 行 {line_num} をスキップ: {e}")
+                    frequency = int(count)
+                except ValueError:
+                    pass
+                else:
+                    word = word.strip()
+                    if word:
+                        current = get(word)
+                        if current is None or frequency > current:
+                            freq_map[word] = frequency
                     continue
-    
+
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            pairs = parse(line)
+        except (ValueError, IndexError) as e:
+            skipped += 1
+            if len(examples) < 10:
+                examples.append(f"{line[:60]} ({e})")
+            continue
+        for word, frequency in pairs:
+            # 同じ単語が複数行にある場合は最大の頻度を使用
+            current = get(word)
+            if current is None or frequency > current:
+                freq_map[word] = frequency
+    return freq_map, skipped, examples
+
+
+def _read_range_task(args):
+    return read_range(*args)
+
+
+def create_frequency_mapping(tsv_file, output_json, fmt=None, workers=1,
+                             chunk_mb=DEFAULT_CHUNK_MB, compact=False):
+    """
+    頻度リストから単語→頻度のマッピングを作成
+
+    Args:
+        tsv_file: 頻度リストのパス（複数ならリスト）
+        output_json: 出力JSONファイルのパス（拡張子が .8kf なら頻度ストア）
+        fmt: 形式（FORMATS のいずれか、Noneならファイルごとに先頭行から判定）
+        workers: 並列ワーカー数
+        chunk_mb: 1タスクで読み込むおおよそのサイズ（MB）
+        compact: 改行・インデントなしのJSONで保存する（大きなマッピングでファイルが小さく保存も速い）
+    """
+    sources = [tsv_file] if isinstance(tsv_file, str) else list(tsv_file)
+    tasks = []
+    for path in sources:
+        source_fmt = fmt or detect_format(path)
+        print(f"読み込み中: {path} ({source_fmt})")
+        for start, end in split_ranges(path, chunk_mb * 1024 * 1024):
+            tasks.append((path, source_fmt, start, end))
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map は入力順に結果を返すので、単語の並びは1プロセスで読んだ場合と同じ
+            results = pool.map(_read_range_task, tasks)
+            freq_map, skipped, examples = _merge_results(results)
+    else:
+        freq_map, skipped, examples = _merge_results(map(_read_range_task, tasks))
+
+    for example in examples:
+        print(f"警告: 行をスキップ: {example}")
+    if skipped > len(examples):
+        print(f"警告: 他 {skipped - len(examples)} 行をスキップ")
+
     print(f"マッピング作成完了: {len(freq_map)} 単語")
-    
-    # JSON形式で保存
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(freq_map, f, ensure_ascii=False, indent=2)
-    
+
+    if output_json.endswith(FREQ_SUFFIX):
+        # 頻度ストアとして保存（辞書生成時にmmapで開いて引く）
+        write_frequency_store(freq_map, output_json)
+    else:
+        # JSON形式で保存（文字列にしてから1回で書く方が json.dump より速い）
+        if compact:
+            text = json.dumps(freq_map, ensure_ascii=False, separators=(',', ':'))
+        else:
+            text = json.dumps(freq_map, ensure_ascii=False, indent=2)
+        with open(output_json, 'w', encoding='utf-8') as f:
+            f.write(text)
+
     print(f"保存完了: {output_json}")
-    
+
     # 統計情報を表示
     if freq_map:
-        sorted_words = sorted(freq_map.items(), key=lambda x: x[1], reverse=True)
         print(f"\n最も頻度が高い10単語:")
-        for word, freq in sorted_words[:10]:
+        for word, freq in heapq.nlargest(10, freq_map.items(), key=lambda x: x[1]):
             print(f"  {word}: {freq}")
-    
+
     return freq_map
 
 
+def _merge_results(results):
+    freq_map = {}
+    skipped = 0
+    examples = []
+    for chunk_map, chunk_skipped, chunk_examples in results:
+        merge_max(freq_map, chunk_map)
+        skipped += chunk_skipped
+        examples.extend(chunk_examples[:10 - len(examples)])
+    return freq_map, skipped, examples
+
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python create_freq_mapping.py <frequencyList.tsv> [output.json]")
+        print("Usage: python create_freq_mapping.py <frequencyList.tsv> [more.tsv ...] [output.json] [--workers N] [--compact]")
         print("例: python create_freq_mapping.py Frequency-list/frequencyList.tsv freq_mapping.json")
+        print("    python create_freq_mapping.py frequencyList.tsv unigram_counts.tsv -o freq_mapping.json --workers 8 --compact")
         return
-    
-    input_tsv = sys.argv[1]
-    output_json = sys.argv[2] if len(sys.argv) >= 3 else "freq_mapping.json"
-    
-    create_frequency_mapping(input_tsv, output_json)
+
+    parser = argparse.ArgumentParser(description='頻度リストから単語→頻度のマッピングを作成')
+    parser.add_argument('sources', nargs='+',
+                        help='頻度リスト（複数可、最後が .json / .8kf なら出力ファイルとみなす）')
+    parser.add_argument('-o', '--output', help='出力JSON（.8kf なら頻度ストア、デフォルト: freq_mapping.json）')
+    parser.add_argument('--format', choices=FORMATS,
+                        help='頻度リストの形式（省略時はファイルごとに先頭行から判定）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='並列ワーカー数（0でCPU数、デフォルト: 1）')
+    parser.add_argument('--chunk-mb', type=int, default=DEFAULT_CHUNK_MB,
+                        help=f'1タスクで読み込むサイズ（MB、デフォルト: {DEFAULT_CHUNK_MB}）')
+    parser.add_argument('--compact', action='store_true',
+                        help='改行・インデントなしのJSONで保存する')
+    args = parser.parse_args()
+
+    sources = args.sources
+    output_json = args.output
+    if output_json is None:
+        if len(sources) >= 2 and sources[-1].endswith(('.json', FREQ_SUFFIX)):
+            sources, output_json = sources[:-1], sources[-1]
+        else:
+            output_json = "freq_mapping.json"
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    create_frequency_mapping(sources, output_json, args.format, workers, args.chunk_mb, args.compact)
 
 
 if __name__ == '__main__':
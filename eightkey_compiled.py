@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+コンパイル済み8キー辞書（.8kd）
+ソート済みパターン配列・文字列プール・オフセット/頻度配列からなるバイナリ形式
+mmapで開き、パターン・単語の文字列は初めて引いたときに一度だけデコードする（JSONのようにパースしない）
+
+ファイル構成:
+    b'8KDC' | version(u16) | reserved(u16) | メタ情報長(u32) | メタ情報(JSON)
+    以降 8バイト境界に揃えた各セクション（位置と要素数はメタ情報に記録）
+
+セクション:
+    pattern_offsets  u32 × (パターン数+1)  pattern_pool内の開始位置
+    pattern_pool     UTF-8バイト列        パターン文字列を連結したもの（ソート済み）
+    cand_start       u32 × (パターン数+1)  各パターンの候補の開始番号
+    word_offsets     u32 × (単語数+1)      word_pool内の開始位置
+    word_pool        UTF-8バイト列        候補単語を連結したもの
+    freqs            u64 × 単語数          各候補の頻度
+    prefix_offsets   u32 × (プレフィックス数+1)  予測候補キャッシュ（TopKCompletionIndex）
+    prefix_pool      UTF-8バイト列
+    comp_start       u32 × (プレフィックス数+1)
+    comp_count       u32 × プレフィックス数
+    comp_entries     u32 × 予測候補数      候補番号
+    lattice_ids      u32 × ラティス数      ラティスのパターン番号（ラティスがあるときだけ）
+"""
+
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+from eightkey_index import DEFAULT_TOP_K, TopKCompletionIndex, lattice_patterns_of
+from eightkey_stats import compute_dictionary_stats, read_dictionary_metadata
+
+
+MAGIC = b'8KDC'
+VERSION = 1
+COMPILED_SUFFIX = '.8kd'
+
+_HEADER = struct.Struct('<4sHHI')
+_ALIGN = 8
+# メタ情報の後ろに確保する余白（update_compiled_metaで書き換えられるように）
+_META_RESERVE = 256
+# 読み込んだ候補を覚えておくパターン数（SQLite辞書・重ね合わせた辞書の words()）
+WORDS_CACHE_SIZE = 4096
+
+
+def is_compiled_dictionary(path):
+    """ファイルがコンパイル済み辞書か（先頭のマジックで判定）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def create_temp_file(output_path):
+    """
+    output_path と同じディレクトリに書き込み用の一時ファイルを作る（置き換え用）
+    同じファイルを同時に書くプロセスがあっても混ざらないよう名前は個別に作り、
+    権限は tempfile.mkstemp の 0600 ではなく通常のファイルと同じく umask に従う
+
+    Returns:
+        tuple: (ファイル記述子, 一時ファイルのパス)
+    """
+    directory = os.path.dirname(os.path.abspath(output_path))
+    suffix = os.path.splitext(output_path)[1]
+    while True:
+        tmp_path = os.path.join(directory, f'.tmp-{os.urandom(6).hex()}{suffix}')
+        try:
+            return os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+def pool_strings(strings):
+    """文字列リストを (オフセット配列, 連結バイト列) に変換"""
+    offsets = array.array('I', [0])
+    chunks = []
+    pos = 0
+    for s in strings:
+        b = s.encode('utf-8')
+        chunks.append(b)
+        pos += len(b)
+        offsets.append(pos)
+    return offsets, b''.join(chunks)
+
+
+def split_pool(pool, offsets):
+    """pool_strings の逆（連結バイト列をオフセットで区切って文字列のリストにする）"""
+    pool = bytes(pool)
+    offsets = offsets.tolist()
+    text = pool.decode('utf-8')
+    if len(text) != len(pool):
+        # 非ASCII文字を含むとバイト位置と文字位置がずれるので1つずつデコードする
+        return [pool[a:b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+    return [text[a:b] for a, b in zip(offsets, offsets[1:])]
+
+
+def write_compiled_dictionary(eight_key_dict, output_path, k=DEFAULT_TOP_K, meta=None,
+                              completion_index=None, string_sections=None):
+    """
+    8キー辞書をコンパイル済み形式で保存
+
+    Args:
+        eight_key_dict: 8キーパターン -> [{"word": ..., "freq": ...}]（頻度順、ラティスの候補には "lattice": true）
+        output_path: 出力ファイル（.8kd）
+        k: 予測候補キャッシュの保持件数（0なら予測候補を含めない）
+        meta: メタ情報に追加で記録する値
+        completion_index: 格納する予測候補（top / counts を持つもの、Noneなら eight_key_dict から構築）
+                          候補のパターンは eight_key_dict に含まれていること
+        string_sections: 追加で格納する文字列リスト {名前: [文字列, ...]}（CompiledDictionary.strings で読む）
+    """
+    patterns = sorted(eight_key_dict)
+
+    cand_start = array.array('I', [0])
+    words = []
+    freqs = array.array('Q')
+    first_index = {}  # pattern -> 最初の候補番号
+    for pattern in patterns:
+        first_index[pattern] = len(words)
+        for candidate in eight_key_dict[pattern]:
+            words.append(candidate['word'])
+            freqs.append(candidate['freq'])
+        cand_start.append(len(words))
+
+    pattern_offsets, pattern_pool = pool_strings(patterns)
+    word_offsets, word_pool = pool_strings(words)
+
+    sections = [
+        ('pattern_offsets', pattern_offsets),
+        ('pattern_pool', pattern_pool),
+        ('cand_start', cand_start),
+        ('word_offsets', word_offsets),
+        ('word_pool', word_pool),
+        ('freqs', freqs),
+    ]
+
+    if k:
+        if completion_index is None:
+            completion_index = TopKCompletionIndex(eight_key_dict, k)
+        prefixes = sorted(completion_index.top)
+        comp_start = array.array('I', [0])
+        comp_count = array.array('I')
+        comp_entries = array.array('I')
+        for prefix in prefixes:
+            for word, pattern, _ in completion_index.top[prefix]:
+                base = first_index[pattern]
+                # パターン内では単語は一意（大文字小文字は統合済み）
+                rank = next(i for i, c in enumerate(eight_key_dict[pattern]) if c['word'] == word)
+                comp_entries.append(base + rank)
+            comp_start.append(len(comp_entries))
+            comp_count.append(completion_index.counts[prefix])
+        prefix_offsets, prefix_pool = pool_strings(prefixes)
+        sections += [
+            ('prefix_offsets', prefix_offsets),
+            ('prefix_pool', prefix_pool),
+            ('comp_start', comp_start),
+            ('comp_count', comp_count),
+            ('comp_entries', comp_entries),
+        ]
+
+    lattices = lattice_patterns_of(eight_key_dict)
+    lattice_ids = array.array('I', (i for i, pattern in enumerate(patterns) if pattern in lattices))
+    if lattice_ids:
+        sections.append(('lattice_ids', lattice_ids))
+
+    for name, strings in (string_sections or {}).items():
+        offsets, pool = pool_strings(strings)
+        sections += [(f'{name}_offsets', offsets), (f'{name}_pool', pool)]
+
+    info = dict(meta or {})
+    info.update({
+        'byteorder': sys.byteorder,
+        'patterns': len(patterns),
+        'words': len(words),
+        'lattices': len(lattice_ids),
+        'k': k,
+    })
+    write_sections(output_path, MAGIC, info, sections)
+
+
+def write_sections(output_path, magic, info, sections):
+    """
+    ヘッダー・メタ情報・セクションを書く（.8kd と同じファイル構成の形式で共通）
+    一時ファイルに書いてから置き換えるので、既存のファイルをmmapで開いているプロセスは
+    古い内容のまま読み続けられる
+
+    Args:
+        magic: 先頭4バイト
+        info: メタ情報（セクションの配置 'sections' はここで追加する）
+        sections: [(名前, array.array または bytes), ...]
+    """
+    # セクションの配置はメタ情報の長さに依存するので、長さが収束するまで計算する
+    layout = {}
+    header_size = 0
+    while True:
+        info['sections'] = layout
+        meta_bytes = json.dumps(info, ensure_ascii=False).encode('utf-8') + b' ' * _META_RESERVE
+        size = _HEADER.size + len(meta_bytes)
+        if size == header_size:
+            break
+        header_size = size
+        pos = header_size
+        layout = {}
+        for name, data in sections:
+            pos = -(-pos // _ALIGN) * _ALIGN
+            if isinstance(data, array.array):
+                layout[name] = [pos, len(data), data.typecode]
+                pos += len(data) * data.itemsize
+            else:
+                layout[name] = [pos, len(data), 'B']
+                pos += len(data)
+
+    fd, tmp_path = create_temp_file(output_path)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(magic, VERSION, 0, len(meta_bytes)))
+            f.write(meta_bytes)
+            for name, data in sections:
+                offset = layout[name][0]
+                f.write(b'\0' * (offset - f.tell()))
+                if isinstance(data, array.array):
+                    data.tofile(f)
+                else:
+                    f.write(data)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def map_sections(path, magic):
+    """
+    write_sections で書いたファイルをmmapで開く
+
+    Returns:
+        tuple: (mmap, メタ情報, 名前 -> memoryview（配列は型付き）)
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < _HEADER.size:
+        raise ValueError(f"ファイルが途中で切れています: {path}")
+    file_magic, version, _, meta_len = _HEADER.unpack_from(mm, 0)
+    if file_magic != magic:
+        raise ValueError(f"形式が異なります: {path}")
+    if version != VERSION:
+        raise ValueError(f"未対応のバージョンです: {version} ({path})")
+    meta = json.loads(mm[_HEADER.size:_HEADER.size + meta_len].decode('utf-8'))
+    if meta['byteorder'] != sys.byteorder:
+        raise ValueError(f"バイトオーダーが異なります: {path}")
+
+    view = memoryview(mm)
+    sections = {}
+    for name, (offset, count, typecode) in meta['sections'].items():
+        itemsize = array.array(typecode).itemsize
+        if offset + count * itemsize > len(mm):
+            raise ValueError(f"ファイルが途中で切れています: {path}")
+        section = view[offset:offset + count * itemsize]
+        sections[name] = section.cast(typecode) if typecode != 'B' else section
+    return mm, meta, sections
+
+
+def _read_header(f, path):
+    """ヘッダーを読む（途中で切れたファイルは ValueError）"""
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"ファイルが途中で切れています: {path}")
+    return _HEADER.unpack(header)
+
+
+def read_compiled_meta(path):
+    """コンパイル済み辞書のメタ情報だけを読む"""
+    with open(path, 'rb') as f:
+        magic, version, _, meta_len = _read_header(f, path)
+        if magic != MAGIC or version != VERSION:
+            return None
+        return json.loads(f.read(meta_len).decode('utf-8'))
+
+
+def update_compiled_meta(path, updates):
+    """
+    メタ情報を書き換える（セクションは動かさない）
+
+    Returns:
+        bool: 確保済みの領域に収まって書き換えられたか
+    """
+    with open(path, 'r+b') as f:
+        magic, version, _, meta_len = _read_header(f, path)
+        if magic != MAGIC or version != VERSION:
+            return False
+        info = json.loads(f.read(meta_len).decode('utf-8'))
+        info.update(updates)
+        meta_bytes = json.dumps(info, ensure_ascii=False).encode('utf-8')
+        if len(meta_bytes) > meta_len:
+            return False
+        f.seek(_HEADER.size)
+        f.write(meta_bytes + b' ' * (meta_len - len(meta_bytes)))
+    return True
+
+
+class CompiledDictionary:
+    """
+    コンパイル済み辞書をmmapで開いた読み取り専用の辞書
+
+    JSON辞書と同じく パターン -> [{"word": ..., "freq": ...}] として引ける
+    （in / [] / get / len / 反復）が、候補の辞書は引いたパターンの分だけ生成する
+    デコードで使う words() は CompactDictionary と同じく単語のタプルを保持して返す
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self._mm, self.meta, self._sections = map_sections(path, MAGIC)
+        except ValueError:
+            if not is_compiled_dictionary(path):
+                raise ValueError(f"コンパイル済み辞書ではありません: {path}")
+            raise
+
+        self._pattern_offsets = self._sections['pattern_offsets']
+        self._cand_start = self._sections['cand_start']
+        self._word_offsets = self._sections['word_offsets']
+        self._freqs = self._sections['freqs']
+        self._pattern_base = self.meta['sections']['pattern_pool'][0]
+        self._word_base = self.meta['sections']['word_pool'][0]
+        self._count = self.meta['patterns']
+        self._index = None  # パターン -> パターン番号（初めて引いたときに作る）
+        self._words = None  # パターン番号 -> 単語のタプル（初めて words() を呼んだときに作る）
+
+    # --- 内部 ---
+
+    def _pattern_at(self, i):
+        po = self._pattern_offsets
+        base = self._pattern_base
+        return self._mm[base + po[i]:base + po[i + 1]]
+
+    def _word_at(self, j):
+        wo = self._word_offsets
+        base = self._word_base
+        return self._mm[base + wo[j]:base + wo[j + 1]].decode('utf-8')
+
+    def _find(self, pattern):
+        """
+        パターンの番号を返す（なければ-1）
+        初めて引いたときにパターン配列を一度だけデコードして パターン -> 番号 の辞書を作る
+        （mmap上の二分探索は比較のたびにスライスを作るので、引くたびに十数回の確保とデコードになる）
+        """
+        if self._index is None:
+            patterns = split_pool(self._sections['pattern_pool'], self._pattern_offsets)
+            self._index = dict(zip(patterns, range(len(patterns))))
+        return self._index.get(pattern, -1)
+
+    def _candidates_at(self, i):
+        freqs = self._freqs
+        return [{'word': self._word_at(j), 'freq': freqs[j]}
+                for j in range(self._cand_start[i], self._cand_start[i + 1])]
+
+    # --- 辞書インターフェース ---
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, pattern):
+        return isinstance(pattern, str) and self._find(pattern) >= 0
+
+    def __getitem__(self, pattern):
+        i = self._find(pattern) if isinstance(pattern, str) else -1
+        if i < 0:
+            raise KeyError(pattern)
+        return self._candidates_at(i)
+
+    def get(self, pattern, default=None):
+        i = self._find(pattern) if isinstance(pattern, str) else -1
+        return self._candidates_at(i) if i >= 0 else default
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._pattern_at(i).decode('utf-8')
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        for i in range(self._count):
+            yield self._candidates_at(i)
+
+    def items(self):
+        for i in range(self._count):
+            yield self._pattern_at(i).decode('utf-8'), self._candidates_at(i)
+
+    def _decode_words(self):
+        """全パターンの単語のタプルを作る（CompactDictionary と同じ表現、頻度はmmap上のまま）"""
+        words = split_pool(self._sections['word_pool'], self._word_offsets)
+        cs = self._cand_start.tolist()
+        self._words = [tuple(words[a:b]) for a, b in zip(cs, cs[1:])]
+        return self._words
+
+    def words(self, pattern):
+        """
+        パターンの候補単語のタプルを返す（頻度順）
+        初めて呼んだときに単語配列を一度だけデコードし、以降は保持しているタプルをそのまま返す
+        """
+        i = self._find(pattern) if isinstance(pattern, str) else -1
+        if i < 0:
+            return ()
+        words = self._words if self._words is not None else self._decode_words()
+        return words[i]
+
+    def freqs(self, pattern):
+        """パターンの候補の頻度を words() と同じ順で返す（mmap上の配列のビュー）"""
+        i = self._find(pattern)
+        if i < 0:
+            return self._freqs[0:0]
+        return self._freqs[self._cand_start[i]:self._cand_start[i + 1]]
+
+    def candidate_counts(self):
+        """各パターンの候補数を順に返す（統計用、単語は読まない）"""
+        cs = self._cand_start
+        for i in range(self._count):
+            yield cs[i + 1] - cs[i]
+
+    def completion_index(self):
+        """ファイルに含まれる予測候補キャッシュ（なければNone）"""
+        if 'prefix_offsets' not in self._sections:
+            return None
+        return CompiledCompletionIndex(self)
+
+    def lattice_patterns(self):
+        """ラティスパターンを順に返す（lattice_ids セクションのパターンだけを読む）"""
+        for i in self._sections.get('lattice_ids', ()):
+            yield self._pattern_at(i).decode('utf-8')
+
+    def strings(self, name):
+        """write_compiled_dictionary の string_sections で格納した文字列のリスト（なければNone）"""
+        if f'{name}_offsets' not in self._sections:
+            return None
+        return split_pool(self._sections[f'{name}_pool'], self._sections[f'{name}_offsets'])
+
+
+class CompiledCompletionIndex:
+    """コンパイル済み辞書に格納された予測候補キャッシュ（TopKCompletionIndexと同じ使い方）"""
+
+    def __init__(self, compiled):
+        self._dict = compiled
+        self.k = compiled.meta['k']
+        sections = compiled._sections
+        self._prefix_offsets = sections['prefix_offsets']
+        self._comp_start = sections['comp_start']
+        self._comp_count = sections['comp_count']
+        self._comp_entries = sections['comp_entries']
+        self._count = len(self._comp_count)
+        prefixes = split_pool(sections['prefix_pool'], self._prefix_offsets)
+        self._index = dict(zip(prefixes, range(len(prefixes))))
+
+    def _find(self, prefix):
+        return self._index.get(prefix, -1)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, prefix):
+        """prefixの予測候補が格納されているか"""
+        return self._find(prefix) >= 0
+
+    def completions(self, prefix):
+        """prefixの予測候補（頻度上位k件）を (word, pattern, freq) のリストで返す"""
+        i = self._find(prefix)
+        if i < 0:
+            return []
+        d = self._dict
+        result = []
+        for n in range(self._comp_start[i], self._comp_start[i + 1]):
+            j = self._comp_entries[n]
+            p = bisect.bisect_right(d._cand_start, j) - 1
+            result.append((d._word_at(j), d._pattern_at(p).decode('utf-8'), d._freqs[j]))
+        return result
+
+    def count(self, prefix):
+        """prefixの予測候補の総数を返す"""
+        i = self._find(prefix)
+        return self._comp_count[i] if i >= 0 else 0
+
+    def summary(self):
+        return f"予測候補キャッシュ: {self._count:,}プレフィックス (k={self.k}, コンパイル済み)"
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python eightkey_compiled.py <dictionary.json> [output.8kd]")
+        print("例: python eightkey_compiled.py linux_words.json linux_words.8kd")
+        return
+
+    json_file = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) >= 3 else json_file.rsplit('.', 1)[0] + COMPILED_SUFFIX
+
+    start = time.perf_counter()
+    with open(json_file, 'r', encoding='utf-8') as f:
+        eight_key_dict = json.load(f)
+    # 統計はJSON辞書のサイドカーがあればそれを使う
+    metadata = read_dictionary_metadata(json_file)
+    stats = metadata['stats'] if metadata else compute_dictionary_stats(eight_key_dict)
+    write_compiled_dictionary(eight_key_dict, output_path, meta={'stats': stats})
+    print(f"保存完了: {output_path} ({time.perf_counter() - start:.2f}秒)")
+
+
+if __name__ == '__main__':
+    main()
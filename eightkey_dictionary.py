@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+"""
+8キー辞書の読み込み
+JSON辞書・コンパイル済み辞書（.8kd）・SQLite辞書（.8kdb）・ホット層（.hot.8kd）を
+パスから判別して開く共通処理と、辞書を重ね合わせる LayeredDictionary
+"""
+
+import array
+import functools
+import json
+import os
+import sys
+
+from eightkey_compiled import (
+    COMPILED_SUFFIX, WORDS_CACHE_SIZE, CompiledDictionary, is_compiled_dictionary,
+    read_compiled_meta, update_compiled_meta, write_compiled_dictionary,
+)
+from eightkey_index import LatticeIndex, TopKCompletionIndex, is_lattice_entry, lattice_patterns_of
+from eightkey_sqlite import SqliteDictionary, is_sqlite_dictionary
+from eightkey_stats import compute_dictionary_stats, file_sha256, read_dictionary_metadata
+
+
+# ホット層の拡張子（例: linux_words.hot.8kd、eightkey_tiered.py で生成）
+HOT_SUFFIX = '.hot' + COMPILED_SUFFIX
+
+
+def cache_path_for(path):
+    """JSON辞書に対応するコンパイル済みキャッシュのパス（例: linux_words.json.8kd）"""
+    return path + COMPILED_SUFFIX
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def source_record(path):
+    """辞書ファイルのサイズ・更新時刻・内容のハッシュ（キャッシュ・ホット層の鮮度確認用）"""
+    return dict(_source_stamp(path), sha256=file_sha256(path))
+
+
+def _cache_is_fresh(path, cache_path):
+    """
+    キャッシュが元のJSONと一致するか
+    サイズと更新時刻が同じなら一致とみなし、違う場合は内容のハッシュで確認する
+    """
+    try:
+        meta = read_compiled_meta(cache_path)
+    except (OSError, ValueError):
+        return False
+    if not meta or 'source' not in meta:
+        return False
+
+    source = meta['source']
+    stamp = _source_stamp(path)
+    if source['size'] == stamp['size'] and source['mtime_ns'] == stamp['mtime_ns']:
+        return True
+    if source['size'] != stamp['size'] or source['sha256'] != file_sha256(path):
+        return False
+
+    # 内容は同じ（touchやコピーで更新時刻だけ変わった）ので記録を更新して次回のハッシュ計算を省く
+    try:
+        update_compiled_meta(cache_path, {'source': dict(source, **stamp)})
+    except (OSError, ValueError):
+        pass
+    return True
+
+
+def _load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_cache(path, cache_path, dictionary, stamp):
+    """読み込んだJSON辞書からキャッシュを作る（write_compiled_dictionary が一時ファイルに書いて置き換える）"""
+    source = dict(stamp, sha256=file_sha256(path))
+    # 統計は生成時のサイドカーがあればそれを使う
+    metadata = read_dictionary_metadata(path)
+    stats = metadata['stats'] if metadata else compute_dictionary_stats(dictionary)
+    write_compiled_dictionary(dictionary, cache_path, meta={'source': source, 'stats': stats})
+
+
+class CompactDictionary:
+    """
+    読み込んだJSON辞書のコンパクトな表現
+
+    候補ごとの {"word": ..., "freq": ...} を持たず、パターンごとの単語のタプル（単語は
+    intern済み）と全候補の頻度を並べた配列で保持する
+    words() / freqs() は保持しているタプル・配列のビューをそのまま返すので呼び出しごとに
+    リストを作らない。[] / get / items などは従来どおり候補の辞書のリストを返す
+    """
+
+    def __init__(self, eight_key_dict):
+        intern = sys.intern
+        self._index = {}                    # パターン -> パターン番号
+        self._words = []                    # パターン番号 -> 単語のタプル（頻度順）
+        self._start = array.array('I', [0])  # パターン番号 -> freqs内の開始位置
+        self._freqs = array.array('Q')
+        self._lattices = []                 # 候補に印のあるラティスパターン
+        for pattern, candidates in eight_key_dict.items():
+            self._index[pattern] = len(self._words)
+            self._words.append(tuple(intern(c['word']) for c in candidates))
+            self._freqs.extend(c['freq'] for c in candidates)
+            self._start.append(len(self._freqs))
+            if is_lattice_entry(candidates):
+                self._lattices.append(pattern)
+        self._freq_view = memoryview(self._freqs)
+
+    def _candidates_at(self, i):
+        start = self._start[i]
+        return [{'word': word, 'freq': self._freqs[start + n]} for n, word in enumerate(self._words[i])]
+
+    # --- 辞書インターフェース ---
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, pattern):
+        return pattern in self._index
+
+    def __getitem__(self, pattern):
+        return self._candidates_at(self._index[pattern])
+
+    def get(self, pattern, default=None):
+        i = self._index.get(pattern)
+        return self._candidates_at(i) if i is not None else default
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        for i in range(len(self._words)):
+            yield self._candidates_at(i)
+
+    def items(self):
+        for pattern, i in self._index.items():
+            yield pattern, self._candidates_at(i)
+
+    def words(self, pattern):
+        """パターンの候補単語のタプルを返す（頻度順、保持しているものをそのまま返す）"""
+        i = self._index.get(pattern)
+        return self._words[i] if i is not None else ()
+
+    def freqs(self, pattern):
+        """パターンの候補の頻度を words() と同じ順で返す（配列のビュー）"""
+        i = self._index.get(pattern)
+        if i is None:
+            return self._freq_view[0:0]
+        return self._freq_view[self._start[i]:self._start[i + 1]]
+
+    def candidate_counts(self):
+        """各パターンの候補数を順に返す（統計用）"""
+        return map(len, self._words)
+
+    def lattice_patterns(self):
+        """ラティスパターンを返す"""
+        return list(self._lattices)
+
+
+def open_dictionary(path, use_cache=True, log=print):
+    """
+    辞書ファイルを開く
+
+    JSON辞書は隣に置いたコンパイル済みキャッシュ（<path>.8kd）から読み込む
+    キャッシュがない・古い場合は一度だけ作り直す
+
+    Args:
+        path: 辞書ファイル（JSON・コンパイル済み・SQLite）
+        use_cache: JSON辞書でキャッシュを使うか
+        log: キャッシュの作成などの表示に使う関数（別スレッドで開くときは表示を溜める関数を渡す）
+
+    Returns:
+        パターン -> [{"word": ..., "freq": ...}] として引ける辞書
+        （ホット層ならTieredDictionary、SQLiteならSqliteDictionary、
+        キャッシュを使えないJSONならCompactDictionary、それ以外はCompiledDictionary）
+    """
+    if is_compiled_dictionary(path):
+        compiled = CompiledDictionary(path)
+        if 'tier' in compiled.meta:
+            return _open_tiered(path, compiled, use_cache, log)
+        return compiled
+    if is_sqlite_dictionary(path):
+        return SqliteDictionary(path)
+    if not use_cache:
+        return CompactDictionary(_load_json(path))
+
+    cache_path = cache_path_for(path)
+    if _cache_is_fresh(path, cache_path):
+        try:
+            return CompiledDictionary(cache_path)
+        except ValueError:
+            pass  # ヘッダーの後ろで切れたキャッシュは作り直す
+
+    # 読み込み前の更新時刻を記録する（読み込み中に変更されたら次回ハッシュで検出される）
+    stamp = _source_stamp(path)
+    dictionary = _load_json(path)
+    log(f"コンパイル済みキャッシュを作成しています: {cache_path}")
+    try:
+        _write_cache(path, cache_path, dictionary, stamp)
+    except OSError:
+        # 書き込めない場所ではキャッシュなしで使う
+        return CompactDictionary(dictionary)
+    return CompiledDictionary(cache_path)
+
+
+def _open_tiered(path, hot, use_cache, log):
+    """ホット層と、メタ情報に記録された元の辞書（コールド層）を組み合わせて開く"""
+    cold_path = os.path.join(os.path.dirname(path), hot.meta['tier']['cold'])
+    if not os.path.exists(cold_path):
+        raise FileNotFoundError(f"ホット層の元の辞書が見つかりません: {cold_path}")
+    if not _cache_is_fresh(cold_path, path):
+        # 元の辞書が作り直された（ホット層の候補の並びが一致しない）ので元の辞書だけを使う
+        log(f"警告: ホット層が元の辞書と一致しません（作り直してください）: {path}")
+        return open_dictionary(cold_path, use_cache, log)
+    return TieredDictionary(hot, cold_path, use_cache, log)
+
+
+class TieredDictionary:
+    """
+    ホット層とコールド層の2段の辞書
+
+    ホット層はよく使う単語を含むパターンの候補リストを元の辞書から丸ごと写した小さな
+    コンパイル済み辞書で、それらのパターンの全プレフィックスの予測候補（元の辞書全体での上位k件）と
+    プレフィックス自体の候補リストも持つ（eightkey_tiered.py で生成）
+    ホット層にないパターン・プレフィックスを引いたときだけコールド層（元の辞書）を開くので、
+    よく使う単語の入力では元の辞書を読み込まない。候補の並びは元の辞書と同じ
+    """
+
+    def __init__(self, hot, cold_path, use_cache=True, log=print):
+        self.hot = hot
+        self.cold_path = cold_path
+        self._use_cache = use_cache
+        self._log = log
+        self._cold = None
+        # 予測候補を格納したプレフィックス（ここにあってホット層にないパターンは元の辞書にもない）
+        self._known = hot.completion_index()
+        tier = hot.meta['tier']
+        # 件数・統計は元の辞書のもの（ホット層の生成時に記録）
+        self.meta = {'patterns': tier['patterns'], 'lattices': tier['lattices']}
+        if 'stats' in hot.meta:
+            self.meta['stats'] = hot.meta['stats']
+
+    @property
+    def cold(self):
+        """コールド層（初めて必要になったときに開く）"""
+        if self._cold is None:
+            self._cold = open_dictionary(self.cold_path, self._use_cache, self._log)
+        return self._cold
+
+    @property
+    def cold_loaded(self):
+        return self._cold is not None
+
+    def _in_cold(self, pattern):
+        """ホット層で答えられないパターンか"""
+        return pattern not in self._known
+
+    def __len__(self):
+        return self.meta['patterns']
+
+    def __contains__(self, pattern):
+        return pattern in self.hot or (self._in_cold(pattern) and pattern in self.cold)
+
+    def __getitem__(self, pattern):
+        candidates = self.get(pattern)
+        if candidates is None:
+            raise KeyError(pattern)
+        return candidates
+
+    def get(self, pattern, default=None):
+        candidates = self.hot.get(pattern)
+        if candidates is not None:
+            return candidates
+        return self.cold.get(pattern, default) if self._in_cold(pattern) else default
+
+    def __iter__(self):
+        return iter(self.cold)
+
+    def keys(self):
+        return self.cold.keys()
+
+    def values(self):
+        return self.cold.values()
+
+    def items(self):
+        return self.cold.items()
+
+    def words(self, pattern):
+        """候補の単語を頻度順のタプルで返す（ホット層で答えられなければコールド層）"""
+        words = self.hot.words(pattern)
+        if words or not self._in_cold(pattern):
+            return words
+        return self.cold.words(pattern)
+
+    def freqs(self, pattern):
+        if pattern in self.hot or not self._in_cold(pattern):
+            return self.hot.freqs(pattern)
+        return self.cold.freqs(pattern)
+
+    def completion_index(self):
+        return TieredCompletionIndex(self)
+
+    def lattice_patterns(self):
+        """ラティスパターンを返す（ホット層に格納した一覧を読むので、コールド層は開かない）"""
+        if not self.meta['lattices']:
+            return []
+        patterns = self.hot.strings('tier_lattices')
+        if patterns is None:
+            # 一覧を格納していない古いホット層
+            return lattice_patterns_of(self.cold)
+        return patterns
+
+
+class TieredCompletionIndex:
+    """
+    TieredDictionary の予測候補（TopKCompletionIndex と同じ使い方）
+    ホット層に格納されたプレフィックスはそのまま返し、それ以外はコールド層の予測候補を使う
+    """
+
+    def __init__(self, tiered):
+        self.tiered = tiered
+        self.hot = tiered.hot.completion_index()
+        self.k = self.hot.k
+        self._cold = None
+
+    def _cold_index(self):
+        if self._cold is None:
+            self._cold = completion_index_for(self.tiered.cold, self.k)
+        return self._cold
+
+    def completions(self, prefix):
+        """prefixの予測候補（頻度上位k件）を (word, pattern, freq) のリストで返す"""
+        if prefix in self.hot:
+            return self.hot.completions(prefix)
+        return self._cold_index().completions(prefix)
+
+    def count(self, prefix):
+        """prefixの予測候補の総数を返す"""
+        if prefix in self.hot:
+            return self.hot.count(prefix)
+        return self._cold_index().count(prefix)
+
+    def summary(self):
+        return f"予測候補キャッシュ: ホット層 {len(self.hot):,}プレフィックス (k={self.k}), 他は元の辞書"
+
+
+def open_layered_dictionary(path, overlays=(), use_cache=True, log=print):
+    """
+    辞書を開き、overlays の辞書を上に重ねる（overlays がなければ open_dictionary と同じ）
+
+    Args:
+        path: 基本の辞書ファイル
+        overlays: 重ねる辞書ファイルのリスト（後のものほど上の層）
+        use_cache, log: open_dictionary と同じ
+
+    Returns:
+        重ねる辞書があれば LayeredDictionary、なければ open_dictionary の結果
+    """
+    base = open_dictionary(path, use_cache, log)
+    if not overlays:
+        return base
+    return LayeredDictionary([base] + [open_dictionary(p, use_cache, log) for p in overlays])
+
+
+class LayeredDictionary:
+    """
+    複数の辞書を重ね合わせた辞書（チームごとの固有名詞・ホスト名などを基本の辞書に足す）
+
+    各層の辞書はそのまま参照し、パターンを引いたときにそのパターンを持つ層の候補だけを
+    頻度順に統合する（基本の辞書は写さないので、小さな辞書を重ねるコストは重ねる辞書の分だけ）
+    同じ単語（大文字小文字は区別しない）は頻度の高い方を残し、同頻度なら上の層を先に並べる
+    """
+
+    def __init__(self, layers):
+        """
+        Args:
+            layers: 辞書のリスト（先頭が基本の辞書、後のものほど上の層）
+        """
+        self.layers = list(layers)
+        self._top_down = self.layers[::-1]
+        self._merged = functools.lru_cache(maxsize=WORDS_CACHE_SIZE)(self._merged_uncached)
+        # 下の層と重なる候補のプレフィックスごとの数（予測候補の総数から引く）
+        self.duplicates = {}
+        patterns = len(self.layers[0])
+        for i, layer in enumerate(self.layers[1:], 1):
+            lattices = lattice_patterns_of(layer)
+            for pattern in layer:
+                lower = {w.lower() for below in self.layers[:i] for w in below.words(pattern)}
+                if not lower:
+                    patterns += 1
+                    continue
+                if pattern in lattices:
+                    continue
+                duplicated = sum(1 for w in layer.words(pattern) if w.lower() in lower)
+                if duplicated:
+                    for j in range(1, len(pattern)):
+                        self.duplicates[pattern[:j]] = self.duplicates.get(pattern[:j], 0) + duplicated
+        self.meta = {'patterns': patterns}
+
+    def _merged_uncached(self, pattern):
+        groups = []
+        for layer in self._top_down:
+            words = layer.words(pattern)
+            if words:
+                groups.append((words, layer.freqs(pattern)))
+        if len(groups) <= 1:
+            return groups[0] if groups else ((), ())
+        merged = {}
+        for words, freqs in groups:
+            for word, freq in zip(words, freqs):
+                key = word.lower()
+                current = merged.get(key)
+                if current is None or freq > current[1]:
+                    merged[key] = (word, freq)
+        # 上の層から順に入れたので、同頻度は上の層が先（安定ソート）
+        entries = sorted(merged.values(), key=lambda e: e[1], reverse=True)
+        return tuple(w for w, _ in entries), tuple(f for _, f in entries)
+
+    def __len__(self):
+        return self.meta['patterns']
+
+    def __contains__(self, pattern):
+        return any(pattern in layer for layer in self.layers)
+
+    def __getitem__(self, pattern):
+        words, freqs = self._merged(pattern)
+        if not words:
+            raise KeyError(pattern)
+        return [{"word": w, "freq": f} for w, f in zip(words, freqs)]
+
+    def get(self, pattern, default=None):
+        try:
+            return self[pattern]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        """基本の辞書のパターン、続いて上の層にだけあるパターンを返す"""
+        for i, layer in enumerate(self.layers):
+            for pattern in layer:
+                if i == 0 or not any(pattern in below for below in self.layers[:i]):
+                    yield pattern
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for pattern in self:
+            yield pattern, self[pattern]
+
+    def values(self):
+        for _, candidates in self.items():
+            yield candidates
+
+    def words(self, pattern):
+        """候補の単語を頻度順のタプルで返す（全ての層を統合）"""
+        return self._merged(pattern)[0]
+
+    def freqs(self, pattern):
+        """候補の頻度を words() と同じ順のタプルで返す"""
+        return self._merged(pattern)[1]
+
+    def lattice_patterns(self):
+        """いずれかの層にあるラティスパターンを返す"""
+        patterns = set()
+        for layer in self.layers:
+            meta = getattr(layer, 'meta', None)
+            if meta is not None and meta.get('lattices') == 0:
+                continue
+            patterns.update(lattice_patterns_of(layer))
+        return sorted(patterns)
+
+
+class LayeredCompletionIndex:
+    """
+    LayeredDictionary の予測候補（TopKCompletionIndex と同じ使い方）
+    各層の予測候補（上位k件）を統合する。統合後の上位k件はいずれかの層の上位k件に含まれる
+    """
+
+    def __init__(self, dictionary, indexes):
+        self.dictionary = dictionary
+        self.indexes = indexes  # 各層の予測候補（dictionary.layers と同じ順）
+        self.k = min(index.k for index in indexes)
+
+    def completions(self, prefix):
+        """prefixの予測候補（頻度上位k件）を (word, pattern, freq) のリストで返す"""
+        groups = [index.completions(prefix) for index in reversed(self.indexes)]
+        groups = [group for group in groups if group]
+        if len(groups) <= 1:
+            return groups[0][:self.k] if groups else []
+        merged = {}
+        for group in groups:
+            for entry in group:
+                key = (entry[0].lower(), entry[1])
+                current = merged.get(key)
+                if current is None or entry[2] > current[2]:
+                    merged[key] = entry
+        # 並びは TopKCompletionIndex と同じく頻度の降順、同頻度はパターン順（同じパターンは上の層が先）
+        entries = sorted(merged.values(), key=lambda e: e[1])
+        entries.sort(key=lambda e: e[2], reverse=True)
+        return entries[:self.k]
+
+    def count(self, prefix):
+        """prefixの予測候補の総数を返す"""
+        return sum(index.count(prefix) for index in self.indexes) - self.dictionary.duplicates.get(prefix, 0)
+
+    def summary(self):
+        return f"{self.indexes[0].summary()}, 重ね合わせ {len(self.indexes) - 1} 辞書"
+
+
+def stored_dictionary_stats(path, dictionary=None):
+    """
+    保存済みの統計を返す（辞書をたどらない）
+    コンパイル済み辞書・キャッシュはヘッダーのメタ情報、JSONはサイドカーから読む
+
+    Returns:
+        dict: DictionaryStats.to_dict() の値（保存されていなければNone）
+    """
+    meta = getattr(dictionary, 'meta', None)
+    if meta is not None and 'stats' in meta:
+        return meta['stats']
+    if is_compiled_dictionary(path):
+        return (read_compiled_meta(path) or {}).get('stats')
+    metadata = read_dictionary_metadata(path)
+    return metadata['stats'] if metadata else None
+
+
+def completion_index_for(dictionary, k):
+    """
+    予測候補キャッシュを返す
+    辞書ファイルに十分な件数のキャッシュが含まれていればそれを使い、なければ構築する
+    SQLite辞書はキャッシュを作らず、その都度範囲検索で求める
+    重ね合わせた辞書は層ごとの予測候補を統合する
+    """
+    if isinstance(dictionary, LayeredDictionary):
+        return LayeredCompletionIndex(dictionary, [completion_index_for(layer, k) for layer in dictionary.layers])
+    if hasattr(dictionary, 'range_completion_index'):
+        return dictionary.range_completion_index(k)
+    if hasattr(dictionary, 'completion_index'):
+        stored = dictionary.completion_index()
+        if stored is not None and stored.k >= k:
+            return stored
+    return TopKCompletionIndex(dictionary, k)
+
+
+def lattice_index_for(dictionary):
+    """
+    辞書に含まれるラティスパターンのインデックスを返す（ラティスがなければNone）
+    コンパイル済み辞書はメタ情報の件数で判断し、ないときはパターンを走査しない
+    """
+    meta = getattr(dictionary, 'meta', None)
+    if meta is not None and meta.get('lattices') == 0:
+        return None
+    # ラティスを印で引ける辞書（コンパイル済み・SQLite）は全パターンを走査しない
+    index = LatticeIndex(sorted(lattice_patterns_of(dictionary)))
+    return index if len(index) else None
+
+
+def lookup_candidates(dictionary, lattice_index, eight_key_input):
+    """
+    8キー入力の候補を返す（完全一致とラティスのマッチを頻度順に統合）
+
+    Returns:
+        list: [{"word": ..., "freq": ...}, ...]（頻度の高い順）
+    """
+    candidates = dictionary.get(eight_key_input) or []
+    lattice_patterns = lattice_index.match(eight_key_input) if lattice_index is not None else None
+    if not lattice_patterns:
+        return candidates
+    return _merge_lattice_candidates(dictionary, candidates, lattice_patterns)
+
+
+def _merge_lattice_candidates(dictionary, candidates, lattice_patterns):
+    # 同じ単語（大文字小文字は区別しない）は頻度の高い方を残す
+    merged = {}
+    for group in [candidates] + [dictionary[p] for p in lattice_patterns]:
+        for candidate in group:
+            key = candidate['word'].lower()
+            if key not in merged or candidate['freq'] > merged[key]['freq']:
+                merged[key] = candidate
+    return sorted(merged.values(), key=lambda c: c['freq'], reverse=True)
+
+
+def lookup_words(dictionary, lattice_index, eight_key_input):
+    """
+    8キー入力の候補単語を頻度順のタプルで返す
+
+    ラティスのマッチがなければ辞書が保持している単語のタプルをそのまま返すので、
+    候補ごとのオブジェクトもリストも作らない
+    """
+    lattice_patterns = lattice_index.match(eight_key_input) if lattice_index is not None else None
+    if not lattice_patterns:
+        if hasattr(dictionary, 'words'):
+            return dictionary.words(eight_key_input)
+        return tuple(c['word'] for c in dictionary.get(eight_key_input) or ())
+    candidates = dictionary.get(eight_key_input) or []
+    return tuple(c['word'] for c in _merge_lattice_candidates(dictionary, candidates, lattice_patterns))
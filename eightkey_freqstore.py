@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+頻度ストア（.8kf）
+単語 -> 頻度 のマッピングをソート済みキー配列と頻度配列で保存し、mmapで開いて二分探索で引く
+大きな頻度リストでも辞書生成時にマッピング全体をPythonのdictとして読み込まずに済む
+
+ファイル構成は .8kd と同じ（eightkey_compiled.write_sections）
+
+セクション:
+    buckets      u32 × 65537       キー先頭2バイトごとの開始番号（二分探索の範囲を絞る）
+    key_offsets  u32 × (単語数+1)  key_pool内の開始位置
+    key_pool     UTF-8バイト列     単語を連結したもの（バイト順にソート済み）
+    freqs        u64 × 単語数      各単語の頻度
+"""
+
+import array
+import json
+import sys
+import time
+
+from eightkey_compiled import map_sections, pool_strings, write_sections
+
+
+MAGIC = b'8KFQ'
+FREQ_SUFFIX = '.8kf'
+
+_BUCKETS = 1 << 16
+
+
+def is_frequency_store(path):
+    """ファイルが頻度ストアか（先頭のマジックで判定）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _bucket(key):
+    """UTF-8キーの先頭2バイト（短いキーは0で埋める）。キーの順序を保つ"""
+    return (key[0] << 8 | key[1]) if len(key) >= 2 else (key[0] << 8 if key else 0)
+
+
+def write_frequency_store(freq_map, output_path):
+    """
+    頻度マッピングを頻度ストアとして保存
+
+    Args:
+        freq_map: 単語 -> 頻度（dictまたは (単語, 頻度) の反復を返す items() を持つもの）
+        output_path: 出力ファイル（.8kf）
+    """
+    # UTF-8のバイト順はコードポイント順と同じなので文字列のままソートする
+    items = sorted(freq_map.items())
+    words = [word for word, _ in items]
+    freqs = array.array('Q', (freq for _, freq in items))
+    key_offsets, key_pool = pool_strings(words)
+
+    buckets = array.array('I', [0]) * (_BUCKETS + 1)
+    counts = array.array('I', [0]) * _BUCKETS
+    for word in words:
+        counts[_bucket(word.encode('utf-8'))] += 1
+    total = 0
+    for b in range(_BUCKETS):
+        buckets[b] = total
+        total += counts[b]
+    buckets[_BUCKETS] = total
+
+    info = {'byteorder': sys.byteorder, 'words': len(words)}
+    write_sections(output_path, MAGIC, info, [
+        ('buckets', buckets),
+        ('key_offsets', key_offsets),
+        ('key_pool', key_pool),
+        ('freqs', freqs),
+    ])
+
+
+class FrequencyStore:
+    """
+    頻度ストアをmmapで開いた読み取り専用のマッピング
+
+    dict と同じく get / in / [] / len / 反復で使えるので、
+    8key_dict_with_freq.py の freq_map の代わりにそのまま渡せる
+    ページは引いた部分だけ読み込まれ、単語ごとのPythonオブジェクトも作らない
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mm, self.meta, sections = map_sections(path, MAGIC)
+        self._buckets = sections['buckets']
+        self._key_offsets = sections['key_offsets']
+        self._freqs = sections['freqs']
+        self._key_base = self.meta['sections']['key_pool'][0]
+        self._count = self.meta['words']
+
+    def __reduce__(self):
+        # ワーカープロセスへはパスだけを渡して開き直す
+        return FrequencyStore, (self.path,)
+
+    def _key_at(self, i):
+        ko = self._key_offsets
+        base = self._key_base
+        return self._mm[base + ko[i]:base + ko[i + 1]]
+
+    def _find(self, word):
+        """単語の番号を二分探索で返す（なければ-1）"""
+        key = word.encode('utf-8')
+        b = _bucket(key)
+        lo, hi = self._buckets[b], self._buckets[b + 1]
+        ko = self._key_offsets
+        base = self._key_base
+        mm = self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if mm[base + ko[mid]:base + ko[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._buckets[b + 1] and self._key_at(lo) == key:
+            return lo
+        return -1
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, word):
+        return isinstance(word, str) and self._find(word) >= 0
+
+    def __getitem__(self, word):
+        i = self._find(word) if isinstance(word, str) else -1
+        if i < 0:
+            raise KeyError(word)
+        return self._freqs[i]
+
+    def get(self, word, default=None):
+        i = self._find(word)
+        return self._freqs[i] if i >= 0 else default
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._key_at(i).decode('utf-8')
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        freqs = self._freqs
+        for i in range(self._count):
+            yield self._key_at(i).decode('utf-8'), freqs[i]
+
+
+def load_frequency_map(path):
+    """頻度マッピングを開く（.8kf なら FrequencyStore、それ以外はJSONを読み込んだdict）"""
+    if is_frequency_store(path):
+        return FrequencyStore(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python eightkey_freqstore.py <freq_mapping.json> [output.8kf]")
+        print("例: python eightkey_freqstore.py freq_mapping.json freq_mapping.8kf")
+        return
+
+    json_file = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) >= 3 else json_file.rsplit('.', 1)[0] + FREQ_SUFFIX
+
+    start = time.perf_counter()
+    with open(json_file, 'r', encoding='utf-8') as f:
+        freq_map = json.load(f)
+    write_frequency_store(freq_map, output_path)
+    print(f"保存完了: {output_path} ({len(freq_map):,} 単語, {time.perf_counter() - start:.2f}秒)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+8キー辞書のインデックス
+8key_shell.py / 8key_typer.py / 8key_decoder.py から共通で使う検索用インデックス
+"""
+
+import bisect
+import sys
+import time
+
+from eightkey_layout import to_8key
+
+
+# 8キーパターンに現れうる最大の文字（前方一致範囲の上限に使う）
+_MAX_CHAR = '\U0010ffff'
+
+
+class PrefixIndex:
+    """
+    ソート済みパターン配列による前方一致インデックス
+
+    辞書読み込み時に一度だけ構築し、前方一致検索は二分探索で範囲を求めるため
+    辞書サイズではなく結果の件数に比例した時間で候補を返す
+    """
+
+    def __init__(self, patterns, lattices=()):
+        """
+        Args:
+            patterns: 8キーパターン
+            lattices: patterns のうちラティスのもの（前方一致の対象外、LatticeIndexで完全一致だけを扱う）
+        """
+        lattices = set(lattices)
+        self.keys = sorted(p for p in patterns if p not in lattices)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def range(self, prefix):
+        """prefixで始まるパターンの範囲 [lo, hi) を返す"""
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + _MAX_CHAR, lo)
+        return lo, hi
+
+    def completions(self, prefix, include_exact=True):
+        """
+        prefixで始まるパターンを順に返す
+
+        Args:
+            prefix: 8キー入力の前方部分（例: "jd"）
+            include_exact: prefix自身と完全一致するパターンも含めるか
+        """
+        lo, hi = self.range(prefix)
+        for i in range(lo, hi):
+            key = self.keys[i]
+            if include_exact or key != prefix:
+                yield key
+
+
+# 予測候補キャッシュの既定の保持件数
+DEFAULT_TOP_K = 10
+
+
+class TopKCompletionIndex:
+    """
+    プレフィックスごとに頻度上位k件の予測候補を保持するキャッシュ
+
+    各プレフィックスについて、そのプレフィックスで始まる（完全一致を除く）
+    パターンの候補のうち頻度上位k件と、候補の総数を事前計算する
+    検索は辞書引き1回なのでキー入力ごとのコストはO(k)
+    """
+
+    def __init__(self, dictionary, k=DEFAULT_TOP_K):
+        """
+        Args:
+            dictionary: 8キーパターン -> [{"word": ..., "freq": ...}] の辞書
+            k: 各プレフィックスで保持する候補数
+        """
+        self.k = k
+        self.top = {}     # prefix -> [(word, pattern, freq), ...]（頻度順）
+        self.counts = {}  # prefix -> 予測候補の総数
+        self.build_time = 0.0
+        self._build(dictionary)
+
+    def _build(self, dictionary):
+        start = time.perf_counter()
+
+        # 全候補を頻度順に並べる（同頻度はパターン順のまま＝安定ソート）
+        lattices = lattice_patterns_of(dictionary)
+        entries = []
+        for pattern in sorted(dictionary):
+            if pattern in lattices:
+                # ラティスは前方一致の対象外（LatticeIndexで完全一致だけを扱う）
+                continue
+            for candidate in dictionary[pattern]:
+                entries.append((candidate['word'], pattern, candidate['freq']))
+        entries.sort(key=lambda x: x[2], reverse=True)
+
+        # 頻度の高い順に各プレフィックスへ配り、k件に達したら以降は数だけ数える
+        top = self.top
+        counts = self.counts
+        k = self.k
+        for entry in entries:
+            pattern = entry[1]
+            for i in range(1, len(pattern)):
+                prefix = pattern[:i]
+                bucket = top.get(prefix)
+                if bucket is None:
+                    top[prefix] = [entry]
+                    counts[prefix] = 1
+                else:
+                    counts[prefix] += 1
+                    if len(bucket) < k:
+                        bucket.append(entry)
+
+        self.build_time = time.perf_counter() - start
+
+    def completions(self, prefix):
+        """prefixの予測候補（頻度上位k件）を (word, pattern, freq) のリストで返す"""
+        return self.top.get(prefix, [])
+
+    def count(self, prefix):
+        """prefixの予測候補の総数を返す"""
+        return self.counts.get(prefix, 0)
+
+    def memory_usage(self):
+        """キャッシュが保持するオブジェクトのおおよそのメモリ量（バイト）"""
+        total = sys.getsizeof(self.top) + sys.getsizeof(self.counts)
+        entries = {}
+        for prefix, bucket in self.top.items():
+            total += sys.getsizeof(prefix) + sys.getsizeof(bucket)
+            for entry in bucket:
+                entries[id(entry)] = entry
+        # 候補タプルは複数のプレフィックスで共有されているので1回だけ数える
+        total += sum(sys.getsizeof(entry) for entry in entries.values())
+        return total
+
+    def summary(self):
+        """構築時間とメモリ量の要約文字列"""
+        return (f"予測候補キャッシュ: {len(self.top):,}プレフィックス (k={self.k}), "
+                f"構築 {self.build_time * 1000:.0f}ms, 約{self.memory_usage() / 1024 / 1024:.1f}MB")
+
+
+class ReverseIndex:
+    """
+    単語 -> 8キーパターンの逆引きインデックス
+
+    キーは小文字化した単語（辞書生成時の大文字小文字の統合と同じ単位）
+    初回の検索時に一度だけ構築し、以降は辞書引き1回で返す
+    辞書にない単語は to_8key で直接変換する
+    """
+
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        self._index = None
+
+    def _build(self):
+        index = {}
+        lattices = lattice_patterns_of(self.dictionary)
+        for pattern, candidates in self.dictionary.items():
+            if pattern in lattices:
+                # ラティスは入力できる形（各選択肢の先頭）に展開する
+                pattern = first_lattice_path(pattern)
+            for candidate in candidates:
+                # 複数パターンに現れる単語は辞書順で最初のパターンを採用
+                index.setdefault(candidate['word'].lower(), pattern)
+        self._index = index
+
+    def lookup(self, word):
+        """辞書に登録されたパターンを返す（なければNone）"""
+        if self._index is None:
+            self._build()
+        return self._index.get(word.lower())
+
+    def get(self, word):
+        """単語の8キーパターンを返す（辞書になければ直接変換）"""
+        pattern = self.lookup(word)
+        if pattern is None:
+            pattern = to_8key(word)
+        return pattern
+
+
+# --- ラティス（日本語入力の表記ゆれをまとめたパターン） ---
+#
+# 8キーパターン中の {a|b|c} は「a, b, c のいずれか」を表す
+# 例: "{sjk|sk}lda" は "sjklda" と "sklda" の両方にマッチする
+# パターン中の \ { | } はバックスラッシュでエスケープする
+#
+# ラティスかどうかはパターンの文字列からは判断せず、辞書に付けた印で区別する
+# （英語の行から作ったパターンにも { や \ は現れうるので、印のないパターンは書いたとおりに引く）
+#   JSON辞書   候補の "lattice": true
+#   8キーTSV   3列目の "lattice"
+#   .8kd       lattice_ids セクション（ラティスのパターン番号）
+#   .8kdb      candidates テーブルの lattice 列
+
+LATTICE_MARK = 'lattice'
+
+_LATTICE_SPECIAL = '\\{|}'
+
+
+def _escape_lattice(text):
+    return ''.join('\\' + c if c in _LATTICE_SPECIAL else c for c in text)
+
+
+def format_lattice(segments):
+    """
+    選択肢の列を8キーパターンにする
+
+    Args:
+        segments: 各位置の選択肢のリスト（例: [['sjk', 'sk'], ['l'], ['da']]）
+                  重複する選択肢はまとめ、選択肢が1つの位置はそのまま連結する
+
+    Returns:
+        tuple: (パターン, ラティスか)
+               選択肢が2つ以上の位置がなければ、エスケープせずに連結した通常のパターン
+    """
+    segments = [list(dict.fromkeys(choices)) for choices in segments]
+    if all(len(unique) == 1 for unique in segments):
+        return ''.join(unique[0] for unique in segments), False
+    parts = []
+    for unique in segments:
+        if len(unique) == 1:
+            parts.append(_escape_lattice(unique[0]))
+        else:
+            parts.append('{' + '|'.join(_escape_lattice(c) for c in unique) + '}')
+    return ''.join(parts), True
+
+
+def is_lattice_entry(candidates):
+    """候補リストにラティスの印があるか（JSON辞書の候補）"""
+    return any(c.get(LATTICE_MARK) for c in candidates)
+
+
+def lattice_patterns_of(dictionary):
+    """
+    辞書のラティスパターンの集合
+    lattice_patterns() を持つ辞書はそれを使い、JSONを読み込んだ辞書は候補の印から集める
+    """
+    if hasattr(dictionary, 'lattice_patterns'):
+        return set(dictionary.lattice_patterns())
+    return {pattern for pattern, candidates in dictionary.items() if is_lattice_entry(candidates)}
+
+
+def parse_lattice(pattern):
+    """
+    ラティス文字列をトークン列に分解
+
+    Returns:
+        list: 1文字のリテラルは文字列、選択肢は文字列のタプル
+    """
+    tokens = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '\\' and i + 1 < n:
+            tokens.append(pattern[i + 1])
+            i += 2
+        elif c == '{':
+            choices = []
+            current = []
+            i += 1
+            while i < n and pattern[i] != '}':
+                if pattern[i] == '\\' and i + 1 < n:
+                    current.append(pattern[i + 1])
+                    i += 2
+                    continue
+                if pattern[i] == '|':
+                    choices.append(''.join(current))
+                    current = []
+                else:
+                    current.append(pattern[i])
+                i += 1
+            choices.append(''.join(current))
+            tokens.append(tuple(choices))
+            i += 1
+        else:
+            tokens.append(c)
+            i += 1
+    return tokens
+
+
+def first_lattice_path(pattern):
+    """ラティスの各選択肢で先頭を選んだ8キー入力を返す"""
+    return ''.join(t if isinstance(t, str) else t[0] for t in parse_lattice(pattern))
+
+
+class _LatticeNode:
+    __slots__ = ('chars', 'groups', 'patterns')
+
+    def __init__(self):
+        self.chars = {}     # リテラル1文字 -> 子ノード
+        self.groups = {}    # 選択肢のタプル -> 子ノード
+        self.patterns = []  # ここで終わるラティスパターン
+
+
+class LatticeIndex:
+    """
+    ラティスパターンのトライ
+
+    表記ゆれの組み合わせを展開せずに保持し、入力をトライ上でたどってマッチを調べる
+    リテラル文字は辞書引き、選択肢はそのノードにある選択肢（数種類）だけを試すので
+    検索時間はラティスの総数ではなく入力長とマッチしうる経路の数に比例する
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: ラティスパターン（lattice_patterns_of で集めたもの）
+        """
+        self.root = _LatticeNode()
+        self.count = 0
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, pattern):
+        node = self.root
+        for token in parse_lattice(pattern):
+            edges = node.chars if isinstance(token, str) else node.groups
+            child = edges.get(token)
+            if child is None:
+                child = edges[token] = _LatticeNode()
+            node = child
+        node.patterns.append(pattern)
+        self.count += 1
+
+    def match(self, eight_key_input):
+        """入力にマッチするラティスパターンのリストを返す"""
+        matches = []
+        n = len(eight_key_input)
+        stack = [(self.root, 0)]
+        seen = set()
+        while stack:
+            node, pos = stack.pop()
+            if pos == n:
+                matches.extend(node.patterns)
+            if pos < n:
+                child = node.chars.get(eight_key_input[pos])
+                if child is not None:
+                    stack.append((child, pos + 1))
+            for choices, child in node.groups.items():
+                for choice in choices:
+                    if eight_key_input.startswith(choice, pos):
+                        state = (id(child), pos + len(choice))
+                        if state not in seen:
+                            seen.add(state)
+                            stack.append((child, pos + len(choice)))
+        return list(dict.fromkeys(matches))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+8キー配列の定義
+QWERTYの各キーを担当する指（8キー）への対応表と変換関数
+"""
+
+# 指ごとのqwertyキー割り当て
+FINGER_TO_KEYS = [
+    set('qaz'),    # 左小指
+    set('wsx'),    # 左薬指
+    set('edc'),    # 左中指
+    set('rfvtgb'), # 左人差指
+    set('yhnujm'), # 右人差指
+    set('ik,'),    # 右中指
+    set('ol.'),    # 右薬指
+    set('p;:/\'"?'),   # 右小指
+]
+# 8キーのラベル（a〜; など自由に変更可）
+FINGER_LABELS = ['a','s','d','f','j','k','l',';']
+
+# 文字→指ラベルの逆引き辞書
+KEY_TO_FINGER = {}
+for i, keys in enumerate(FINGER_TO_KEYS):
+    for k in keys:
+        KEY_TO_FINGER[k] = FINGER_LABELS[i]
+        KEY_TO_FINGER[k.upper()] = FINGER_LABELS[i]
+
+
+# str.translate 用の変換表（対応表にない文字はそのまま）
+TRANSLATE_TABLE = str.maketrans(KEY_TO_FINGER)
+
+# bytes.translate 用の変換表
+# 対応表のキーはすべてASCIIなので、UTF-8のバイト列上で変換しても多バイト文字は壊れない
+BYTES_TRANSLATE_TABLE = bytearray(range(256))
+for k, v in KEY_TO_FINGER.items():
+    BYTES_TRANSLATE_TABLE[ord(k)] = ord(v)
+BYTES_TRANSLATE_TABLE = bytes(BYTES_TRANSLATE_TABLE)
+
+
+def to_8key(text):
+    """元のテキストを8キー入力に変換"""
+    return text.translate(TRANSLATE_TABLE)
+
+
+def to_8key_batch(words):
+    """
+    複数の単語をまとめて8キー入力に変換
+
+    改行で連結したUTF-8バイト列を1回の bytes.translate で変換し、分割して戻す
+    （改行を含む単語があって分割がずれる場合は1語ずつ変換する）
+
+    Args:
+        words: 単語のリスト
+
+    Returns:
+        list: 8キー入力のリスト（wordsと同じ順序）
+    """
+    if not words:
+        return []
+    joined = '\n'.join(words).encode('utf-8')
+    converted = joined.translate(BYTES_TRANSLATE_TABLE).decode('utf-8').split('\n')
+    if len(converted) != len(words):
+        return [word.translate(TRANSLATE_TABLE) for word in words]
+    return converted
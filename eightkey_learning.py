@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+候補選択の学習
+シェルで確定した (8キーパターン, 単語) を追記専用のログに記録し（--selections で指定したときだけ）、
+選ばれた回数の多い単語をそのパターンの候補の先頭に寄せる
+
+ログの形式（1行1件、タブ区切り）:
+    パターン \t 単語            確定するたびに追記する1回分の選択
+    パターン \t 単語 \t 回数    compact() でまとめた行
+
+並べ替えは選択回数の降順、同数なら辞書の頻度順（元の順序）のまま
+選択を記録したときは、そのパターンの並びだけを選ばれた単語の移動で更新する
+"""
+
+import os
+import sys
+
+from eightkey_compiled import create_temp_file
+
+
+# ログの行数がまとめた件数のこの倍を超えたら、読み込み時にまとめ直す
+COMPACT_RATIO = 4
+COMPACT_MIN_LINES = 1000
+
+
+class SelectionLog:
+    """
+    選択回数のログ（読み込み時に パターン -> {単語: 回数} を作り、以降は追記だけ）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = {}  # パターン -> {単語: 選択回数}
+        self.lines = 0
+        self._file = None
+        self._load()
+        entries = self.entries
+        if self.lines > COMPACT_MIN_LINES and self.lines > entries * COMPACT_RATIO:
+            self.compact()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        counts = self.counts
+        for line in data.split('\n'):
+            parts = line.split('\t')
+            if len(parts) < 2 or not parts[0] or not parts[1]:
+                continue  # 空行・書きかけの行
+            count = int(parts[2]) if len(parts) >= 3 and parts[2].isdigit() else 1
+            words = counts.get(parts[0])
+            if words is None:
+                words = counts[parts[0]] = {}
+            words[parts[1]] = words.get(parts[1], 0) + count
+            self.lines += 1
+
+    @property
+    def entries(self):
+        """記録された (パターン, 単語) の数"""
+        return sum(len(words) for words in self.counts.values())
+
+    def count(self, pattern, word):
+        return self.counts.get(pattern, {}).get(word, 0)
+
+    def record(self, pattern, word):
+        """選択を1回記録してログに追記する"""
+        words = self.counts.setdefault(pattern, {})
+        words[word] = words.get(word, 0) + 1
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(f"{pattern}\t{word}\n")
+        self._file.flush()
+        self.lines += 1
+
+    def compact(self):
+        """ログを (パターン, 単語, 回数) の1件1行にまとめ直す"""
+        self.close()
+        fd, tmp_path = create_temp_file(self.path)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for pattern in sorted(self.counts):
+                    for word, count in self.counts[pattern].items():
+                        f.write(f"{pattern}\t{word}\t{count}\n")
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.lines = self.entries
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class AdaptiveRanker:
+    """
+    選択回数で候補の並びを変える
+
+    パターンごとに並べ替えた結果を覚えておき、選択を記録したときは
+    そのパターンの並びの中で選ばれた単語を前へ移すだけで更新する（全体の並べ直しはしない）
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self._ranked = {}  # パターン -> (辞書の候補, 並べ替えた候補のリスト, 単語 -> 元の順位)
+
+    def rank(self, pattern, words):
+        """
+        候補を選択回数の降順（同数なら元の順）に並べて返す
+
+        Args:
+            pattern: 8キーパターン
+            words: 辞書の候補（頻度順のタプル）
+        """
+        if pattern not in self.log.counts or not words:
+            return words
+        cached = self._ranked.get(pattern)
+        if cached is None or cached[0] != words:
+            order = {word: i for i, word in enumerate(words)}
+            selections = self.log.counts[pattern]
+            ranked = sorted(words, key=lambda w: -selections.get(w, 0))
+            cached = self._ranked[pattern] = (words, ranked, order)
+        return tuple(cached[1])
+
+    def record(self, pattern, word):
+        """選択を記録し、そのパターンの並びを更新する"""
+        self.log.record(pattern, word)
+        cached = self._ranked.get(pattern)
+        if cached is None:
+            return
+        _, ranked, order = cached
+        if word not in order:
+            # 辞書にない単語（ラティスの候補など）は次に引いたときに並べ直す
+            del self._ranked[pattern]
+            return
+        selections = self.log.counts[pattern]
+        count = selections[word]
+        i = ranked.index(word)
+        # 回数が少ない単語、同数で元の順位が後ろの単語を越えて前へ移す
+        while i > 0:
+            prev = ranked[i - 1]
+            prev_count = selections.get(prev, 0)
+            if prev_count > count or (prev_count == count and order[prev] < order[word]):
+                break
+            ranked[i] = prev
+            i -= 1
+        ranked[i] = word
+
+    def close(self):
+        self.log.close()
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('show', 'compact'):
+        print("Usage: python eightkey_learning.py show|compact <selections.tsv>")
+        print("例: python eightkey_learning.py show ~/.8key_selections.tsv")
+        return
+
+    path = sys.argv[2]
+    log = SelectionLog(path)
+    if sys.argv[1] == 'compact':
+        lines = log.lines
+        log.compact()
+        print(f"まとめ直しました: {path} ({lines:,} 行 → {log.lines:,} 行)")
+        return
+
+    print(f"{path}: {len(log.counts):,} パターン, {log.entries:,} 件 ({log.lines:,} 行)")
+    for pattern in sorted(log.counts):
+        words = sorted(log.counts[pattern].items(), key=lambda x: -x[1])
+        print(f"  {pattern}: " + ", ".join(f"{word} ({count})" for word, count in words))
+
+
+if __name__ == '__main__':
+    main()
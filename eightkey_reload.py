@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+辞書の再読み込み
+長時間開いたままのシェル・タイピングゲームで、作り直された辞書ファイルを検出して
+別スレッドで読み込み、キー入力の合間に入れ替えられるようにする
+
+ファイルの変更はサイズと更新時刻で判定し、書き込み途中のファイルを読まないように
+同じ値が2回続けて見えてから読み込む。JSON辞書のコンパイル済みキャッシュは別プロセスで
+作り直す（読み込みスレッドがGILを長く握って入力が引っかからないように）
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from eightkey_compiled import is_compiled_dictionary, read_compiled_meta
+from eightkey_sqlite import is_sqlite_dictionary
+
+# ファイルの変更を確認する間隔（秒）
+DEFAULT_INTERVAL = 1.0
+
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+_WARM_CACHE = 'import sys\nfrom eightkey_dictionary import open_dictionary\nfor p in sys.argv[1:]:\n    open_dictionary(p)'
+
+
+def dictionary_sources(path):
+    """辞書の読み込みに使うファイル（ホット層なら元の辞書も）"""
+    paths = [path]
+    if is_compiled_dictionary(path):
+        tier = (read_compiled_meta(path) or {}).get('tier')
+        if tier:
+            paths.append(os.path.join(os.path.dirname(path), tier['cold']))
+    return paths
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def warm_json_caches(paths):
+    """JSON辞書のコンパイル済みキャッシュを別プロセスで作っておく（作成済みならすぐ終わる）"""
+    json_paths = [os.path.abspath(p) for p in paths
+                  if os.path.exists(p) and not (is_compiled_dictionary(p) or is_sqlite_dictionary(p))]
+    if json_paths:
+        subprocess.run([sys.executable, '-c', _WARM_CACHE] + json_paths,
+                       cwd=_MODULE_DIR, capture_output=True)
+
+
+class ReloadResult:
+    """再読み込みの結果（state は load() の戻り値、失敗したら error）"""
+
+    def __init__(self, state, error, seconds, messages):
+        self.state = state
+        self.error = error
+        self.seconds = seconds
+        self.messages = messages
+
+
+class DictionaryWatcher:
+    """
+    辞書ファイルを監視し、変更されたら別スレッドで読み込む
+
+    poll() をキー入力の合間に呼び、ReloadResult が返ったら呼び出し側で入れ替える
+    （入れ替えはメインスレッドで行うので、キー入力の処理中に辞書が変わることはない）
+    """
+
+    def __init__(self, paths, load, interval=DEFAULT_INTERVAL):
+        """
+        Args:
+            paths: 監視するファイル
+            load: 新しい辞書を読み込んで返す関数（読み込みスレッドで呼ぶ、表示は引数の log に渡す）
+            interval: ファイルを確認する間隔（秒）
+        """
+        self.paths = list(paths)
+        self.load = load
+        self.interval = interval
+        self._stamps = self._current()
+        self._changed = None  # 変更を検出したときの値（次の確認でも同じなら読み込む）
+        self._checked = time.monotonic()
+        self._thread = None
+        self._result = None
+
+    def _current(self):
+        return [_stamp(p) for p in self.paths]
+
+    @property
+    def loading(self):
+        return self._thread is not None
+
+    def poll(self):
+        """
+        変更を確認し、読み込みが終わっていれば結果を返す（それ以外はNone）
+        ファイルの確認は interval ごとで、それ以外の呼び出しはすぐ戻る
+        """
+        if self._thread is not None:
+            if self._result is None:
+                return None
+            result, self._result, self._thread = self._result, None, None
+            return result
+        now = time.monotonic()
+        if now - self._checked < self.interval:
+            return None
+        self._checked = now
+        stamps = self._current()
+        if stamps == self._stamps or None in stamps:
+            self._changed = None  # 変更なし、または置き換えの途中
+            return None
+        if stamps != self._changed:
+            self._changed = stamps
+            return None
+        self._changed = None
+        self._thread = threading.Thread(target=self._reload, args=(stamps,), daemon=True)
+        self._thread.start()
+        return None
+
+    def _reload(self, stamps):
+        start = time.perf_counter()
+        # 読み込み中の表示は画面を崩さないように溜めておく
+        messages = []
+        state = error = None
+        try:
+            warm_json_caches(self.paths)
+            state = self.load(messages.append)
+        except Exception as e:
+            error = e
+        # 失敗した場合も、次にファイルが変わるまでは読み込み直さない
+        self._stamps = stamps
+        self._result = ReloadResult(state, error, time.perf_counter() - start, messages)
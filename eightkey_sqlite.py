@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+SQLite形式の8キー辞書（.8kdb）
+(パターン, 順位, 単語, 頻度) を主キー (パターン, 順位) のテーブルに保存し、
+完全一致も前方一致の予測候補もインデックスの範囲検索で引く
+予測候補の総数は書き込み時にプレフィックスごとに数えておく
+
+辞書全体を読み込まず、保持するのはSQLiteのページキャッシュと引いたパターンの分だけなので、
+辞書が大きくなってもメモリはほぼ一定（英語とローマ字日本語を統合した巨大な辞書向け）
+
+テーブル:
+    meta        key TEXT, value TEXT（JSON）   patterns / words / lattices / stats など
+    candidates  pattern, rank, word, freq, lattice（主キー (pattern, rank)、WITHOUT ROWID）
+    prefixes    prefix, count（そのプレフィックスで始まる、より長いラティス以外のパターンの候補数）
+"""
+
+import functools
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from eightkey_compiled import WORDS_CACHE_SIZE, create_temp_file
+from eightkey_index import LATTICE_MARK, is_lattice_entry
+from eightkey_stats import DictionaryStats
+
+
+SQLITE_SUFFIX = '.8kdb'
+SCHEMA_VERSION = 2
+
+_SQLITE_MAGIC = b'SQLite format 3\x00'
+# 8キーパターンに現れうる最大の文字（前方一致範囲の上限に使う）
+_MAX_CHAR = '\U0010ffff'
+# 予測候補の範囲検索結果を覚えておくプレフィックス数（短いプレフィックスほど範囲が広い）
+COMPLETIONS_CACHE_SIZE = 1024
+
+_SCHEMA = '''
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE candidates (
+    pattern TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    freq INTEGER NOT NULL,
+    lattice INTEGER NOT NULL,
+    PRIMARY KEY (pattern, rank)
+) WITHOUT ROWID;
+CREATE TABLE prefixes (
+    prefix TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+def is_sqlite_dictionary(path):
+    """ファイルがSQLiteデータベースか（先頭のマジックで判定）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(_SQLITE_MAGIC)) == _SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+class SqliteDictWriter:
+    """
+    8キー辞書をパターンごとに追記してSQLite辞書を書く（JsonDictWriter と同じ使い方）
+    パターン順に追加すること。close() までは一時ファイルに書き、最後に置き換える
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        # 同じ出力を同時に書くプロセスと混ざらないよう一時ファイルは個別に作る（空のファイルは新しいデータベースとして開ける）
+        fd, self.tmp_path = create_temp_file(output_path)
+        os.close(fd)
+        self.conn = sqlite3.connect(self.tmp_path)
+        # 書き込み中のファイルは置き換えるまで使わないのでジャーナルを取らない
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        self.conn.executescript(_SCHEMA)
+        self.stats = DictionaryStats()
+        self.lattices = 0
+        # 直前のパターンのプレフィックス（短い順）ごとの [プレフィックス, 候補数]
+        # パターン順に追加されるので、次のパターンと共有しないプレフィックスはもう増えない
+        self._open_prefixes = []
+
+    def add(self, eight_key, candidates):
+        """パターンの候補を追加する（候補の "lattice" の印を lattice 列に書く）"""
+        lattice = is_lattice_entry(candidates)
+        self.lattices += lattice
+        self.conn.executemany(
+            'INSERT INTO candidates VALUES (?, ?, ?, ?, ?)',
+            ((eight_key, rank, c['word'], c['freq'], int(bool(c.get(LATTICE_MARK))))
+             for rank, c in enumerate(candidates)))
+        self.stats.add(eight_key, candidates)
+        self._count_prefixes(eight_key, 0 if lattice else len(candidates))
+
+    def _count_prefixes(self, eight_key, count):
+        """パターンの候補数を、パターンより短い全てのプレフィックスの予測候補数に足す"""
+        shared = len(os.path.commonprefix([self._open_prefixes[-1][0], eight_key])) if self._open_prefixes else 0
+        self._flush_prefixes(shared)
+        self._open_prefixes.extend([eight_key[:i], 0] for i in range(shared + 1, len(eight_key) + 1))
+        for entry in self._open_prefixes[:len(eight_key) - 1]:
+            entry[1] += count
+
+    def _flush_prefixes(self, keep):
+        """先頭 keep 個より長いプレフィックスの予測候補数を書く"""
+        self.conn.executemany('INSERT INTO prefixes VALUES (?, ?)',
+                              (entry for entry in self._open_prefixes[keep:] if entry[1]))
+        del self._open_prefixes[keep:]
+
+    def close(self, meta=None):
+        """
+        メタ情報を書いて出力ファイルに置き換える
+
+        Args:
+            meta: メタ情報に追加で記録する値
+        """
+        info = {'stats': self.stats.to_dict()}
+        info.update(meta or {})
+        info.update({
+            'version': SCHEMA_VERSION,
+            'patterns': self.stats.patterns,
+            'words': self.stats.total_words,
+            'lattices': self.lattices,
+        })
+        try:
+            self._flush_prefixes(0)
+            self.conn.executemany('INSERT INTO meta VALUES (?, ?)',
+                                  ((key, json.dumps(value, ensure_ascii=False)) for key, value in info.items()))
+            self.conn.commit()
+            self.conn.close()
+            os.replace(self.tmp_path, self.output_path)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """書きかけの一時ファイルを削除する"""
+        self.conn.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+def write_sqlite_dictionary(eight_key_dict, output_path, meta=None):
+    """
+    8キー辞書をSQLite形式で保存
+
+    Args:
+        eight_key_dict: 8キーパターン -> [{"word": ..., "freq": ...}]（頻度順、ラティスの候補には "lattice": true）
+        output_path: 出力ファイル（.8kdb）
+        meta: メタ情報に追加で記録する値
+    """
+    writer = SqliteDictWriter(output_path)
+    try:
+        for pattern in sorted(eight_key_dict):
+            writer.add(pattern, eight_key_dict[pattern])
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close(meta)
+
+
+class SqliteDictionary:
+    """
+    SQLite辞書を読み取り専用で開いた辞書
+
+    JSON辞書・コンパイル済み辞書と同じく パターン -> [{"word": ..., "freq": ...}] として引ける
+    （in / [] / get / len / 反復）。反復もカーソルで順に読むので全体をメモリに置かない
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not is_sqlite_dictionary(path):
+            raise ValueError(f"SQLite辞書ではありません: {path}")
+        # 読み込み処理を別スレッドで行えるように、接続をスレッド間で共有できるようにする
+        self._conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        try:
+            rows = self._conn.execute('SELECT key, value FROM meta').fetchall()
+        except sqlite3.DatabaseError:
+            self._conn.close()
+            raise ValueError(f"SQLite辞書ではありません: {path}")
+        self.meta = {key: json.loads(value) for key, value in rows}
+        if self.meta.get('version') != SCHEMA_VERSION:
+            self._conn.close()
+            raise ValueError(f"未対応のSQLite辞書のバージョンです: {path}")
+        self._rows = functools.lru_cache(maxsize=WORDS_CACHE_SIZE)(self._rows_uncached)
+
+    def _rows_uncached(self, pattern):
+        rows = self._conn.execute(
+            'SELECT word, freq FROM candidates WHERE pattern = ? ORDER BY rank', (pattern,)).fetchall()
+        return tuple(word for word, _ in rows), tuple(freq for _, freq in rows)
+
+    def __len__(self):
+        return self.meta['patterns']
+
+    def __contains__(self, pattern):
+        return isinstance(pattern, str) and bool(self._rows(pattern)[0])
+
+    def __getitem__(self, pattern):
+        words, freqs = self._rows(pattern) if isinstance(pattern, str) else ((), ())
+        if not words:
+            raise KeyError(pattern)
+        return [{"word": w, "freq": f} for w, f in zip(words, freqs)]
+
+    def get(self, pattern, default=None):
+        try:
+            return self[pattern]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        cursor = self._conn.execute('SELECT DISTINCT pattern FROM candidates ORDER BY pattern')
+        for (pattern,) in cursor:
+            yield pattern
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        cursor = self._conn.execute('SELECT pattern, word, freq FROM candidates ORDER BY pattern, rank')
+        pattern = None
+        candidates = []
+        for p, word, freq in cursor:
+            if p != pattern:
+                if pattern is not None:
+                    yield pattern, candidates
+                pattern = p
+                candidates = []
+            candidates.append({"word": word, "freq": freq})
+        if pattern is not None:
+            yield pattern, candidates
+
+    def values(self):
+        for _, candidates in self.items():
+            yield candidates
+
+    def words(self, pattern):
+        """候補の単語を頻度順のタプルで返す（なければ空のタプル）"""
+        return self._rows(pattern)[0]
+
+    def freqs(self, pattern):
+        """候補の頻度を words() と同じ順のタプルで返す"""
+        return self._rows(pattern)[1]
+
+    def lattice_patterns(self):
+        """ラティスパターンを順に返す"""
+        cursor = self._conn.execute(
+            'SELECT DISTINCT pattern FROM candidates WHERE lattice = 1 ORDER BY pattern')
+        for (pattern,) in cursor:
+            yield pattern
+
+    def range_completion_index(self, k):
+        """予測候補をその都度範囲検索で求めるインデックス"""
+        return SqliteCompletionIndex(self, k)
+
+    def close(self):
+        self._conn.close()
+
+
+class SqliteCompletionIndex:
+    """
+    SQLite辞書の予測候補（TopKCompletionIndex と同じ使い方）
+
+    プレフィックスで始まるパターンを主キーの範囲検索で集め、頻度上位k件を返す
+    上位k件は事前計算しないので構築時間もメモリも要らない。並びは TopKCompletionIndex と同じ
+    （頻度の降順、同頻度はパターン順・パターン内の順位順）
+    総数は書き込み時に数えた prefixes テーブルから引く（範囲を数え直さない）
+    """
+
+    def __init__(self, dictionary, k):
+        self.dictionary = dictionary
+        self.k = k
+        self._query = functools.lru_cache(maxsize=COMPLETIONS_CACHE_SIZE)(self._query_uncached)
+
+    def _query_uncached(self, prefix):
+        # 完全一致を除くので下限は prefix より大きいもの
+        return self.dictionary._conn.execute(
+            'SELECT word, pattern, freq FROM candidates '
+            'WHERE pattern > ? AND pattern < ? AND lattice = 0 '
+            'ORDER BY freq DESC, pattern, rank LIMIT ?', (prefix, prefix + _MAX_CHAR, self.k)).fetchall()
+
+    def completions(self, prefix):
+        """prefixの予測候補（頻度上位k件）を (word, pattern, freq) のリストで返す"""
+        if not prefix:
+            return []
+        return self._query(prefix)
+
+    def count(self, prefix):
+        """prefixの予測候補の総数を返す"""
+        if not prefix:
+            return 0
+        row = self.dictionary._conn.execute('SELECT count FROM prefixes WHERE prefix = ?', (prefix,)).fetchone()
+        return row[0] if row else 0
+
+    def summary(self):
+        return f"予測候補: 範囲検索 (k={self.k}, SQLite)"
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python eightkey_sqlite.py <dictionary.json> [output.8kdb]")
+        print("例: python eightkey_sqlite.py linux_words.json linux_words.8kdb")
+        return
+
+    json_file = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) >= 3 else json_file.rsplit('.', 1)[0] + SQLITE_SUFFIX
+
+    start = time.perf_counter()
+    with open(json_file, 'r', encoding='utf-8') as f:
+        eight_key_dict = json.load(f)
+    write_sqlite_dictionary(eight_key_dict, output_path)
+    print(f"保存完了: {output_path} ({time.perf_counter() - start:.2f}秒)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+8キー辞書の統計（メタ情報）
+辞書生成時に1回だけ集計して保存し、読み込み時は辞書全体をたどらずに表示する
+
+保存先:
+    JSON辞書   隣のサイドカー（linux_words.json -> linux_words.meta.json）
+               辞書ファイルのサイズ・更新時刻・内容のハッシュを記録し、内容が一致しない場合は使わない
+    .8kd       ヘッダーのメタ情報の "stats"（JSON辞書のキャッシュも同じ）
+"""
+
+import hashlib
+import json
+import os
+
+
+class DictionaryStats:
+    """
+    辞書の統計（パターンを1つずつ追加して集計する）
+
+    辞書生成時に1回だけ計算してメタ情報（サイドカーまたは .8kd のヘッダー）に保存し、
+    読み込み時は保存された値を表示する
+    """
+
+    def __init__(self):
+        self.patterns = 0
+        self.total_words = 0
+        self.unique_patterns = 0
+        self.collision_patterns = 0
+        self.max_collision = 0
+        self.max_collision_pattern = None
+        self.max_collision_words = []
+        self.length_histogram = {}  # パターン長 -> パターン数
+
+    def add(self, eight_key, candidates):
+        """
+        パターンを1つ追加する（パターン順に追加すること）
+
+        Args:
+            candidates: 候補の {"word": ..., "freq": ...} または単語のシーケンス（頻度順）
+        """
+        self._count(eight_key, len(candidates), 1)
+        if len(candidates) > max(self.max_collision, 1):
+            self._set_max(eight_key, candidates)
+
+    def _count(self, eight_key, n, sign):
+        self.patterns += sign
+        self.total_words += sign * n
+        length = len(eight_key)
+        self.length_histogram[length] = self.length_histogram.get(length, 0) + sign
+        if not self.length_histogram[length]:
+            del self.length_histogram[length]
+        if n == 1:
+            self.unique_patterns += sign
+        else:
+            self.collision_patterns += sign
+
+    def remove(self, eight_key, n):
+        """
+        候補数 n のパターンを取り除く（差分更新用）
+        最大衝突は変えないので、最大衝突のパターンが減る場合は呼び出し側で集計し直す
+        """
+        self._count(eight_key, n, -1)
+
+    def merge(self, eight_key, candidates):
+        """
+        パターンを順序に関係なく追加する（差分更新用）
+        最大衝突が同数ならパターン順で先のもの（全体を順に追加した場合と同じ）を残す
+        """
+        self._count(eight_key, len(candidates), 1)
+        n = len(candidates)
+        if n > 1 and (n > self.max_collision or
+                      (n == self.max_collision and eight_key <= self.max_collision_pattern)):
+            self._set_max(eight_key, candidates)
+
+    def _set_max(self, eight_key, candidates):
+        self.max_collision = len(candidates)
+        self.max_collision_pattern = eight_key
+        self.max_collision_words = [c['word'] if isinstance(c, dict) else c for c in candidates]
+
+    def to_dict(self):
+        return {
+            'patterns': self.patterns,
+            'total_words': self.total_words,
+            'unique_patterns': self.unique_patterns,
+            'collision_patterns': self.collision_patterns,
+            'max_collision': self.max_collision,
+            'max_collision_pattern': self.max_collision_pattern,
+            'max_collision_words': self.max_collision_words,
+            'length_histogram': {str(k): v for k, v in sorted(self.length_histogram.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for key, value in data.items():
+            setattr(stats, key, value)
+        stats.length_histogram = {int(k): v for k, v in data['length_histogram'].items()}
+        return stats
+
+
+def compute_dictionary_stats(dictionary):
+    """
+    辞書の全パターンをたどって統計を計算する（明示的に要求されたときだけ使う）
+
+    Returns:
+        dict: DictionaryStats.to_dict() の値
+    """
+    stats = DictionaryStats()
+    if hasattr(dictionary, 'words'):
+        for pattern in sorted(dictionary):
+            stats.add(pattern, dictionary.words(pattern))
+    else:
+        for pattern in sorted(dictionary):
+            stats.add(pattern, dictionary[pattern])
+    return stats.to_dict()
+
+
+def file_sha256(path):
+    """ファイルの内容の sha256"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def metadata_path_for(path):
+    """辞書のメタ情報サイドカーのパス（例: linux_words.json -> linux_words.meta.json）"""
+    return os.path.splitext(path)[0] + '.meta.json'
+
+
+def write_dictionary_metadata(path, stats):
+    """辞書ファイルの隣にメタ情報（統計）のサイドカーを書く"""
+    st = os.stat(path)
+    metadata = {
+        'dictionary': os.path.basename(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'sha256': file_sha256(path),
+        'stats': stats,
+    }
+    with open(metadata_path_for(path), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+
+def read_dictionary_metadata(path):
+    """
+    サイドカーのメタ情報を読む（ない・辞書と内容が合わない場合はNone）
+    サイズと更新時刻が記録と同じなら一致とみなし、更新時刻だけ違う場合は内容のハッシュで確認する
+    （同じサイズの書き換えでは古い統計を使わない）
+    """
+    try:
+        with open(metadata_path_for(path), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        st = os.stat(path)
+        if metadata.get('size') != st.st_size or 'sha256' not in metadata:
+            return None
+        if metadata.get('mtime_ns') != st.st_mtime_ns and metadata['sha256'] != file_sha256(path):
+            return None
+    except (OSError, ValueError):
+        return None
+    return metadata
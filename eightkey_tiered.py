@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+ホット層（.hot.8kd）の生成
+よく使う単語（common_words_3000.txt など）を含むパターンの候補リストを元の辞書から写し、
+それらのパターンのプレフィックスの予測候補（元の辞書全体での上位k件）と一緒に
+小さなコンパイル済み辞書として保存する
+元の辞書のラティスパターンの一覧もホット層に入れておく（起動時にラティスのインデックスを作るため）
+
+ホット層のパスを open_dictionary に渡すと TieredDictionary として開き、
+元の辞書（コールド層）はホット層にないパターンを引いたときに初めて開く
+"""
+
+import argparse
+import json
+import os
+import time
+
+from eightkey_compiled import write_compiled_dictionary
+from eightkey_dictionary import (
+    HOT_SUFFIX, completion_index_for, open_dictionary, source_record, stored_dictionary_stats,
+)
+from eightkey_index import DEFAULT_TOP_K, lattice_patterns_of
+from eightkey_stats import compute_dictionary_stats
+
+
+def load_hot_words(path):
+    """よく使う単語（小文字）の集合を読む（1行1語の単語リスト、または8キー辞書JSON）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return {c['word'].lower() for candidates in json.load(f).values() for c in candidates}
+        return {line.strip().lower() for line in f if line.strip()}
+
+
+class HotCompletions:
+    """ホット層に格納する予測候補（write_compiled_dictionary に渡す top / counts）"""
+
+    def __init__(self, k):
+        self.k = k
+        self.top = {}     # prefix -> [(word, pattern, freq), ...]（元の辞書全体での頻度順）
+        self.counts = {}  # prefix -> 元の辞書全体での予測候補の総数
+
+
+def build_hot_tier(cold_path, hot_words, output_path, k=DEFAULT_TOP_K):
+    """
+    元の辞書からホット層を作る
+
+    よく使う単語を含むパターンは候補リストを丸ごと写す（候補の並びが元の辞書と同じになる）
+    それらのパターンの全プレフィックスの予測候補も元の辞書から写し、プレフィックス自体と
+    予測候補に現れるパターンの候補リストもホット層に含める
+
+    Args:
+        cold_path: 元の辞書（JSON・コンパイル済み・SQLite）
+        hot_words: よく使う単語（小文字）の集合
+        output_path: 出力ファイル（.hot.8kd）
+        k: 予測候補の保持件数
+
+    Returns:
+        dict: patterns（ホット層のパターン数）, prefixes（予測候補を格納したプレフィックス数）
+    """
+    cold = open_dictionary(cold_path)
+
+    lattices = lattice_patterns_of(cold)
+    patterns = set()
+    for pattern in cold:
+        if pattern not in lattices and any(w.lower() in hot_words for w in cold.words(pattern)):
+            patterns.add(pattern)
+
+    # 入力途中のプレフィックス自体も引かれるので、元の辞書にあればその候補リストも含める
+    # （ホット層にないプレフィックスは元の辞書にもないと分かるのでコールド層を開かずに済む）
+    prefixes = {pattern[:i] for pattern in patterns for i in range(1, len(pattern) + 1)}
+    patterns.update(prefix for prefix in prefixes if prefix in cold)
+    index = completion_index_for(cold, k)
+    completions = HotCompletions(k)
+    for prefix in prefixes:
+        entries = list(index.completions(prefix))
+        completions.top[prefix] = entries
+        completions.counts[prefix] = index.count(prefix)
+        patterns.update(pattern for _, pattern, _ in entries)
+
+    hot_dict = {pattern: cold[pattern] for pattern in sorted(patterns)}
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    tier = {
+        # コールド層はホット層からの相対パスで記録する（ディレクトリごと移動できるように）
+        'cold': os.path.relpath(os.path.abspath(cold_path), output_dir),
+        'patterns': len(cold),
+        'lattices': len(lattices),
+        'hot_words': len(hot_words),
+    }
+    stats = stored_dictionary_stats(cold_path, cold) or compute_dictionary_stats(cold)
+    write_compiled_dictionary(hot_dict, output_path, k,
+                              meta={'source': source_record(cold_path), 'tier': tier, 'stats': stats},
+                              completion_index=completions,
+                              string_sections={'tier_lattices': sorted(lattices)} if lattices else None)
+    return {'patterns': len(hot_dict), 'prefixes': len(prefixes)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='よく使う単語だけを含むホット層を作る（元の辞書は必要なときだけ開く）',
+        epilog='例: python eightkey_tiered.py linux_words.json common_words_3000.txt\n'
+               '    python 8key_shell.py linux_words.hot.8kd',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dictionary', help='元の辞書（JSON・.8kd・.8kdb）')
+    parser.add_argument('hot_words', help='よく使う単語のリスト（1行1語、または8キー辞書JSON）')
+    parser.add_argument('output', nargs='?', help=f'出力ファイル（デフォルト: <辞書名>{HOT_SUFFIX}）')
+    parser.add_argument('-k', type=int, default=DEFAULT_TOP_K,
+                        help=f'予測候補の保持件数（デフォルト: {DEFAULT_TOP_K}）')
+    args = parser.parse_args()
+    output_path = args.output or os.path.splitext(args.dictionary)[0] + HOT_SUFFIX
+
+    start = time.perf_counter()
+    hot_words = load_hot_words(args.hot_words)
+    result = build_hot_tier(args.dictionary, hot_words, output_path, args.k)
+    print(f"保存完了: {output_path} ({result['patterns']:,} パターン, "
+          f"{result['prefixes']:,} プレフィックス, よく使う単語 {len(hot_words):,} 語, "
+          f"{os.path.getsize(output_path) / 1024:.0f}KB, {time.perf_counter() - start:.2f}秒)")
+
+
+if __name__ == '__main__':
+    main()
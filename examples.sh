@@ -14,10 +14,44 @@
 # 小規模辞書（1,000語）
 # python3 8key_dict_with_freq.py common_words_1000_8key.tsv freq_mapping.json common_words_1000.json
 
-# 全ての辞書を一括生成
-# python3 8key_dict_with_freq.py linux_words_8key.tsv freq_mapping.json linux_words.json && \
-# python3 8key_dict_with_freq.py common_words_3000_8key.tsv freq_mapping.json common_words_3000.json && \
-# python3 8key_dict_with_freq.py common_words_1000_8key.tsv freq_mapping.json common_words_1000.json
+# コンパイル済み辞書（.8kd）を生成 - mmapで開くので起動が速い
+# python3 8key_dict_with_freq.py linux_words_8key.tsv freq_mapping.json linux_words.8kd
+# 既存のJSON辞書から変換する場合
+# python3 eightkey_compiled.py linux_words.json linux_words.8kd
+
+# SQLite辞書（.8kdb）を生成 - 辞書全体を読み込まずに索引で引くので、巨大な辞書でもメモリがほぼ一定
+# 外部ソートと組み合わせると生成時のメモリも抑えられる。3つのツールは辞書のパスとしてそのまま渡せる
+# python3 8key_dict_with_freq.py merged_8key.tsv freq_mapping.json merged.8kdb --max-memory 256
+# python3 8key_decoder.py merged.8kdb
+# 既存のJSON辞書から変換する場合
+# python3 eightkey_sqlite.py linux_words.json linux_words.8kdb
+
+# ホット層（.hot.8kd）を生成 - よく使う単語の候補と予測候補だけを持つ小さな辞書
+# ホット層を開くと元の辞書は必要になるまで読み込まない（よく使う単語だけなら元の辞書を開かずに入力できる）
+# python3 eightkey_tiered.py linux_words.json common_words_3000.txt
+# python3 8key_shell.py linux_words.hot.8kd
+
+# 巨大なTSVは外部ソートで生成（作業メモリを指定MBに抑える、出力は通常の生成と同じ）
+# python3 8key_dict_with_freq.py huge_8key.tsv freq_mapping.json huge.json --max-memory 256 --tmp-dir /var/tmp
+
+# 既存の辞書に単語を追加・削除（差分TSV: "8キー<TAB>単語" で追加、"-<TAB>8キー<TAB>単語" で削除）
+# 変更のあったパターンだけを並べ直す。結果はTSV全体から作り直した場合と同じ
+# python3 8key_dict_with_freq.py delta_8key.tsv freq_mapping.json --update linux_words.json
+
+# 単語リストから辞書まで一度に生成（中間TSVを書かない、--tee-tsv で中間TSVも保存）
+# python3 8key_pipeline.py linux_words.txt freq_mapping.json linux_words.json
+# python3 8key_pipeline.py linux_words.txt freq_mapping.json linux_words.json --workers 4 --tee-tsv linux_words_8key.tsv
+
+# 変更があったものだけを作り直す（頻度マッピング → 8キーTSV → 辞書JSON の依存関係を内容ハッシュで判定）
+# python3 8key_build.py                    # 全て
+# python3 8key_build.py linux_words.json   # 指定した辞書と、その元になるファイルだけ
+# python3 8key_build.py -n                 # 実行するステップを表示するだけ
+# python3 8key_build.py --force -j 4       # 全て作り直す（4並列）
+
+# 全ての辞書を一括生成（頻度マッピングは1回だけ読み込み、並列に生成して工程ごとの時間を表示）
+# python3 8key_dict_with_freq.py --multi freq_mapping.json linux_words_8key.tsv common_words_3000_8key.tsv common_words_1000_8key.tsv
+# 出力先を指定する場合は TSV:出力
+# python3 8key_dict_with_freq.py --multi freq_mapping.json linux_words_8key.tsv:linux_words.8kd common_words_3000_8key.tsv
 
 
 # ============================================================
@@ -45,13 +79,29 @@
 # ============================================================
 
 # 基本的な起動（デフォルト辞書を自動選択）
+# 画面を先に出して辞書は裏で読み込む（読み込み中の入力は読み込み後に処理、終了時に起動時間を表示）
 # python3 8key_shell.py
 
 # 辞書を指定して起動
+# python3 8key_shell.py linux_words.hot.8kd
 # python3 8key_shell.py linux_words.json
 # python3 8key_shell.py common_words_3000.json
 # python3 8key_shell.py common_words_1000.json
 
+# チームごとの固有名詞・ホスト名などの小さな辞書を重ねて起動（基本の辞書は作り直さない、複数指定可）
+# 候補は引いたときに頻度順に統合する
+# python3 8key_shell.py linux_words.json --overlay team_words.json --overlay hostnames.json
+
+# 辞書ファイルが作り直されると裏で読み込み直し、キー入力の合間に入れ替える（入力中のテキストはそのまま）
+# 入れ替えの時間は画面上部と終了時に表示。監視しない場合は --no-reload
+# python3 8key_shell.py linux_words.json --no-reload
+
+# --selections を指定すると確定した候補をそのファイルに追記し、次回から選んだ回数の多い候補を先頭に寄せる
+# （指定しなければ何も記録しない）
+# python3 8key_shell.py linux_words.json --selections ~/.8key_selections.tsv
+# python3 eightkey_learning.py show ~/.8key_selections.tsv     # 記録を表示
+# python3 eightkey_learning.py compact ~/.8key_selections.tsv  # 記録を1件1行にまとめ直す
+
 # 操作方法:
 #   a-z/; : 8キー入力
 #   ↑↓   : 候補選択
@@ -69,6 +119,13 @@
 # python3 8key_decoder.py common_words_3000.json
 # python3 8key_decoder.py common_words_1000.json
 
+# 辞書を重ねて使う（--overlay は複数指定可、後のものほど上の層）
+# python3 8key_decoder.py linux_words.json --overlay team_words.json
+
+# バッチモード（標準入力またはファイルを1行ずつデコード）
+# cat input.8key | python3 8key_decoder.py linux_words.json --batch > decoded.txt
+# python3 8key_decoder.py linux_words.json --batch --jsonl --top-n 5 input1.8key input2.8key > candidates.jsonl
+
 # 入力例:
 #   fjd   → the
 #   jdlll → hello
@@ -94,25 +151,57 @@
 # 単語リストから8キーTSVを生成
 # python3 8key_data_generator.py linux_words.txt linux_words_8key.tsv
 
+# 大きなコーパス（日本語を含む）は複数プロセスで並列変換（出力順は入力順のまま）
+# python3 8key_data_generator.py corpus.txt corpus_8key.tsv --workers 8
+# 出力順を問わない場合はさらに待ち時間が減る
+# python3 8key_data_generator.py corpus.txt corpus_8key.tsv --workers 8 --unordered
+
+# 日本語の表記ゆれ（shi/si, tsu/tu など）は既定で {sjk|sk} 形式のラティス1行にまとめて出力
+# （ラティスの行は3列目に lattice の印が付き、辞書JSONでは候補に "lattice": true が付く）
+# 従来どおり展開して出力する場合（最大50通り）
+# python3 8key_data_generator.py corpus.txt corpus_8key.tsv --expand
+
+# ローマ字変換結果をファイルに保存して次回以降の実行で再利用（行を追加しただけなら再変換はほぼ不要）
+# python3 8key_data_generator.py corpus.txt corpus_8key.tsv --romaji-cache romaji_cache.sqlite
+
 # 頻度マッピングを生成（frequencyList.tsvから）
-# python3 create_freq_mapping.py
+# python3 create_freq_mapping.py frequencyList.tsv freq_mapping.json
+
+# 大きな頻度リスト（"単語<TAB>出現数" のユニグラム頻度など）を複数まとめて並列に読み込む
+# 同じ単語は最大の頻度を使う。--compact でインデントなしのJSONにして保存を速くする
+# python3 create_freq_mapping.py frequencyList.tsv unigram_counts.tsv -o freq_mapping.json --workers 8 --compact
+
+# 頻度マッピングを頻度ストア（.8kf）で保存 - 辞書生成時にmmapで引くのでマッピング全体を読み込まない
+# python3 create_freq_mapping.py frequencyList.tsv unigram_counts.tsv -o freq_mapping.8kf --workers 8
+# python3 8key_dict_with_freq.py linux_words_8key.tsv freq_mapping.8kf linux_words.json
+# 既存のJSONから変換する場合
+# python3 eightkey_freqstore.py freq_mapping.json freq_mapping.8kf
 
 
 # ============================================================
 # 便利なコマンド
 # ============================================================
 
-# 辞書の統計情報を表示
+# 辞書の統計情報を表示（辞書生成時に保存した linux_words.meta.json を読むだけ）
 # python3 -c "
 # import json
-# with open('linux_words.json', 'r') as f:
-#     d = json.load(f)
-#     print(f'パターン数: {len(d):,}')
-#     print(f'総単語数: {sum(len(v) for v in d.values()):,}')
-#     unique = sum(1 for v in d.values() if len(v) == 1)
-#     print(f'ユニーク: {unique} ({unique/len(d)*100:.1f}%)')
+# with open('linux_words.meta.json', 'r') as f:
+#     s = json.load(f)['stats']
+#     print(f'パターン数: {s[\"patterns\"]:,}')
+#     print(f'総単語数: {s[\"total_words\"]:,}')
+#     print(f'ユニーク: {s[\"unique_patterns\"]} ({s[\"unique_patterns\"]/s[\"patterns\"]*100:.1f}%)')
+#     print(f'最大衝突: {s[\"max_collision\"]} ({s[\"max_collision_pattern\"]})')
 # "
 
+# 統計を辞書全体から集計し直す（最大衝突・パターン長の分布も表示し、JSON辞書ならサイドカーを書き直す）
+# python3 8key_decoder.py linux_words.json --stats
+
+# JSON辞書とコンパイル済み辞書の読み込み時間・RSSを比較
+# python3 8key_benchmark.py load linux_words.json linux_words.8kd
+
+# 辞書の表現（JSONのdict / CompactDictionary / コンパイル済み）ごとの保持メモリとデコード速度を比較
+# python3 8key_benchmark.py decode linux_words.json linux_words_8key.tsv
+
 # 辞書ファイルのサイズ確認
 # du -h *.json
 
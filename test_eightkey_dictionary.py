@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""eightkey_dictionary のテスト（python -m pytest）"""
+
+import json
+
+from eightkey_compiled import CompiledDictionary
+from eightkey_dictionary import cache_path_for, open_dictionary
+
+
+EIGHT_KEY_DICT = {
+    'fjd': [{'word': 'the', 'freq': 100}, {'word': 'tie', 'freq': 5}],
+    'ajd': [{'word': 'and', 'freq': 80}],
+}
+
+
+def _write_json(tmp_path):
+    path = tmp_path / 'words.json'
+    path.write_text(json.dumps(EIGHT_KEY_DICT), encoding='utf-8')
+    return str(path)
+
+
+def test_truncated_cache_is_rebuilt(tmp_path):
+    path = _write_json(tmp_path)
+    cache_path = cache_path_for(path)
+    open_dictionary(path, log=lambda message: None)
+    with open(cache_path, 'rb') as f:
+        full = f.read()
+
+    # ヘッダーの途中・セクションの途中で切れたキャッシュ
+    for truncated in (b'8KD', full[:len(full) - 8]):
+        with open(cache_path, 'wb') as f:
+            f.write(truncated)
+        messages = []
+        dictionary = open_dictionary(path, log=messages.append)
+        assert isinstance(dictionary, CompiledDictionary)
+        assert dictionary.words('fjd') == ('the', 'tie')
+        assert messages, "キャッシュが作り直されていない"
+        with open(cache_path, 'rb') as f:
+            assert f.read() == full